@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class AuthzConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'authz'
\ No newline at end of file
+    name = 'authz'
+
+    def ready(self):
+        import authz.signals
@@ -0,0 +1,170 @@
+# authz/autenticacion.py
+"""
+TokenAuthentication con caché compartida (`settings.CACHES`, CACHE_BACKEND=file o db).
+
+TokenAuthentication de DRF consulta Token + User en cada request, y varias
+vistas vuelven a buscar el perfil `Usuario`. Aquí la primera consulta trae
+token, usuario, perfil y rol juntos y guarda AUTH_TOKEN_CACHE_TTL segundos
+sus ids y campos sin secretos, bajo el hash del token: ni la clave del token ni
+el hash de la contraseña llegan a la caché (que puede ser un archivo o una
+tabla, ver CACHE_BACKEND). Los requests siguientes reconstruyen los objetos
+sin tocar la BD; la contraseña queda diferida. El perfil queda en
+`request.perfil` (ver `perfil_de`).
+
+Las señales de authz/signals.py borran la entrada al eliminar o rotar el token
+(logout) y al guardar o borrar el User, su perfil o su Rol. Los cambios hechos
+con `QuerySet.update()` no envían señales: se ven al vencer el TTL. Con locmem
+(por proceso) ese borrado no llegaría a los demás workers, así que la caché se
+desactiva (AUTH_TOKEN_CACHE_TTL = 0, ver config/settings.py).
+
+Para login/register: `autenticar_por_email` (una consulta con índice) y
+`rol_por_defecto` (cacheado).
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.functions import Lower
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core.cache import cache_funcion
+from .models import Rol, Usuario
+
+_PREFIJO = "auth:token:"
+
+
+def _clave(key):
+    return _PREFIJO + hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def invalidar_tokens(keys):
+    """Borra de la caché los tokens dados (claves de Token)."""
+    claves = [_clave(k) for k in keys]
+    if claves:
+        cache.delete_many(claves)
+
+
+def invalidar_tokens_de(**filtro):
+    """Borra de la caché los tokens de los usuarios que cumplen el filtro sobre Token (p. ej. `user_id=3`)."""
+    invalidar_tokens(Token.objects.filter(**filtro).values_list("key", flat=True))
+
+
+def _campos(obj, excluir=()):
+    return {f.attname: getattr(obj, f.attname) for f in obj._meta.concrete_fields if f.name not in excluir}
+
+
+def _instancia(modelo, campos):
+    """Instancia "leída de la BD" con sólo esos campos; el resto queda diferido (save() no los pisa)."""
+    nombres = [f.attname for f in modelo._meta.concrete_fields if f.attname in campos]
+    return modelo.from_db(DEFAULT_DB_ALIAS, nombres, [campos[n] for n in nombres])
+
+
+def _a_cache(token):
+    """Lo que se guarda en la caché: ids y campos sin secretos (ni la clave del token ni el hash de la contraseña)."""
+    perfil = getattr(token.user, "perfil_authz", None)
+    return {
+        "token": _campos(token, excluir=("key",)),
+        "user": _campos(token.user, excluir=("password",)),
+        "perfil": _campos(perfil) if perfil else None,
+        "rol": _campos(perfil.rol) if perfil and perfil.rol else None,
+    }
+
+
+def _desde_cache(modelo_token, key, datos):
+    """Token, User, perfil y rol reconstruidos sin consultar la BD."""
+    user = _instancia(User, datos["user"])
+    token = _instancia(modelo_token, {**datos["token"], "key": key})
+    token.user = user
+    if datos["perfil"] is None:
+        Usuario._meta.get_field("user").remote_field.set_cached_value(user, None)
+    else:
+        perfil = _instancia(Usuario, datos["perfil"])
+        perfil.user = user  # también deja user.perfil_authz en caché
+        perfil.rol = _instancia(Rol, datos["rol"]) if datos["rol"] else None
+    return token
+
+
+class TokenCacheadoAuthentication(TokenAuthentication):
+    """`Authorization: Token <key>`, igual que TokenAuthentication, con la búsqueda cacheada."""
+
+    def authenticate(self, request):
+        resultado = super().authenticate(request)
+        if resultado is not None:
+            user, _token = resultado
+            # Ya viene cargado (select_related o caché): no consulta
+            request._request.perfil = getattr(user, "perfil_authz", None)
+        return resultado
+
+    def authenticate_credentials(self, key):
+        ttl = settings.AUTH_TOKEN_CACHE_TTL
+        modelo = self.get_model()
+        datos = cache.get(_clave(key)) if ttl else None
+        if datos is not None:
+            token = _desde_cache(modelo, key, datos)
+        else:
+            try:
+                token = modelo.objects.select_related("user__perfil_authz__rol").get(key=key)
+            except modelo.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_("Invalid token."))
+            if ttl:
+                cache.set(_clave(key), _a_cache(token), ttl)
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+        return token.user, token
+
+
+def usuarios_por_email(email):
+    """Usuarios con ese email sin distinguir mayúsculas; usa el índice sobre LOWER(email) (migración 0004)."""
+    return User.objects.alias(email_normalizado=Lower("email")).filter(email_normalizado=email.strip().lower())
+
+
+@cache_funcion(tags=("roles",), timeout=3600)
+def rol_por_defecto():
+    """Rol "Cliente" de los perfiles nuevos (authz/signals.py invalida el tag al cambiar un Rol)."""
+    return Rol.objects.get(rol="Cliente")
+
+
+def autenticar_por_email(email, password):
+    """
+    Usuario activo con ese email y contraseña, con token, perfil y rol en la misma
+    consulta; None si no coinciden. Equivale a `authenticate()` con ModelBackend
+    (el único configurado) sin volver a buscar al usuario por username.
+    """
+    user = (
+        usuarios_por_email(email)
+        .select_related("auth_token", "perfil_authz__rol")
+        .order_by("id")
+        .first()
+    )
+    if user is None:
+        # Igual que ModelBackend: el mismo costo de hash que un login real, para no
+        # revelar por el tiempo de respuesta qué emails están registrados
+        User().set_password(password)
+        return None
+    if not user.check_password(password) or not user.is_active:
+        return None
+    return user
+
+
+def perfil_de(request):
+    """
+    Perfil `Usuario` (con su rol) del usuario autenticado, o None si es anónimo o
+    no tiene perfil. Con TokenCacheadoAuthentication ya está en `request.perfil`;
+    con sesión se consulta una vez y se guarda en el request.
+    """
+    try:
+        return request.perfil
+    except AttributeError:
+        pass
+    user = request.user
+    perfil = None
+    if user.is_authenticated:
+        perfil = Usuario.objects.select_related("rol").filter(user=user).first()
+    getattr(request, "_request", request).perfil = perfil
+    return perfil
@@ -1,10 +1,14 @@
+from pathlib import Path
+
 from django.db import migrations
-from django.core.management import call_command
+
+from core.semillas import cargar_fixtures
 
 
 def load_initial_authz(apps, schema_editor):
     # Load the authz fixture (roles + auth users + perfiles)
-    call_command('loaddata', 'authz/fixtures/initial_authz.json')
+    fixture = Path(__file__).resolve().parents[1] / 'fixtures' / 'initial_authz.json'
+    cargar_fixtures([fixture], using=schema_editor.connection.alias, apps=apps, registrar=False)
 
 
 class Migration(migrations.Migration):
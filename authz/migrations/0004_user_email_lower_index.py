@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Índice sobre LOWER(email) de auth_user: el login busca por email sin
+    distinguir mayúsculas (ver authz.autenticacion.usuarios_por_email).
+    auth.User no es de esta app, así que el índice va en SQL.
+    """
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('authz', '0003_load_initial_fixture'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX IF NOT EXISTS authz_user_email_lower_idx ON auth_user (LOWER(email));',
+            reverse_sql='DROP INDEX IF EXISTS authz_user_email_lower_idx;',
+        ),
+    ]
@@ -1,6 +1,7 @@
 # authz/serializers.py
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from .autenticacion import usuarios_por_email
 from .models import Rol, Usuario
 
 class RolSerializer(serializers.ModelSerializer):
@@ -49,7 +50,8 @@ class UserSerializer(serializers.ModelSerializer):
         }
 
     def validate_email(self, value):
-        if User.objects.filter(email=value).exists():
+        # Sin distinguir mayúsculas, con el índice de LOWER(email)
+        if usuarios_por_email(value).exists():
             raise serializers.ValidationError(
                 "Este correo electrónico ya está registrado."
             )
@@ -0,0 +1,40 @@
+# authz/signals.py
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from core.cache import invalidar_tags
+from .autenticacion import invalidar_tokens, invalidar_tokens_de
+from .models import Rol, Usuario
+
+
+# ==========================================================
+# CACHÉ DE AUTENTICACIÓN (ver authz/autenticacion.py)
+# ==========================================================
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidar_token(sender, instance, **kwargs):
+    """Logout o rotación: el token borrado deja de autenticar de inmediato."""
+    invalidar_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+def invalidar_tokens_user(sender, instance, **kwargs):
+    """Contraseña, is_active, permisos... (al borrar el User se borra su Token en cascada)."""
+    invalidar_tokens_de(user_id=instance.pk)
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def invalidar_tokens_perfil(sender, instance, **kwargs):
+    """Cambio de rol, teléfono o estado del perfil."""
+    invalidar_tokens_de(user_id=instance.user_id)
+
+
+@receiver(post_save, sender=Rol)
+@receiver(pre_delete, sender=Rol)
+def invalidar_tokens_rol(sender, instance, **kwargs):
+    # pre_delete: después del borrado los perfiles ya quedaron con rol NULL
+    invalidar_tokens_de(user__perfil_authz__rol=instance)
+    invalidar_tags("roles")
@@ -1,19 +1,63 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from .autenticacion import autenticar_por_email, rol_por_defecto
 from .serializer import UserSerializer, PerfilUsuarioSerializer
 from django.contrib.auth.models import User
 from rest_framework.authtoken.models import Token
 from rest_framework import status
 from .models import Rol, Usuario
-from django.contrib.auth import authenticate
 from tienda.models import FCMDevice
+
+logger = logging.getLogger(__name__)
 # Create your views here.
 
 
+# ==========================================================
+# REGISTRO DE DISPOSITIVOS FCM EN EL LOGIN
+# ==========================================================
+# Con LOGIN_FCM_DIFERIDO=1 el token FCM se guarda en segundo plano y el login
+# responde sin esperar esa escritura (útil en las olas de login tras una
+# actualización de la app)
+_POOL_FCM = ThreadPoolExecutor(max_workers=2, thread_name_prefix="login-fcm")
+
+
+def _registrar_dispositivo(perfil_id, reg, tipo_disp):
+    try:
+        FCMDevice.objects.update_or_create(
+            registration_id=reg,
+            defaults={'usuario_id': perfil_id, 'tipo_dispositivo': tipo_disp, 'activo': True}
+        )
+    except Exception:
+        # No bloquear el login por fallos al registrar el token
+        logger.exception("No se pudo registrar el dispositivo FCM del perfil %s", perfil_id)
+
+
+def _registrar_dispositivo_en_fondo(*args):
+    try:
+        _registrar_dispositivo(*args)
+    finally:
+        close_old_connections()  # conexiones propias del hilo del pool
+
+
+def registrar_dispositivo(perfil, reg, tipo_disp):
+    if settings.LOGIN_FCM_DIFERIDO:
+        _POOL_FCM.submit(_registrar_dispositivo_en_fondo, perfil.id, reg, tipo_disp)
+    else:
+        _registrar_dispositivo(perfil.id, reg, tipo_disp)
+
+
 @api_view(['POST'])
 def login(request):
     """
-    Vista personalizada para login que devuelve todos los datos del usuario
+    Vista personalizada para login que devuelve todos los datos del usuario.
+
+    Una consulta (email sin distinguir mayúsculas, con índice) trae usuario,
+    token, perfil y rol; token y perfil sólo se crean en el primer login.
     """
     email = request.data.get('email')
     password = request.data.get('password')
@@ -24,72 +68,42 @@ def login(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    try:
-        # Buscar usuario por email
-        user = User.objects.get(email=email)
-    except User.DoesNotExist:
-        return Response(
-            {'error': 'Credenciales inválidas'}, 
-            status=status.HTTP_401_UNAUTHORIZED
-        )
-    
-    # Autenticar con username (que es igual al email en tu caso)
-    user = authenticate(username=user.username, password=password)
-    
-    if user:
-        # Obtener o crear token
-        token, created = Token.objects.get_or_create(user=user)
-        
-        # Obtener el perfil del usuario
-        try:
-            perfil = Usuario.objects.get(user=user)
-            perfil_serializer = PerfilUsuarioSerializer(perfil)
-            
-            # Crear respuesta CONSISTENTE con el register
-            user_data = {
-                "id": user.id,
-                "email": user.email,
-                "first_name": user.first_name,
-                "last_name": user.last_name,
-                "perfil": perfil_serializer.data
-            }
-            
-        except Usuario.DoesNotExist:
-            # Si no tiene perfil, crear uno por defecto
-            rol_cliente = Rol.objects.get(rol="Cliente")
-            perfil = Usuario.objects.create(user=user, rol=rol_cliente)
-            perfil_serializer = PerfilUsuarioSerializer(perfil)
-            
-            user_data = {
-                "id": user.id,
-                "email": user.email,
-                "first_name": user.first_name,
-                "last_name": user.last_name,
-                "perfil": perfil_serializer.data
-            }
-        # Si el cliente envió un registration_id (token FCM) durante el login,
-        # registrarlo/actualizarlo y asociarlo al perfil creado/obtenido.
-        reg = request.data.get('registration_id') or request.data.get('registrationId') or request.data.get('token')
-        if reg:
-            tipo_disp = request.data.get('tipo_dispositivo') or request.data.get('tipo') or 'android'
-            try:
-                FCMDevice.objects.update_or_create(
-                    registration_id=reg,
-                    defaults={'usuario': perfil, 'tipo_dispositivo': tipo_disp, 'activo': True}
-                )
-            except Exception:
-                # No bloquear el login por fallos al registrar el token; se puede loggear si se desea
-                pass
-        
-        return Response({
-            'token': token.key,
-            'user': user_data
-        })
-    else:
+    user = autenticar_por_email(email, password)
+    if user is None:
         return Response(
             {'error': 'Credenciales inválidas'}, 
             status=status.HTTP_401_UNAUTHORIZED
         )
+
+    token = getattr(user, 'auth_token', None)
+    if token is None:
+        token, _ = Token.objects.get_or_create(user=user)
+
+    perfil = getattr(user, 'perfil_authz', None)
+    if perfil is None:
+        # Si no tiene perfil, crear uno por defecto
+        perfil, _ = Usuario.objects.get_or_create(user=user, defaults={'rol': rol_por_defecto()})
+
+    # Respuesta CONSISTENTE con el register
+    user_data = {
+        "id": user.id,
+        "email": user.email,
+        "first_name": user.first_name,
+        "last_name": user.last_name,
+        "perfil": PerfilUsuarioSerializer(perfil).data
+    }
+
+    # Si el cliente envió un registration_id (token FCM) durante el login,
+    # registrarlo/actualizarlo y asociarlo al perfil creado/obtenido.
+    reg = request.data.get('registration_id') or request.data.get('registrationId') or request.data.get('token')
+    if reg:
+        tipo_disp = request.data.get('tipo_dispositivo') or request.data.get('tipo') or 'android'
+        registrar_dispositivo(perfil, reg, tipo_disp)
+
+    return Response({
+        'token': token.key,
+        'user': user_data
+    })
     
     
 @api_view(["POST"])
@@ -101,34 +115,29 @@ def register(request):
         first_name = serializer.validated_data.get("first_name", "")
         last_name = serializer.validated_data.get("last_name", "")
         telefono = request.data.get("telefono", "")  # Extraer teléfono del request
-        
-        user = User.objects.create_user(
-            username=email, 
-            email=email, 
-            password=password,
-            first_name=first_name,
-            last_name=last_name
-        )
 
-        # Asignar rol
-        rol_id = request.data.get("rol")
-        if rol_id:
-            try:
-                rol_obj = Rol.objects.get(id=rol_id)
-            except Rol.DoesNotExist:
-                rol_obj = Rol.objects.get(rol="Cliente")
-        else:
-            rol_obj = Rol.objects.get(rol="Cliente")
-
-        # Crear perfil CON teléfono
-        Usuario.objects.create(
-            user=user,
-            rol=rol_obj,
-            telefono=telefono,  # ¡Pasar el teléfono aquí!
-        )
+        # Rol enviado (el serializer ya lo validó y cargó) o el rol por defecto
+        rol_obj = serializer.validated_data.get("rol") or rol_por_defecto()
 
-        # Crear token
-        token, _ = Token.objects.get_or_create(user=user)
+        # Usuario, perfil y token en una sola transacción
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username=email, 
+                email=email, 
+                password=password,
+                first_name=first_name,
+                last_name=last_name
+            )
+
+            # Crear perfil CON teléfono
+            Usuario.objects.create(
+                user=user,
+                rol=rol_obj,
+                telefono=telefono,  # ¡Pasar el teléfono aquí!
+            )
+
+            # Crear token
+            token = Token.objects.create(user=user)
 
         # Serializar el usuario completo para la respuesta
         user_serializer = UserSerializer(user)
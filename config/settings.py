@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import sys
 from django.core.exceptions import ImproperlyConfigured
 from pathlib import Path
 from dotenv import load_dotenv
@@ -21,6 +22,7 @@ from corsheaders.defaults import default_headers
 # Configuración de Stripe
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY', '')
 STRIPE_PUBLISHABLE_KEY = os.getenv('STRIPE_PUBLISHABLE_KEY', '')
+STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET', '')
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -71,8 +73,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero: mide el request completo, incluidos los demás middlewares
+    "core.middleware.MetricasMiddleware",
+    # Antes de sesiones/autenticación: sus escrituras también fijan la primaria
+    "core.middleware.ReplicaMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    # Antes de cualquier middleware que lea o modifique el cuerpo de la respuesta
+    "core.middleware.GZipUmbralMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -100,12 +108,18 @@ CORS_ALLOW_HEADERS = list(default_headers) + [
     'Authorization',
 ]
 
-# Configuración de DRF: habilitar TokenAuthentication por defecto (acepta `Authorization: Token <key>`)
+# Configuración de DRF: habilitar TokenAuthentication por defecto (acepta `Authorization: Token <key>`),
+# con token, usuario y perfil cacheados (ver authz/autenticacion.py)
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'authz.autenticacion.TokenCacheadoAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
+    # orjson si está instalado; si no, el JSONRenderer estándar (ver core/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.JSONRapidoRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,  # Tamaño de página predeterminado
 }
@@ -131,28 +145,150 @@ WSGI_APPLICATION = "config.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-# DATABASES = {
-#     "default": {
-#         "ENGINE": "django.db.backends.sqlite3",
-#         "NAME": BASE_DIR / "db.sqlite3",
-#     }
-# }
+# Conexión por entorno: DATABASE_URL (Railway la inyecta al enlazar Postgres; ver
+# .env.example). Sin ella se detiene el arranque (ImproperlyConfigured) en lugar de
+# levantar con un SQLite vacío; el SQLite local de BASE_DIR se usa sólo con
+# DB_SQLITE_LOCAL=1 (desarrollo) o en `manage.py test`.
+#
+# Postgres remoto por SSL: abrir una conexión cuesta TCP + TLS + autenticación
+# (decenas de ms). Dos modos para no pagarlo en cada request:
+# - por defecto, conexiones persistentes por hilo (DB_CONN_MAX_AGE s) con health
+#   check al inicio de cada request: una conexión caída se reabre en vez de fallar.
+# - DB_POOL=1: pool nativo de Django (psycopg 3 + psycopg_pool) por worker, de
+#   DB_POOL_MIN a DB_POOL_MAX conexiones compartidas entre sus hilos; gunicorn.conf.py
+#   calcula el tamaño por worker. Con pool, CONN_MAX_AGE debe ser 0.
+# DB_PGBOUNCER=1 si DATABASE_URL apunta a pgbouncer en modo transaction (sin
+# cursores del lado del servidor).
+# `python manage.py benchmark_conexiones_bd` compara el costo de cada modo.
+DB_POOL = os.getenv("DB_POOL", "0") == "1"
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "0") == "1"
+DB_SQLITE_LOCAL = os.getenv("DB_SQLITE_LOCAL", "0") == "1"
+TESTING = sys.argv[1:2] == ["test"]
+# Postgres en la misma máquina (docker compose, desarrollo) suele no tener SSL
+_HOSTS_LOCALES = ("", "localhost", "127.0.0.1", "::1")
+
+
+def _config_bd(url):
+    import dj_database_url
+
+    if url:
+        config = dj_database_url.parse(url)
+    elif DB_SQLITE_LOCAL or TESTING:
+        config = {"ENGINE": "django.db.backends.sqlite3", "NAME": BASE_DIR / "db.sqlite3"}
+    else:
+        raise ImproperlyConfigured(
+            "Falta DATABASE_URL. Para desarrollo con el SQLite local define DB_SQLITE_LOCAL=1."
+        )
+    config["CONN_HEALTH_CHECKS"] = True
+    if config["ENGINE"] != "django.db.backends.postgresql":
+        return config
+
+    config["OPTIONS"] = {
+        **config.get("OPTIONS", {}),
+        "sslmode": os.getenv("DB_SSLMODE", "prefer" if config.get("HOST", "") in _HOSTS_LOCALES else "require"),
+        "connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", "5")),
+        # Keepalives TCP: detectar conexiones cortadas por el proxy antes de usarlas
+        "keepalives": 1,
+        "keepalives_idle": 60,
+        "keepalives_interval": 10,
+        "keepalives_count": 3,
+    }
+    if DB_POOL:
+        config["CONN_MAX_AGE"] = 0
+        config["OPTIONS"]["pool"] = {
+            "min_size": int(os.getenv("DB_POOL_MIN", "2")),
+            "max_size": int(os.getenv("DB_POOL_MAX", "10")),
+            # Espera máxima por una conexión libre antes de fallar el request
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+            "max_idle": 300,
+            "max_lifetime": 1800,
+        }
+    else:
+        config["CONN_MAX_AGE"] = int(os.getenv("DB_CONN_MAX_AGE", "600"))
+    if DB_PGBOUNCER:
+        config["DISABLE_SERVER_SIDE_CURSORS"] = True
+    return config
+
 
-# settings.py - Versión directa
 DATABASES = {
+    "default": _config_bd(os.getenv("DATABASE_URL")),
+}
+
+# Réplica de solo lectura para reportes, IA y listados analíticos (core/routers.py).
+# DB_REPLICA_LAG_MAX: retraso tolerado en segundos; por encima, o si no responde,
+# se lee de la primaria. También es cuánto queda fijado a la primaria un cliente
+# después de escribir. En los tests la réplica es un espejo de `default`.
+# `manage.py test` sin DATABASE_REPLICA_URL usa una réplica SQLite para que los
+# tests del router (core/tests.py) recorran las dos conexiones.
+if os.getenv("DATABASE_REPLICA_URL"):
+    DATABASES["replica"] = {
+        **_config_bd(os.getenv("DATABASE_REPLICA_URL")),
+        "TEST": {"MIRROR": "default"},
+    }
+elif TESTING:
+    DATABASES["replica"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db_replica.sqlite3",
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["core.routers.RouterReplica"]
+DB_REPLICA_LAG_MAX = float(os.getenv("DB_REPLICA_LAG_MAX", "5"))
+# GET/HEAD con estos prefijos van a la réplica (además de lo marcado con lecturas_en_replica)
+DB_REPLICA_RUTAS = tuple(
+    ruta.strip() for ruta in os.getenv("DB_REPLICA_RUTAS", "/api/ia/").split(",") if ruta.strip()
+)
+
+
+# Caché
+# CACHE_BACKEND=locmem (por defecto, por proceso) | file (compartida entre workers de
+# la misma máquina, en CACHE_DIR) | db (tabla en la BD por defecto; crearla con
+# `python manage.py createcachetable`). Ninguna requiere servicios externos.
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "locmem").lower()
+_CACHE_BACKENDS = {
+    "locmem": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "smartsales",
+    },
+    "file": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv("CACHE_DIR", str(BASE_DIR / ".cache" / "django")),
+    },
+    "db": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "cache_compartida",
+    },
+}
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
-        "NAME": "railway",
-        "USER": "postgres",
-        "PASSWORD": "BsnZEoMfOXrnRgvfZpKOOTHXDgPUCwJL",
-        "HOST": "centerbeam.proxy.rlwy.net",
-        "PORT": "12505",
-        "CONN_MAX_AGE": 600,
-        "OPTIONS": {
-            "sslmode": "require",
-        },
+        **_CACHE_BACKENDS.get(CACHE_BACKEND, _CACHE_BACKENDS["locmem"]),
+        "TIMEOUT": int(os.getenv("CACHE_TTL", "300")),
+        "OPTIONS": {"MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", "5000"))},
     }
 }
+# False con locmem: lo que un worker invalida no lo ven los demás workers ni procesos
+CACHE_COMPARTIDA = CACHES["default"]["BACKEND"] != _CACHE_BACKENDS["locmem"]["BACKEND"]
+
+
+# Segundos que un token autenticado (usuario + perfil + rol) queda en caché; 0 lo desactiva.
+# Sólo con caché compartida: con locmem el logout o un cambio de rol borraría la
+# entrada en un único worker y los demás seguirían aceptando el token hasta el TTL.
+AUTH_TOKEN_CACHE_TTL = int(os.getenv("AUTH_TOKEN_CACHE_TTL", "60")) if CACHE_COMPARTIDA else 0
+# Registrar el token FCM del login en segundo plano (el login no espera esa escritura)
+LOGIN_FCM_DIFERIDO = os.getenv("LOGIN_FCM_DIFERIDO", "0") == "1"
+
+
+# Compresión: respuestas de texto/JSON por debajo de este tamaño se envían sin GZip
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", "1024"))
+
+
+# Reportes por voz (ver reportes/services/transcripcion.py)
+VOZ_RECONOCEDOR = os.getenv("VOZ_RECONOCEDOR", "google")  # google | local (sin red, pruebas) | ruta.a.Clase
+VOZ_MAX_BYTES = int(os.getenv("VOZ_MAX_BYTES", str(5 * 1024 * 1024)))
+VOZ_MAX_SEGUNDOS = float(os.getenv("VOZ_MAX_SEGUNDOS", "30"))
+# Audios decodificándose a la vez por proceso (ffmpeg usa un núcleo cada uno) y en espera
+VOZ_WORKERS = int(os.getenv("VOZ_WORKERS", "2"))
+VOZ_COLA_MAX = int(os.getenv("VOZ_COLA_MAX", "8"))
+VOZ_TIMEOUT = float(os.getenv("VOZ_TIMEOUT", "30"))
 
 
 # Password validation
@@ -18,6 +18,7 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 from debug_views import debug_volumen
+from core.views import metricas_prometheus
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -32,4 +33,5 @@ urlpatterns = [
 
     path('api/ia/', include('scikit_learn_ia.urls')),
     path("debug/volumen/", debug_volumen),
+    path("metrics", metricas_prometheus, name="metricas"),
 ]
\ No newline at end of file
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Notificacion
+from .models import EntregaNotificacion, EventoStripe, Notificacion
 
 
 @admin.register(Notificacion)
@@ -11,9 +11,26 @@ class NotificacionAdmin(admin.ModelAdmin):
 		"enviar_a_todos",
 		"programada_para",
 		"enviada_en",
+		"total_exitosos",
+		"total_fallidos",
 		"created_at",
 		"updated_at",
 	)
 	list_filter = ("estado", "enviar_a_todos", "programada_para", "enviada_en")
 	search_fields = ("titulo", "cuerpo")
 	filter_horizontal = ("destinatarios",)
+
+
+@admin.register(EntregaNotificacion)
+class EntregaNotificacionAdmin(admin.ModelAdmin):
+	list_display = ("notificacion", "dispositivo", "codigo", "error_clase", "creado")
+	list_filter = ("codigo", "error_clase")
+	raw_id_fields = ("notificacion", "dispositivo")
+
+
+@admin.register(EventoStripe)
+class EventoStripeAdmin(admin.ModelAdmin):
+	list_display = ("stripe_id", "tipo", "estado", "intentos", "session_id", "payment_intent", "created_at", "procesado_en")
+	list_filter = ("estado", "tipo")
+	search_fields = ("stripe_id", "session_id", "payment_intent")
+	readonly_fields = ("payload", "resultado", "error")
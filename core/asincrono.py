@@ -0,0 +1,79 @@
+# core/asincrono.py
+"""
+Soporte para vistas async en endpoints que pasan la mayor parte del tiempo
+esperando un servicio externo (Stripe, FCM, reconocimiento de voz).
+
+Servidas por ASGI (uvicorn bajo gunicorn, ver gunicorn.conf.py), mientras la llamada
+externa está en curso el worker sigue atendiendo otros requests: el throughput
+en esas esperas escala con la concurrencia y no con workers × hilos. Bajo WSGI
+(runserver, tests) Django las ejecuta igual, sin esa ventaja.
+
+- `externo(func, ...)`: SDKs sin cliente async (stripe 8, firebase-admin,
+  speech_recognition en línea) en un pool propio de `EXTERNO_MAX_HILOS` hilos, fuera del
+  hilo del request (`thread_sensitive=False`); no deben tocar el ORM. El pool por
+  defecto de asyncio (núcleos + 4) limitaría la concurrencia de esas esperas.
+- El ORM se llama con `sync_to_async` normal (hilo del request).
+- DRF 3.16 no tiene vistas async: `request_drf` arma el `Request` de DRF
+  (parseo del cuerpo y autenticación Token/Session con su chequeo CSRF) en
+  un hilo y devuelve la respuesta de error que habría dado APIView.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .renderers import JsonResponseRapida
+
+
+# Hilos que casi todo el tiempo esperan la red: son baratos, el límite es el servicio externo
+_POOL_EXTERNO = ThreadPoolExecutor(
+    max_workers=int(os.getenv("EXTERNO_MAX_HILOS", "64")), thread_name_prefix="externo"
+)
+
+
+async def externo(func, *args, **kwargs):
+    """Ejecuta una llamada bloqueante de red sin bloquear el event loop."""
+    return await sync_to_async(func, thread_sensitive=False, executor=_POOL_EXTERNO)(*args, **kwargs)
+
+
+def _request_drf(request, autenticar):
+    drf_request = Request(
+        request,
+        parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES],
+        authenticators=[clase() for clase in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+    )
+    try:
+        drf_request.data  # noqa: B018 - fuerza el parseo aquí y no en el event loop
+        if autenticar:
+            drf_request.user  # noqa: B018 - idem: la autenticación consulta la BD
+    except exceptions.APIException as e:
+        return None, _respuesta_error(drf_request, e)
+    return drf_request, None
+
+
+def _respuesta_error(drf_request, error):
+    respuesta = JsonResponseRapida(
+        error.detail if isinstance(error.detail, (dict, list)) else {"detail": error.detail},
+        status=error.status_code,
+        safe=False,
+    )
+    if isinstance(error, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        # Igual que APIView: 401 con el esquema del primer autenticador, si tiene uno
+        autenticadores = drf_request.authenticators
+        encabezado = autenticadores[0].authenticate_header(drf_request) if autenticadores else None
+        if encabezado:
+            respuesta["WWW-Authenticate"] = encabezado
+        else:
+            respuesta.status_code = 403
+    return respuesta
+
+
+async def request_drf(request, autenticar=True):
+    """
+    `(drf_request, None)` con `.data` parseado y, si `autenticar`, `.user`
+    resuelto; o `(None, respuesta)` con el error 400/401/403 correspondiente.
+    """
+    return await sync_to_async(_request_drf)(request, autenticar)
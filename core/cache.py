@@ -0,0 +1,126 @@
+# core/cache.py
+"""
+Cache-aside sobre la caché de Django (`settings.CACHES`) con claves versionadas
+e invalidación por tags.
+
+Cada tag tiene un contador de versión guardado en la propia caché. La clave de
+una entrada incluye la versión de todos sus tags, así que `invalidar_tags("x")`
+sólo incrementa un contador: las entradas viejas dejan de leerse y expiran solas
+por TTL. Con un backend compartido (archivo/BD) la invalidación la ven todos los
+workers; con locmem es por proceso.
+
+- `cache_funcion(tags, timeout)`: cachea el retorno de una función según sus argumentos.
+- `cache_vista(tags, timeout)`: cachea `response.data` de un método GET de DRF
+  (APIView o acción de ViewSet) según la ruta y los query params.
+
+Bajo `condicional_tablas` / `condicional_archivos` (core/condicional.py) la clave
+de `cache_vista` incluye además el ETag del request, que sale de la BD o de los
+archivos: una escritura hecha en otro proceso cambia el ETag y con él la clave,
+así nunca se sirve un cuerpo viejo con el ETag nuevo aunque la caché sea locmem.
+"""
+import functools
+import hashlib
+import json
+import logging
+from typing import Iterable
+
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL_POR_DEFECTO = 300
+_PREFIJO_TAG = "cache:tag:"
+_PREFIJO_ENTRADA = "cache:v:"
+# Atributo del HttpRequest donde core.condicional deja el ETag calculado
+ATRIBUTO_VALIDADOR = "_validador_cache"
+
+
+def _claves_tag(tags) -> list:
+    return [f"{_PREFIJO_TAG}{t}" for t in tags]
+
+
+def versiones_tags(tags: Iterable[str]) -> tuple:
+    """Versión actual de cada tag (una sola lectura a la caché); los tags nuevos empiezan en 1."""
+    tags = tuple(tags)
+    if not tags:
+        return ()
+    claves = _claves_tag(tags)
+    actuales = cache.get_many(claves)
+    faltantes = {c: 1 for c in claves if c not in actuales}
+    if faltantes:
+        # Sin timeout: si un contador se perdiera, volver a 1 podría resucitar entradas viejas
+        cache.set_many(faltantes, timeout=None)
+        actuales.update(faltantes)
+    return tuple(actuales[c] for c in claves)
+
+
+def invalidar_tags(*tags: str) -> None:
+    """Invalida todas las entradas asociadas a los tags dados."""
+    for clave in _claves_tag(tags):
+        try:
+            cache.incr(clave)
+        except ValueError:
+            # El contador no existía (o expiró por desalojo): nada cacheado lo usa todavía
+            cache.set(clave, 2, timeout=None)
+    logger.debug("Tags de caché invalidados: %s", ", ".join(tags))
+
+
+def construir_clave(nombre: str, tags: Iterable[str], partes) -> str:
+    tags = tuple(tags)
+    versiones = ".".join(str(v) for v in versiones_tags(tags))
+    crudo = json.dumps([nombre, tags, partes], sort_keys=True, default=str)
+    return f"{_PREFIJO_ENTRADA}{nombre}:{versiones}:{hashlib.sha1(crudo.encode('utf-8')).hexdigest()}"
+
+
+def cache_funcion(tags: Iterable[str] = (), timeout: int = CACHE_TTL_POR_DEFECTO):
+    """Cachea el resultado de la función; los argumentos deben ser serializables a JSON (o por str)."""
+    tags = tuple(tags)
+
+    def decorador(func):
+        nombre = f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def envoltura(*args, **kwargs):
+            clave = construir_clave(nombre, tags, [args, kwargs])
+            valor = cache.get(clave)
+            if valor is None:
+                valor = func(*args, **kwargs)
+                if valor is not None:
+                    cache.set(clave, valor, timeout)
+            return valor
+
+        envoltura.invalidar = lambda: invalidar_tags(*tags)
+        return envoltura
+
+    return decorador
+
+
+def cache_vista(tags: Iterable[str] = (), timeout: int = CACHE_TTL_POR_DEFECTO):
+    """
+    Cachea la respuesta de un método GET de DRF. Sólo para vistas cuya respuesta
+    no depende del usuario autenticado; únicamente se guardan respuestas 200.
+    """
+    tags = tuple(tags)
+
+    def decorador(metodo):
+        nombre = f"{metodo.__module__}.{metodo.__qualname__}"
+
+        @functools.wraps(metodo)
+        def envoltura(self, request, *args, **kwargs):
+            params = sorted(request.query_params.lists())
+            validador = getattr(getattr(request, "_request", request), ATRIBUTO_VALIDADOR, None)
+            clave = construir_clave(nombre, tags, [request.path, params, kwargs, validador])
+            datos = cache.get(clave)
+            if datos is not None:
+                return Response(datos)
+
+            response = metodo(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK and isinstance(response, Response):
+                cache.set(clave, response.data, timeout)
+            return response
+
+        return envoltura
+
+    return decorador
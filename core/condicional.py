@@ -0,0 +1,115 @@
+# core/condicional.py
+"""
+GET condicional (ETag / Last-Modified) sin serializar la respuesta.
+
+Los validadores se calculan antes de ejecutar la vista, con
+`django.views.decorators.http.condition`; si el cliente ya tiene la versión
+vigente se responde 304 sin tocar el serializer ni leer el CSV.
+
+- Tablas: `MarcaCambio` guarda un contador por tabla que se incrementa al
+  confirmar cada escritura (`registrar_cambio`). Una consulta por PK basta.
+- Archivos: mtime y tamaño de los CSV/modelos generados por la IA.
+"""
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+from typing import Callable, Iterable, Optional
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from .cache import ATRIBUTO_VALIDADOR
+from .models import MarcaCambio
+
+
+# ============================================
+# MARCAS DE CAMBIO POR TABLA
+# ============================================
+def _incrementar(tablas) -> None:
+    ahora = timezone.now()
+    actualizadas = MarcaCambio.objects.filter(tabla__in=tablas).update(version=F("version") + 1, actualizado=ahora)
+    if actualizadas < len(tablas):
+        MarcaCambio.objects.bulk_create(
+            [MarcaCambio(tabla=t, actualizado=ahora) for t in tablas],
+            ignore_conflicts=True,
+        )
+
+
+def registrar_cambio(*tablas: str) -> None:
+    """
+    Marca las tablas como modificadas al confirmar la transacción actual: así la
+    fila del contador no queda bloqueada mientras dura la transacción que escribe.
+    """
+    tablas = tuple(tablas)
+    transaction.on_commit(lambda: _incrementar(tablas))
+
+
+def _marcas(request, tablas: tuple) -> dict:
+    # condition() pide ETag y Last-Modified por separado: una sola consulta por request
+    memo = getattr(request, "_marcas_cambio", None)
+    if memo is None or memo[0] != tablas:
+        marcas = dict(
+            (t, (v, a))
+            for t, v, a in MarcaCambio.objects.filter(tabla__in=tablas).values_list("tabla", "version", "actualizado")
+        )
+        memo = (tablas, marcas)
+        request._marcas_cambio = memo
+    return memo[1]
+
+
+def _etag(request, partes) -> str:
+    """ETag de las partes; queda en el request para que `cache_vista` lo use en su clave."""
+    valor = hashlib.sha1("|".join(str(p) for p in partes).encode("utf-8")).hexdigest()
+    setattr(getattr(request, "_request", request), ATRIBUTO_VALIDADOR, valor)
+    return valor
+
+
+def condicional_tablas(*tablas: str):
+    """Decorador para métodos GET de DRF cuya respuesta sólo depende de estas tablas (y de la URL)."""
+    tablas = tuple(sorted(tablas))
+
+    def etag(request, *args, **kwargs):
+        marcas = _marcas(request, tablas)
+        return _etag(request, [request.get_full_path(), *(f"{t}:{marcas.get(t, (0,))[0]}" for t in tablas)])
+
+    def ultima_modificacion(request, *args, **kwargs):
+        fechas = [a for _, a in _marcas(request, tablas).values()]
+        return max(fechas) if fechas else None
+
+    return method_decorator(condition(etag_func=etag, last_modified_func=ultima_modificacion))
+
+
+# ============================================
+# ARCHIVOS GENERADOS (CSV / MODELOS)
+# ============================================
+def condicional_archivos(rutas: Callable[..., Iterable]):
+    """
+    Decorador para métodos GET cuya respuesta se construye a partir de archivos.
+    `rutas(request, *args, **kwargs)` devuelve los Path de los que depende; si
+    falta alguno no se emiten validadores y la vista responde como siempre.
+    """
+
+    def _stats(request, *args, **kwargs) -> Optional[list]:
+        stats = []
+        for ruta in rutas(request, *args, **kwargs):
+            try:
+                stats.append((str(ruta), ruta.stat()))
+            except OSError:
+                return None
+        return stats
+
+    def etag(request, *args, **kwargs):
+        stats = _stats(request, *args, **kwargs)
+        if not stats:
+            return None
+        return _etag(request, [request.get_full_path(), *(f"{r}:{s.st_mtime_ns}:{s.st_size}" for r, s in stats)])
+
+    def ultima_modificacion(request, *args, **kwargs):
+        stats = _stats(request, *args, **kwargs)
+        if not stats:
+            return None
+        return datetime.fromtimestamp(max(s.st_mtime for _, s in stats), tz=dt_timezone.utc)
+
+    return method_decorator(condition(etag_func=etag, last_modified_func=ultima_modificacion))
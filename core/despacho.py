@@ -0,0 +1,74 @@
+# core/despacho.py
+"""Despacho de notificaciones programadas.
+
+Las notificaciones en estado PROGRAMADA cuya `programada_para` ya pasó se
+reclaman de a una con `select_for_update(skip_locked=True)` en una transacción
+corta que las pasa a ENVIANDO; el envío ocurre después, fuera de la transacción
+y sin bloqueos, así varios workers `despachar_notificaciones` pueden correr en
+paralelo sin tomar la misma notificación. Los envíos desde la API
+(`Notificacion.reclamar_envio`) también pasan por ENVIANDO, así que el despacho
+no toma una notificación que la API está enviando, ni al revés.
+
+Cada bloque de tokens enviado se registra (entregas, contadores y cursor) en su
+propia transacción. Si un worker muere a mitad de envío, la notificación queda
+en ENVIANDO sin latido (`updated_at`); pasado ENVIO_SIN_LATIDO otro worker la
+reclama y sigue desde el cursor: sólo se repite el bloque que estaba en curso.
+Un error durante el envío la deja FALLIDA en lugar de reintentarla sin fin.
+"""
+import logging
+import os
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Notificacion
+
+logger = logging.getLogger(__name__)
+
+# Segundos sin registrar un bloque tras los cuales un envío en curso se da por abandonado
+ENVIO_SIN_LATIDO = int(os.getenv("NOTIFICACIONES_ENVIO_SIN_LATIDO", "600"))
+
+
+def _reclamar_siguiente():
+    """Pasa a ENVIANDO la siguiente notificación vencida (o abandonada) y la devuelve."""
+    ahora = timezone.now()
+    with transaction.atomic():
+        notificacion = (
+            Notificacion.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(estado=Notificacion.Estado.PROGRAMADA, programada_para__lte=ahora)
+                | Q(estado=Notificacion.Estado.ENVIANDO, updated_at__lt=ahora - timedelta(seconds=ENVIO_SIN_LATIDO))
+            )
+            .order_by("programada_para", "id")
+            .first()
+        )
+        if notificacion is None:
+            return None, False
+        reanudar = notificacion.estado == Notificacion.Estado.ENVIANDO
+        notificacion.estado = Notificacion.Estado.ENVIANDO
+        notificacion.save(update_fields=["estado", "updated_at"])
+    if reanudar:
+        logger.warning("Reanudando el envío abandonado de la notificación %s", notificacion.pk)
+    return notificacion, reanudar
+
+
+def despachar_notificaciones_programadas(limite: int = 20) -> dict:
+    """Envía hasta `limite` notificaciones vencidas. Devuelve {"enviadas", "fallidas"}."""
+    conteo = {"enviadas": 0, "fallidas": 0}
+    for _ in range(limite):
+        notificacion, reanudar = _reclamar_siguiente()
+        if notificacion is None:
+            break
+        try:
+            notificacion.enviar(reanudar=reanudar)
+        except Exception as e:
+            logger.exception("Error enviando la notificación programada %s", notificacion.pk)
+            notificacion.marcar_fallida(e)
+
+        if notificacion.estado == Notificacion.Estado.ENVIADA:
+            conteo["enviadas"] += 1
+        else:
+            conteo["fallidas"] += 1
+    return conteo
@@ -0,0 +1,107 @@
+import copy
+import importlib.util
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el costo de conexión a la BD por request: conexión nueva en cada request, "
+        "conexiones persistentes con health check y pool de psycopg (si está disponible), "
+        "con ráfagas de N hilos simulando el ciclo de request de Django."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400, help='Requests simulados por modo')
+        parser.add_argument('--hilos', type=int, default=8, help='Hilos simultáneos (ráfaga)')
+        parser.add_argument('--consulta', default='SELECT 1', help='Consulta de cada request')
+        parser.add_argument('--database', default='default', help='Alias de la BD')
+
+    # ------------------------------------------------------------------
+    # Modos: variantes de la configuración actual de la BD
+    # ------------------------------------------------------------------
+    def _modos(self, original):
+        base = copy.deepcopy(original)
+        base.setdefault("OPTIONS", {}).pop("pool", None)
+        modos = {
+            "conexión nueva por request": {**base, "CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False},
+            "persistente + health check": {**base, "CONN_MAX_AGE": 600, "CONN_HEALTH_CHECKS": True},
+        }
+        if original["ENGINE"] == "django.db.backends.postgresql":
+            if not all(importlib.util.find_spec(m) for m in ("psycopg", "psycopg_pool")):
+                self.stdout.write(self.style.WARNING("⚠️ Sin psycopg 3 + psycopg_pool: se omite el modo pool"))
+            else:
+                pool = {"min_size": 2, "max_size": max(self._hilos, 2), "timeout": 10}
+                modos["pool psycopg"] = {
+                    **base, "CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": True,
+                    "OPTIONS": {**base["OPTIONS"], "pool": pool},
+                }
+        return modos
+
+    def _correr(self, alias, consulta, total):
+        """Cada hilo repite el ciclo de un request: señales de inicio/fin y una consulta."""
+        def trabajo(cantidad):
+            latencias = []
+            for _ in range(cantidad):
+                inicio = time.perf_counter()
+                request_started.send(sender=self.__class__)
+                with connections[alias].cursor() as cursor:
+                    cursor.execute(consulta)
+                    cursor.fetchall()
+                request_finished.send(sender=self.__class__)
+                latencias.append(time.perf_counter() - inicio)
+            connections.close_all()
+            return latencias
+
+        partes = [total // self._hilos + (1 if i < total % self._hilos else 0) for i in range(self._hilos)]
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self._hilos) as pool:
+            latencias = [t for parte in pool.map(trabajo, partes) for t in parte]
+        return latencias, time.perf_counter() - inicio
+
+    def handle(self, *args, **kwargs):
+        alias, total = kwargs['database'], kwargs['requests']
+        self._hilos = max(1, kwargs['hilos'])
+        settings_dict = connections[alias].settings_dict
+        original = copy.deepcopy(settings_dict)
+        self.stdout.write(
+            f"🔌 BD {alias}: {original['ENGINE'].rsplit('.', 1)[-1]} en {original.get('HOST') or 'local'} | "
+            f"{total} requests por modo | {self._hilos} hilos"
+        )
+
+        aperturas = []
+
+        def contar(sender, connection, **kwargs):
+            if connection.alias == alias:
+                aperturas.append(1)
+
+        connection_created.connect(contar)
+        try:
+            for nombre, config in self._modos(original).items():
+                # Los hilos nuevos crean su DatabaseWrapper a partir de este mismo dict
+                connections.close_all()
+                settings_dict.clear()
+                settings_dict.update(config)
+                aperturas.clear()
+                latencias, duracion = self._correr(alias, kwargs['consulta'], total)
+                if getattr(connections[alias], "close_pool", None):
+                    connections[alias].close_pool()
+                latencias = sorted(t * 1000 for t in latencias)
+                self.stdout.write(
+                    f"   {nombre:<28} {total / duracion:>8.1f} req/s | p50={statistics.median(latencias):.2f} ms | "
+                    f"p95={latencias[max(int(len(latencias) * 0.95) - 1, 0)]:.2f} ms | "
+                    f"conexiones abiertas={len(aperturas)}"
+                )
+        finally:
+            connection_created.disconnect(contar)
+            connections.close_all()
+            settings_dict.clear()
+            settings_dict.update(original)
+
+        self.stdout.write(self.style.SUCCESS("✅ Benchmark de conexiones terminado"))
@@ -0,0 +1,122 @@
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+RUTA_LOGIN = "/api/authz/login/"
+CONTRASENA = "bench-login-123"
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de login (/api/authz/login/) en ráfaga, como la ola de logins tras una "
+        "actualización de la app: crea usuarios temporales, mide el primer login (crea token "
+        "y perfil) y el login repetido, con N hilos simultáneos, y los borra al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=200, help='Usuarios temporales (un login por ronda)')
+        parser.add_argument('--hilos', type=int, default=8, help='Logins simultáneos')
+        parser.add_argument('--con-fcm', action='store_true', help='Enviar registration_id en cada login')
+        parser.add_argument('--hasher-rapido', action='store_true',
+                            help='Usar MD5 en vez de PBKDF2 para medir sólo el costo sin hash')
+        parser.add_argument('--permitir-bd-remota', action='store_true',
+                            help='Permitir escribir en una BD que no es SQLite ni localhost')
+
+    def _verificar_bd_local(self, permitir_remota):
+        if permitir_remota or connection.vendor == 'sqlite':
+            return
+        host = connection.settings_dict.get('HOST') or 'localhost'
+        if host not in ('localhost', '127.0.0.1', '::1'):
+            raise CommandError(
+                f"La BD apunta a {host}: el benchmark crea y borra usuarios. "
+                "Usa SQLite/Postgres local o --permitir-bd-remota."
+            )
+
+    # ------------------------------------------------------------------
+    # Medición
+    # ------------------------------------------------------------------
+    def _login(self, email):
+        datos = {"email": email, "password": CONTRASENA}
+        if self._con_fcm:
+            datos["registration_id"] = f"{self._prefijo}fcm_{email}"
+        inicio = time.perf_counter()
+        respuesta = Client().post(RUTA_LOGIN, datos, content_type="application/json")
+        return time.perf_counter() - inicio, respuesta.status_code
+
+    def _rafaga(self, nombre, emails, hilos):
+        def trabajo(parte):
+            try:
+                return [self._login(email) for email in parte]
+            finally:
+                connections.close_all()
+
+        partes = [emails[i::hilos] for i in range(hilos)]
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            resultados = [r for parte in pool.map(trabajo, partes) for r in parte]
+        duracion = time.perf_counter() - inicio
+
+        latencias = sorted(t * 1000 for t, _ in resultados)
+        errores = sum(1 for _, codigo in resultados if codigo != 200)
+        self.stdout.write(
+            f"   {nombre:<16} {len(emails) / duracion:>7.1f} logins/s | p50={statistics.median(latencias):.1f} ms | "
+            f"p95={latencias[max(int(len(latencias) * 0.95) - 1, 0)]:.1f} ms | errores={errores}"
+        )
+
+    def _consultas(self, email):
+        with CaptureQueriesContext(connection) as consultas:
+            self._login(email)
+        return len(consultas)
+
+    def _medir(self, usuarios, hilos):
+        self._prefijo = f"bench_login_{uuid.uuid4().hex[:8]}_"
+        emails = [f"{self._prefijo}{i}@bench.local" for i in range(usuarios)]
+        # Un solo hash para todos: crear N usuarios no cuesta N hashes
+        hash_ = make_password(CONTRASENA)
+        User.objects.bulk_create([User(username=e, email=e, password=hash_) for e in emails], batch_size=500)
+        try:
+            inicio = time.perf_counter()
+            User().check_password(CONTRASENA)
+            User(password=hash_).check_password(CONTRASENA)
+            self.stdout.write(f"   hash de contraseña: {(time.perf_counter() - inicio) / 2 * 1000:.1f} ms por login")
+
+            self.stdout.write(
+                f"   consultas por login: primero={self._consultas(emails[0])} | "
+                f"repetido={self._consultas(emails[0])}"
+            )
+            self._rafaga("primer login", emails[1:], hilos)
+            self._rafaga("login repetido", emails[1:], hilos)
+        finally:
+            from authz import views as vistas_authz
+            from tienda.models import FCMDevice
+
+            # LOGIN_FCM_DIFERIDO: registros pendientes antes de borrar a sus usuarios
+            vistas_authz._POOL_FCM.shutdown(wait=True)
+
+            FCMDevice.objects.filter(registration_id__startswith=self._prefijo).delete()
+            User.objects.filter(username__startswith=self._prefijo).delete()
+
+    def handle(self, *args, **kwargs):
+        self._verificar_bd_local(kwargs['permitir_bd_remota'])
+        self._con_fcm = kwargs['con_fcm']
+        usuarios, hilos = max(2, kwargs['usuarios']), max(1, kwargs['hilos'])
+        self.stdout.write(
+            f"🔑 Login: {usuarios} usuarios | {hilos} hilos | FCM={'sí' if self._con_fcm else 'no'} | "
+            f"hasher={'MD5' if kwargs['hasher_rapido'] else 'por defecto'}"
+        )
+
+        ajustes = {"ALLOWED_HOSTS": ["testserver"]}
+        if kwargs['hasher_rapido']:
+            ajustes["PASSWORD_HASHERS"] = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+        with override_settings(**ajustes):
+            self._medir(usuarios, hilos)
+
+        self.stdout.write(self.style.SUCCESS("✅ Benchmark de login terminado"))
@@ -0,0 +1,86 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.test import RequestFactory, override_settings
+from django.urls import resolve
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+
+from core.renderers import ORJSON_DISPONIBLE, JSONRapidoRenderer, JsonResponseRapida
+
+URLS_EJEMPLO = [
+    "/api/detalleventas/",
+    "/api/ventas/",
+    "/api/productos/",
+    "/api/ia/ventas-historicas/?scope=total",
+]
+
+
+def _datos_reporte_ventas():
+    from reportes.services.generador_reportes import GeneradorReportes
+
+    return {"success": True, "reporte": GeneradorReportes().reporte_ventas_general({"limite": 500})}
+
+
+class Command(BaseCommand):
+    help = "Mide bytes (plano/gzip) y tiempo de codificación JSON por endpoint: encoder estándar vs orjson"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', help='Endpoint GET de DRF a medir (se puede repetir)')
+        parser.add_argument('--iteraciones', type=int, default=200, help='Codificaciones por endpoint')
+
+    def _medir(self, codificar, iteraciones):
+        inicio = time.perf_counter()
+        for _ in range(iteraciones):
+            contenido = codificar()
+        return contenido, (time.perf_counter() - inicio) * 1_000_000 / iteraciones
+
+    def _reportar(self, nombre, estandar, rapido, iteraciones):
+        plano, t_estandar = self._medir(estandar, iteraciones)
+        _, t_rapido = self._medir(rapido, iteraciones)
+        gzip = len(compress_string(plano))
+        self.stdout.write(
+            f"📦 {nombre}\n"
+            f"   bytes={len(plano):,} | gzip={gzip:,} ({gzip / max(len(plano), 1):.0%})\n"
+            f"   estándar={t_estandar:.1f} µs | rápido={t_rapido:.1f} µs | x{t_estandar / max(t_rapido, 1e-9):.1f}"
+        )
+
+    def handle(self, *args, **kwargs):
+        iteraciones = kwargs['iteraciones']
+        if not ORJSON_DISPONIBLE:
+            self.stdout.write(self.style.WARNING("⚠️ orjson no está instalado: ambos lados usan la librería estándar"))
+
+        factory = RequestFactory()
+        estandar, rapido = JSONRenderer(), JSONRapidoRenderer()
+
+        # Los links de paginación validan el host de la petición de prueba
+        with override_settings(ALLOWED_HOSTS=["testserver"]):
+            for url in kwargs['url'] or URLS_EJEMPLO:
+                request = factory.get(url)
+                try:
+                    match = resolve(request.path)
+                    response = match.func(request, *match.args, **match.kwargs)
+                except Exception as e:
+                    self.stdout.write(self.style.WARNING(f"⚠️ {url}: {e}, se omite"))
+                    continue
+                datos = getattr(response, 'data', None)
+                if response.status_code != 200 or datos is None:
+                    self.stdout.write(self.style.WARNING(f"⚠️ {url}: status {response.status_code}, se omite"))
+                    continue
+                self._reportar(url, lambda: estandar.render(datos), lambda: rapido.render(datos), iteraciones)
+
+        # Reportes: vistas Django puras con JsonResponse (montos en Decimal, hasta 500 filas)
+        try:
+            datos = _datos_reporte_ventas()
+        except Exception as e:
+            self.stdout.write(self.style.WARNING(f"⚠️ reporte de ventas: {e}"))
+            return
+        self._reportar(
+            "reportes/ventas (limite=500)",
+            lambda: json.dumps(datos, cls=DjangoJSONEncoder).encode(),
+            lambda: JsonResponseRapida(datos).content,
+            iteraciones,
+        )
+        self.stdout.write(self.style.SUCCESS("✅ Benchmark terminado"))
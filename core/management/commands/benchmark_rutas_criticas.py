@@ -0,0 +1,297 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+
+GRUPOS = ("catalogo", "checkout", "reportes", "ia", "exportadores", "push")
+SALIDA_POR_DEFECTO = Path(settings.BASE_DIR) / "benchmarks" / "resultados.json"
+
+CARRITOS = (1, 10, 50)
+TOKENS_PUSH = 5000
+
+
+class _Omitido(Exception):
+    """El benchmark no aplica en este entorno (falta un modelo, un dataset, etc.)."""
+
+
+class _FCMFalso:
+    """Backend FCM con latencia fija por lote, para ver el efecto del pool de hilos."""
+
+    def __init__(self, latencia: float):
+        self.latencia = latencia
+
+    def enviar_multicast(self, tokens, plataforma, titulo, cuerpo, datos):
+        time.sleep(self.latencia)
+        return [None for _ in tokens]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de las rutas críticas (catálogo, checkout, reportes, IA, exportadores, push). "
+        "Escribe los resultados en JSON y los compara con una línea base."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iteraciones', type=int, default=20, help='Repeticiones por medición')
+        parser.add_argument('--grupo', action='append', choices=GRUPOS, help='Grupos a medir (por defecto todos)')
+        parser.add_argument('--sembrar-ventas', type=int, default=0,
+                            help='Crear N ventas con generar_ventas antes de medir')
+        parser.add_argument('--sinteticos', type=int, default=0,
+                            help='Regenerar los CSV de IA con N ventas sintéticas (usa IA_DATA_DIR)')
+        parser.add_argument('--entrenar', action='store_true',
+                            help='Incluir entrenar_panel (sobrescribe los modelos de MODEL_DIR)')
+        parser.add_argument('--salida', default=str(SALIDA_POR_DEFECTO), help='Archivo JSON de resultados')
+        parser.add_argument('--baseline', help='JSON de una corrida anterior para comparar')
+        parser.add_argument('--tolerancia', type=float, default=0.20,
+                            help='Regresión de p50 tolerada respecto de la línea base (0.20 = 20%%)')
+        parser.add_argument('--permitir-bd-remota', action='store_true',
+                            help='Permitir escribir en una BD que no es SQLite ni localhost')
+
+    # ------------------------------------------------------------------
+    # Utilidades
+    # ------------------------------------------------------------------
+    def _verificar_bd_local(self, permitir_remota):
+        if permitir_remota or connection.vendor == 'sqlite':
+            return
+        host = connection.settings_dict.get('HOST') or 'localhost'
+        if host not in ('localhost', '127.0.0.1', '::1'):
+            raise CommandError(
+                f"La BD apunta a {host}: el benchmark crea ventas y toca stock. "
+                "Usa SQLite/Postgres local o --permitir-bd-remota."
+            )
+
+    def _medir(self, nombre, funcion, iteraciones, preparar=None):
+        tiempos = []
+        for _ in range(iteraciones):
+            if preparar:
+                preparar()
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        tiempos.sort()
+        resultado = {
+            "n": len(tiempos),
+            "p50_ms": round(statistics.median(tiempos), 3),
+            "p95_ms": round(tiempos[max(int(len(tiempos) * 0.95) - 1, 0)], 3),
+            "min_ms": round(tiempos[0], 3),
+        }
+        self.resultados[nombre] = resultado
+        self.stdout.write(
+            f"⏱️  {nombre}: p50={resultado['p50_ms']:.2f} ms | p95={resultado['p95_ms']:.2f} ms | n={resultado['n']}"
+        )
+
+    def _grupo(self, nombre, funcion, *args):
+        self.stdout.write(f"\n📊 {nombre}")
+        try:
+            funcion(*args)
+        except _Omitido as e:
+            self.stdout.write(self.style.WARNING(f"⚠️ {nombre} omitido: {e}"))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"❌ {nombre} falló: {e}"))
+
+    # ------------------------------------------------------------------
+    # Grupos
+    # ------------------------------------------------------------------
+    def _catalogo(self, iteraciones):
+        cliente = Client()
+        for url in ("/api/categorias/", "/api/subcategorias/", "/api/productos/"):
+            self._medir(f"catalogo{url}frio", lambda: cliente.get(url), iteraciones, preparar=cache.clear)
+            cliente.get(url)
+            self._medir(f"catalogo{url}cache", lambda: cliente.get(url), iteraciones)
+            etag = cliente.get(url).get("ETag")
+            if etag:
+                self._medir(f"catalogo{url}304", lambda: cliente.get(url, HTTP_IF_NONE_MATCH=etag), iteraciones)
+
+    def _checkout(self, iteraciones):
+        from rest_framework.authtoken.models import Token
+
+        from authz.models import Usuario
+        from core.pagos import procesar_eventos_pendientes, registrar_evento_stripe
+        from tienda.models import Productos
+
+        usuario = Usuario.objects.select_related('user').first()
+        if usuario is None:
+            raise _Omitido("no hay usuarios en la BD")
+        token, _ = Token.objects.get_or_create(user=usuario.user)
+        cliente = Client()
+
+        # Todo se revierte al final: la BD queda igual que antes del benchmark
+        with transaction.atomic():
+            faltantes = max(CARRITOS) - Productos.objects.filter(estado='Activo').count()
+            Productos.objects.bulk_create(
+                [Productos(descripcion=f"BENCH {i}", precio=10, stock=0, estado='Activo') for i in range(faltantes)]
+            )
+            productos = list(Productos.objects.filter(estado='Activo').values_list('id', flat=True)[:max(CARRITOS)])
+            Productos.objects.filter(id__in=productos).update(stock=10_000_000)
+
+            for n in CARRITOS:
+                items = [{"producto_id": pid, "cantidad": 1, "precio": "10.00"} for pid in productos[:n]]
+                sesiones = []
+
+                def registrar():
+                    session_id = f"cs_bench_{uuid.uuid4().hex}"
+                    sesiones.append(session_id)
+                    registrar_evento_stripe({
+                        "id": f"evt_bench_{uuid.uuid4().hex}",
+                        "type": "checkout.session.completed",
+                        "data": {"object": {
+                            "id": session_id,
+                            "object": "checkout.session",
+                            "payment_status": "paid",
+                            "payment_intent": f"pi_bench_{uuid.uuid4().hex}",
+                            "metadata": {"usuario_id": usuario.id, "total": 10 * n, "items": json.dumps(items)},
+                        }},
+                    })
+
+                self._medir(f"checkout/procesar_evento[{n} items]",
+                            lambda: procesar_eventos_pendientes(limite=1), iteraciones, preparar=registrar)
+                self._medir(
+                    f"checkout/verificar_pago[{n} items]",
+                    lambda: cliente.get("/api/verificar-pago/", {"session_id": sesiones[-1]},
+                                        HTTP_AUTHORIZATION=f"Token {token.key}"),
+                    iteraciones,
+                )
+            transaction.set_rollback(True)
+
+    def _reportes(self, iteraciones):
+        from reportes.management.commands.benchmark_interpretador import COMANDOS_EJEMPLO
+        from reportes.services import cache_reportes
+        from reportes.services.generador_reportes import GeneradorReportes
+
+        generador = GeneradorReportes()
+
+        def limpiar():
+            cache_reportes.comandos.clear()
+            cache_reportes.resultados.clear()
+
+        def corpus():
+            for comando in COMANDOS_EJEMPLO:
+                generador.reporte_por_comando(comando)
+
+        self._medir(f"reportes/reporte_por_comando[{len(COMANDOS_EJEMPLO)} comandos]frio",
+                    corpus, iteraciones, preparar=limpiar)
+        self._medir(f"reportes/reporte_por_comando[{len(COMANDOS_EJEMPLO)} comandos]cache", corpus, iteraciones)
+
+    def _ia(self, iteraciones, entrenar):
+        from scikit_learn_ia.predict_sales_panel import VALID_SCOPES, predict_12
+
+        # El entrenamiento es caro: pocas repeticiones bastan para ver tendencias
+        repeticiones = max(1, min(iteraciones, 3))
+        if entrenar:
+            from scikit_learn_ia.train_model_panel import PANEL_FILES, entrenar_panel
+
+            for scope, ruta in PANEL_FILES.items():
+                if not ruta.exists():
+                    self.stdout.write(self.style.WARNING(f"⚠️ entrenar_panel[{scope}]: falta {ruta.name}"))
+                    continue
+                try:
+                    self._medir(f"ia/entrenar_panel[{scope}]", lambda: entrenar_panel(scope, ruta), repeticiones)
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f"❌ entrenar_panel[{scope}]: {e}"))
+
+        for scope in sorted(VALID_SCOPES):
+            try:
+                predict_12(scope, top_k=10)
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f"⚠️ predict_12[{scope}]: {e}"))
+                continue
+            self._medir(f"ia/predict_12[{scope}]", lambda: predict_12(scope, top_k=10), repeticiones)
+
+    def _exportadores(self, iteraciones):
+        from reportes.services.exportadores import GestorExportaciones
+        from reportes.services.generador_reportes import GeneradorReportes
+
+        reporte = GeneradorReportes().reporte_ventas_general({"limite": 500})
+        gestor = GestorExportaciones()
+        for formato in ("pdf", "excel", "json"):
+            self._medir(f"exportadores/{formato}",
+                        lambda: gestor.exportar_reporte(reporte, formato, "ventas"), iteraciones)
+
+    def _push(self, iteraciones):
+        from core.notifications import enviar_tokens_push
+
+        tokens = [(f"token-bench-{i}", "android" if i % 2 else "ios") for i in range(TOKENS_PUSH)]
+        backend = _FCMFalso(latencia=0.05)
+        self._medir(f"push/enviar_tokens_push[{TOKENS_PUSH} tokens, 50 ms/lote]",
+                    lambda: enviar_tokens_push(tokens, "Bench", "Benchmark", backend=backend),
+                    max(1, min(iteraciones, 5)))
+
+    # ------------------------------------------------------------------
+    def _sembrar(self, ventas, sinteticos):
+        if ventas:
+            self.stdout.write(f"🌱 Sembrando {ventas} ventas en la BD...")
+            call_command('generar_ventas', cantidad=ventas, stdout=self.stdout)
+        if sinteticos:
+            self.stdout.write(f"🌱 Generando CSV sintéticos con {sinteticos} ventas en IA_DATA_DIR...")
+            entorno = {**os.environ, "IA_SINTETICOS_VENTAS": str(sinteticos), "PYTHONPATH": str(settings.BASE_DIR)}
+            proc = subprocess.run(
+                [sys.executable, "-m", "scikit_learn_ia.generar_datos_sinteticos"],
+                cwd=str(settings.BASE_DIR), env=entorno, capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                raise CommandError(f"Falló el generador sintético:\n{proc.stderr[-2000:]}")
+
+    def _comparar(self, ruta_baseline, tolerancia):
+        base = json.loads(Path(ruta_baseline).read_text(encoding="utf-8")).get("resultados", {})
+        regresiones = 0
+        self.stdout.write("\n📈 Comparación con la línea base")
+        for nombre, actual in self.resultados.items():
+            anterior = base.get(nombre)
+            if not anterior:
+                continue
+            cambio = actual["p50_ms"] / max(anterior["p50_ms"], 1e-6) - 1
+            if cambio > tolerancia:
+                regresiones += 1
+                self.stdout.write(self.style.WARNING(
+                    f"⚠️ {nombre}: {anterior['p50_ms']:.2f} → {actual['p50_ms']:.2f} ms (+{cambio:.0%})"))
+            else:
+                self.stdout.write(f"   {nombre}: {anterior['p50_ms']:.2f} → {actual['p50_ms']:.2f} ms ({cambio:+.0%})")
+        return regresiones
+
+    def handle(self, *args, **kwargs):
+        grupos = kwargs['grupo'] or GRUPOS
+        iteraciones = kwargs['iteraciones']
+        if kwargs['sembrar_ventas'] or 'checkout' in grupos:
+            self._verificar_bd_local(kwargs['permitir_bd_remota'])
+        self._sembrar(kwargs['sembrar_ventas'], kwargs['sinteticos'])
+
+        self.resultados = {}
+        # Los links de paginación y el test client validan el host 'testserver'
+        with override_settings(ALLOWED_HOSTS=["testserver"]):
+            for grupo in grupos:
+                if grupo == 'ia':
+                    self._grupo(grupo, self._ia, iteraciones, kwargs['entrenar'])
+                else:
+                    self._grupo(grupo, getattr(self, f"_{grupo}"), iteraciones)
+
+        salida = Path(kwargs['salida'])
+        salida.parent.mkdir(parents=True, exist_ok=True)
+        salida.write_text(json.dumps({
+            "generado": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "entorno": {
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "bd": connection.vendor,
+                "iteraciones": iteraciones,
+            },
+            "resultados": self.resultados,
+        }, indent=2, ensure_ascii=False), encoding="utf-8")
+        self.stdout.write(self.style.SUCCESS(f"\n✅ {len(self.resultados)} mediciones guardadas en {salida}"))
+
+        if kwargs['baseline']:
+            regresiones = self._comparar(kwargs['baseline'], kwargs['tolerancia'])
+            if regresiones:
+                raise CommandError(f"{regresiones} medición(es) por encima de la tolerancia")
@@ -0,0 +1,209 @@
+import asyncio
+import json
+import os
+import statistics
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+
+ENDPOINTS = ("checkout", "push")
+RUTAS = {"checkout": "/api/crear-checkout-session/", "push": "/api/admin/send-notification/"}
+PREFIJO = "carga_async"
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga de las vistas async (checkout de Stripe y envío FCM) con los servicios "
+        "externos simulados: WSGI con N hilos vs ASGI en un solo event loop, o contra un servidor "
+        "en marcha con --url."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', action='append', choices=ENDPOINTS, help='Endpoints a probar (por defecto todos)')
+        parser.add_argument('--requests', type=int, default=200, help='Requests por endpoint y modo')
+        parser.add_argument('--concurrencia', type=int, default=50, help='Requests simultáneos en ASGI / contra --url')
+        parser.add_argument('--hilos', type=int, default=4,
+                            help='Hilos del modo WSGI (equivale a workers × threads de gunicorn sync)')
+        parser.add_argument('--latencia', type=int, default=200, help='Latencia simulada de Stripe/FCM en ms')
+        parser.add_argument('--url', help='Servidor en marcha (p. ej. http://127.0.0.1:8000), arrancado con '
+                                          'SIMULAR_STRIPE=1 SIMULAR_FCM=1 SIMULAR_LATENCIA_MS=...')
+        parser.add_argument('--permitir-bd-remota', action='store_true',
+                            help='Permitir crear los datos de prueba en una BD que no es SQLite ni localhost')
+
+    # ------------------------------------------------------------------
+    # Datos de prueba (se borran al terminar)
+    # ------------------------------------------------------------------
+    def _verificar_bd_local(self, permitir_remota):
+        if permitir_remota or connection.vendor == 'sqlite':
+            return
+        host = connection.settings_dict.get('HOST') or 'localhost'
+        if host not in ('localhost', '127.0.0.1', '::1'):
+            raise CommandError(f"La BD apunta a {host}: usa una BD local o --permitir-bd-remota.")
+
+    def _crear_datos(self):
+        from rest_framework.authtoken.models import Token
+
+        from authz.models import Usuario
+        from tienda.models import FCMDevice, Productos
+
+        sufijo = uuid.uuid4().hex[:8]
+        user = User.objects.create_user(username=f"{PREFIJO}_{sufijo}", password=uuid.uuid4().hex)
+        usuario = Usuario.objects.create(user=user)
+        token = Token.objects.create(user=user)
+        producto = Productos.objects.create(descripcion=f"{PREFIJO} {sufijo}", precio=10, stock=1_000_000)
+        dispositivos = FCMDevice.objects.bulk_create(
+            [FCMDevice(usuario=usuario, registration_id=f"{PREFIJO}_{sufijo}_{i}") for i in range(10)]
+        )
+        return {
+            "user": user,
+            "producto": producto,
+            "token": token.key,
+            "cuerpos": {
+                "checkout": {"items": [{"producto_id": producto.id, "cantidad": 1}]},
+                "push": {"title": "Carga", "body": "Prueba de carga", "user_ids": [usuario.id]},
+            },
+            "dispositivos": len(dispositivos),
+        }
+
+    def _borrar_datos(self, datos):
+        # Usuario, Token y FCMDevice caen en cascada con el User
+        datos["producto"].delete()
+        datos["user"].delete()
+
+    # ------------------------------------------------------------------
+    # Modos
+    # ------------------------------------------------------------------
+    def _wsgi(self, ruta, cuerpo, token, total, hilos):
+        """Cliente de Django en N hilos: cada request ocupa su hilo durante la espera externa."""
+        def hacer(_):
+            inicio = time.perf_counter()
+            respuesta = Client().post(ruta, data=json.dumps(cuerpo), content_type="application/json",
+                                      HTTP_AUTHORIZATION=f"Token {token}")
+            connections.close_all()
+            return respuesta.status_code, time.perf_counter() - inicio
+
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            return list(pool.map(hacer, range(total)))
+
+    def _asgi(self, ruta, cuerpo, token, total, concurrencia):
+        """`config.asgi.application` llamada directamente (mismo camino que uvicorn) en un event loop."""
+        from config.asgi import application
+
+        contenido = json.dumps(cuerpo).encode()
+        encabezados = [
+            (b"host", b"localhost"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(contenido)).encode()),
+            (b"authorization", f"Token {token}".encode()),
+        ]
+
+        async def hacer(semaforo):
+            async with semaforo:
+                enviado = False
+                status = None
+
+                async def receive():
+                    nonlocal enviado
+                    if not enviado:
+                        enviado = True
+                        return {"type": "http.request", "body": contenido, "more_body": False}
+                    await asyncio.Event().wait()  # Django cancela la espera de desconexión al responder
+
+                async def send(mensaje):
+                    nonlocal status
+                    if mensaje["type"] == "http.response.start":
+                        status = mensaje["status"]
+
+                scope = {
+                    "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+                    "method": "POST", "scheme": "http", "path": ruta, "raw_path": ruta.encode(),
+                    "query_string": b"", "root_path": "", "headers": encabezados,
+                    "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", 80),
+                }
+                inicio = time.perf_counter()
+                await application(scope, receive, send)
+                return status, time.perf_counter() - inicio
+
+        async def todos():
+            semaforo = asyncio.Semaphore(concurrencia)
+            return await asyncio.gather(*(hacer(semaforo) for _ in range(total)))
+
+        return asyncio.run(todos())
+
+    def _http(self, url, ruta, cuerpo, token, total, concurrencia):
+        """Contra un servidor real (uvicorn/gunicorn) con urllib en `concurrencia` hilos."""
+        contenido = json.dumps(cuerpo).encode()
+
+        def hacer(_):
+            request = urllib.request.Request(
+                url.rstrip("/") + ruta, data=contenido, method="POST",
+                headers={"Content-Type": "application/json", "Authorization": f"Token {token}"},
+            )
+            inicio = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=60) as respuesta:
+                    status = respuesta.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+            except OSError:
+                status = 0
+            return status, time.perf_counter() - inicio
+
+        with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+            return list(pool.map(hacer, range(total)))
+
+    def _reportar(self, nombre, correr, total):
+        inicio = time.perf_counter()
+        resultados = correr()
+        duracion = time.perf_counter() - inicio
+        latencias = sorted(t * 1000 for _, t in resultados)
+        errores = sum(1 for status, _ in resultados if status != 200)
+        self.stdout.write(
+            f"   {nombre:<28} {total / duracion:>7.1f} req/s | p50={statistics.median(latencias):.0f} ms | "
+            f"p95={latencias[max(int(len(latencias) * 0.95) - 1, 0)]:.0f} ms | errores={errores}"
+        )
+        if errores:
+            codigos = sorted({status for status, _ in resultados if status != 200})
+            self.stdout.write(self.style.WARNING(f"   ⚠️ status distintos de 200: {codigos}"))
+
+    def handle(self, *args, **kwargs):
+        total, latencia = kwargs['requests'], kwargs['latencia']
+        self._verificar_bd_local(kwargs['permitir_bd_remota'])
+
+        if not kwargs['url']:
+            # Stripe y FCM simulados en este proceso (ver core/pagos.py y core/notifications.py)
+            os.environ.update({"SIMULAR_STRIPE": "1", "SIMULAR_FCM": "1", "SIMULAR_LATENCIA_MS": str(latencia)})
+
+        datos = self._crear_datos()
+        try:
+            for endpoint in kwargs['endpoint'] or ENDPOINTS:
+                ruta, cuerpo = RUTAS[endpoint], datos["cuerpos"][endpoint]
+                self.stdout.write(f"\n📊 {endpoint} ({ruta}) | {total} requests | latencia externa {latencia} ms")
+                if kwargs['url']:
+                    self._reportar(
+                        f"HTTP c={kwargs['concurrencia']}",
+                        lambda: self._http(kwargs['url'], ruta, cuerpo, datos["token"], total, kwargs['concurrencia']),
+                        total,
+                    )
+                    continue
+                self._reportar(
+                    f"WSGI {kwargs['hilos']} hilos",
+                    lambda: self._wsgi(ruta, cuerpo, datos["token"], total, kwargs['hilos']),
+                    total,
+                )
+                self._reportar(
+                    f"ASGI c={kwargs['concurrencia']}",
+                    lambda: self._asgi(ruta, cuerpo, datos["token"], total, kwargs['concurrencia']),
+                    total,
+                )
+        finally:
+            self._borrar_datos(datos)
+
+        self.stdout.write(self.style.SUCCESS("\n✅ Prueba de carga terminada"))
@@ -0,0 +1,74 @@
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+# Endpoints públicos (GET sin token) más consultados por la tienda y la app móvil
+RUTAS_CATALOGO = (
+    "/api/categorias/",
+    "/api/subcategorias/",
+    "/api/productos/",
+    "/api/productos/?page=2",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga HTTP de los endpoints del catálogo contra un servidor en marcha. Sirve para "
+        "comparar configuraciones de gunicorn, p. ej. `gunicorn config.wsgi` sin config vs "
+        "`gunicorn` con gunicorn.conf.py."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8080', help='Servidor en marcha')
+        parser.add_argument('--ruta', action='append', help='Rutas a probar (por defecto las del catálogo)')
+        parser.add_argument('--requests', type=int, default=500, help='Requests por ruta')
+        parser.add_argument('--concurrencia', type=int, default=16, help='Clientes simultáneos')
+        parser.add_argument('--calentamiento', type=int, default=20,
+                            help='Requests previos por ruta, fuera de la medición (caché, conexiones)')
+
+    def _get(self, url):
+        inicio = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=60) as respuesta:
+                respuesta.read()
+                status = respuesta.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except OSError:
+            status = 0
+        return status, time.perf_counter() - inicio
+
+    def _medir(self, url, total, concurrencia):
+        with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+            inicio = time.perf_counter()
+            resultados = list(pool.map(lambda _: self._get(url), range(total)))
+            return resultados, time.perf_counter() - inicio
+
+    def handle(self, *args, **kwargs):
+        base = kwargs['url'].rstrip('/')
+        total, concurrencia = kwargs['requests'], kwargs['concurrencia']
+        rutas = kwargs['ruta'] or RUTAS_CATALOGO
+
+        self.stdout.write(f"📊 Catálogo en {base} | {total} requests por ruta | concurrencia {concurrencia}\n")
+        total_requests = total_segundos = 0
+        for ruta in rutas:
+            url = base + ruta
+            if kwargs['calentamiento']:
+                self._medir(url, kwargs['calentamiento'], concurrencia)
+            resultados, duracion = self._medir(url, total, concurrencia)
+            latencias = sorted(t * 1000 for _, t in resultados)
+            errores = sorted({status for status, _ in resultados if status != 200})
+            total_requests += total
+            total_segundos += duracion
+            self.stdout.write(
+                f"   {ruta:<28} {total / duracion:>7.1f} req/s | p50={statistics.median(latencias):.0f} ms | "
+                f"p95={latencias[max(int(len(latencias) * 0.95) - 1, 0)]:.0f} ms"
+                + (self.style.WARNING(f" | status != 200: {errores}") if errores else "")
+            )
+
+        self.stdout.write(f"\n   {'TOTAL':<28} {total_requests / total_segundos:>7.1f} req/s")
+        self.stdout.write(self.style.SUCCESS("✅ Prueba de carga del catálogo terminada"))
@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tienda.models import FCMDevice
+
+
+class Command(BaseCommand):
+    help = "Elimina los dispositivos FCM inactivos desde hace más de N días (pensado para ejecutarse periódicamente)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=30, help='Antigüedad mínima de la desactivación')
+        parser.add_argument('--lote', type=int, default=1000, help='Filas eliminadas por DELETE')
+        parser.add_argument('--dry-run', action='store_true', help='Sólo contar, sin eliminar')
+
+    def handle(self, *args, **kwargs):
+        dias = kwargs['dias']
+        lote = kwargs['lote']
+        limite = timezone.now() - timedelta(days=dias)
+
+        candidatos = FCMDevice.objects.filter(activo=False, fecha_modificacion__lt=limite)
+
+        if kwargs['dry_run']:
+            self.stdout.write(f"🔎 {candidatos.count()} dispositivos inactivos desde antes de {limite:%Y-%m-%d}")
+            return
+
+        # Borrar por lotes de ids para no mantener bloqueos largos sobre la tabla
+        eliminados = 0
+        while True:
+            ids = list(candidatos.order_by('id').values_list('id', flat=True)[:lote])
+            if not ids:
+                break
+            borrados, _ = FCMDevice.objects.filter(id__in=ids).delete()
+            eliminados += borrados
+
+        self.stdout.write(self.style.SUCCESS(f"🧹 {eliminados} dispositivos FCM inactivos eliminados (> {dias} días)"))
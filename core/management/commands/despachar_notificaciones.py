@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.despacho import despachar_notificaciones_programadas
+
+
+class Command(BaseCommand):
+    help = "Envía las notificaciones programadas cuya fecha ya llegó (se pueden correr varios workers en paralelo)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=20, help='Notificaciones a despachar por iteración')
+        parser.add_argument('--loop', action='store_true', help='Quedarse escuchando en lugar de despachar un solo lote')
+        parser.add_argument('--intervalo', type=float, default=10.0, help='Segundos de espera cuando no hay notificaciones vencidas')
+
+    def handle(self, *args, **kwargs):
+        lote = kwargs['lote']
+        loop = kwargs['loop']
+        intervalo = kwargs['intervalo']
+
+        while True:
+            conteo = despachar_notificaciones_programadas(limite=lote)
+            total = sum(conteo.values())
+            if total:
+                self.stdout.write(f"🔔 Enviadas: {conteo['enviadas']} | Fallidas: {conteo['fallidas']}")
+            if not loop:
+                break
+            # Si el lote vino lleno seguimos sin esperar: hay más notificaciones vencidas
+            if total < lote:
+                time.sleep(intervalo)
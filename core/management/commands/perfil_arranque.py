@@ -0,0 +1,150 @@
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Lo mismo que hace un worker al arrancar: setup de Django (apps, señales) y carga de las URLs
+CODIGO_ARRANQUE = (
+    "import django; django.setup(); "
+    "from django.urls import get_resolver; get_resolver().url_patterns"
+)
+CODIGO_SOLO_SETUP = "import django; django.setup()"
+
+# import time:       self [us] |  cumulative | imported package
+_LINEA_IMPORTTIME = re.compile(r"^import time:\s+(\d+)\s*\|\s*(\d+)\s*\|( *)(\S+)\s*$")
+
+FUERA_DEL_PROYECTO = "(django y librerías)"
+
+
+def _paquetes_del_proyecto():
+    """Nombres importables de primer nivel que viven en BASE_DIR (apps, config, debug_views...)."""
+    base = settings.BASE_DIR
+    nombres = {p.stem for p in base.glob("*.py")}
+    nombres |= {p.name for p in base.iterdir() if (p / "__init__.py").exists()}
+    return nombres
+
+
+def _arbol_importtime(stderr: str):
+    """
+    Reconstruye el árbol de imports. `-X importtime` imprime en post-orden (los hijos
+    antes que el padre) con dos espacios de sangría por nivel.
+    """
+    pendientes = defaultdict(list)  # nivel -> nodos aún sin padre
+    for linea in stderr.splitlines():
+        m = _LINEA_IMPORTTIME.match(linea)
+        if not m:
+            continue
+        nivel = (len(m.group(3)) - 1) // 2
+        nodo = {
+            "modulo": m.group(4),
+            "propio_us": int(m.group(1)),
+            "acumulado_us": int(m.group(2)),
+            "hijos": pendientes.pop(nivel + 1, []),
+        }
+        pendientes[nivel].append(nodo)
+    return pendientes.get(0, [])
+
+
+def _atribuir(raices, proyecto):
+    """
+    Tiempo propio de cada módulo atribuido a la app del proyecto que lo importó por
+    primera vez (el ancestro del proyecto más cercano en el árbol).
+    Devuelve {app: {paquete: microsegundos}}.
+    """
+    por_app = defaultdict(lambda: defaultdict(int))
+    pila = [(nodo, FUERA_DEL_PROYECTO) for nodo in raices]
+    while pila:
+        nodo, duenio = pila.pop()
+        paquete = nodo["modulo"].split(".")[0]
+        if paquete in proyecto:
+            duenio = paquete
+        por_app[duenio][paquete] += nodo["propio_us"]
+        pila.extend((hijo, duenio) for hijo in nodo["hijos"])
+    return por_app
+
+
+def _aplanar(raices):
+    pila, nodos = list(raices), []
+    while pila:
+        nodo = pila.pop()
+        nodos.append(nodo)
+        pila.extend(nodo["hijos"])
+    return nodos
+
+
+class Command(BaseCommand):
+    help = "Perfila el arranque de un worker con `python -X importtime`: tiempo de import por app y módulos más pesados"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--solo-setup', action='store_true', help='Sólo django.setup(), sin cargar las URLs')
+        parser.add_argument('--top', type=int, default=15, help='Módulos más lentos a listar (por tiempo acumulado)')
+        parser.add_argument('--json', dest='salida_json', help='Guardar el resultado en este archivo JSON')
+
+    def _perfilar(self, codigo):
+        entorno = {**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE, "PYTHONDONTWRITEBYTECODE": "1"}
+        inicio = time.perf_counter()
+        proceso = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", codigo],
+            cwd=settings.BASE_DIR, env=entorno, capture_output=True, text=True,
+        )
+        duracion = time.perf_counter() - inicio
+        if proceso.returncode != 0:
+            ultimas = "\n".join(proceso.stderr.strip().splitlines()[-15:])
+            raise CommandError(f"El arranque falló:\n{ultimas}")
+        # ru_maxrss está en KB en Linux (en bytes en macOS)
+        rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+        return proceso.stderr, duracion, rss_mb
+
+    def handle(self, *args, **kwargs):
+        codigo = CODIGO_SOLO_SETUP if kwargs['solo_setup'] else CODIGO_ARRANQUE
+        self.stdout.write(f"⏱️ Perfilando arranque ({'django.setup()' if kwargs['solo_setup'] else 'setup + URLs'})...")
+        stderr, duracion, rss_mb = self._perfilar(codigo)
+
+        raices = _arbol_importtime(stderr)
+        if not raices:
+            raise CommandError("No se pudo leer la salida de -X importtime")
+        proyecto = _paquetes_del_proyecto()
+        por_app = _atribuir(raices, proyecto)
+        total_us = sum(n["acumulado_us"] for n in raices)
+
+        self.stdout.write(
+            f"\n🚀 Proceso: {duracion:.2f} s | imports: {total_us / 1000:.0f} ms | memoria pico: {rss_mb:.0f} MB\n"
+        )
+        self.stdout.write("📦 Tiempo de import por app (incluye las librerías que la app carga primero):")
+        apps = sorted(por_app.items(), key=lambda item: -sum(item[1].values()))
+        for app, paquetes in apps:
+            total_app = sum(paquetes.values())
+            externos = sorted(((p, us) for p, us in paquetes.items() if p != app), key=lambda item: -item[1])[:4]
+            detalle = ", ".join(f"{p} {us / 1000:.0f} ms" for p, us in externos if us >= 1000)
+            self.stdout.write(f"   {app:<28} {total_app / 1000:>8.0f} ms" + (f"  ← {detalle}" if detalle else ""))
+
+        self.stdout.write(f"\n🐢 Top {kwargs['top']} módulos por tiempo acumulado:")
+        nodos = sorted(_aplanar(raices), key=lambda n: -n["acumulado_us"])[:kwargs['top']]
+        for nodo in nodos:
+            self.stdout.write(f"   {nodo['acumulado_us'] / 1000:>8.0f} ms  {nodo['modulo']}")
+
+        if kwargs['salida_json']:
+            resultado = {
+                "codigo": codigo,
+                "duracion_s": round(duracion, 3),
+                "imports_ms": round(total_us / 1000, 1),
+                "memoria_pico_mb": round(rss_mb, 1),
+                "por_app_ms": {
+                    app: {p: round(us / 1000, 1) for p, us in sorted(paquetes.items(), key=lambda item: -item[1])}
+                    for app, paquetes in apps
+                },
+                "top_modulos_ms": {n["modulo"]: round(n["acumulado_us"] / 1000, 1) for n in nodos},
+            }
+            with open(kwargs['salida_json'], 'w', encoding='utf-8') as f:
+                json.dump(resultado, f, indent=2, ensure_ascii=False)
+            self.stdout.write(f"\n💾 Resultado guardado en {kwargs['salida_json']}")
+
+        self.stdout.write(self.style.SUCCESS("✅ Perfil de arranque terminado"))
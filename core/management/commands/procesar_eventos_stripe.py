@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.pagos import procesar_eventos_pendientes
+
+
+class Command(BaseCommand):
+    help = "Procesa los eventos de Stripe pendientes (webhooks) y crea las ventas correspondientes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=50, help='Eventos a reclamar por iteración')
+        parser.add_argument('--loop', action='store_true', help='Quedarse escuchando en lugar de procesar un solo lote')
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos de espera cuando no hay eventos')
+
+    def handle(self, *args, **kwargs):
+        lote = kwargs['lote']
+        loop = kwargs['loop']
+        intervalo = kwargs['intervalo']
+
+        while True:
+            conteo = procesar_eventos_pendientes(limite=lote)
+            total = sum(conteo.values())
+            if total:
+                self.stdout.write(
+                    f"💳 Procesados: {conteo['procesados']} | Ignorados: {conteo['ignorados']} | Fallidos: {conteo['fallidos']}"
+                )
+            if not loop:
+                break
+            # Si el lote vino lleno seguimos sin esperar: hay ráfaga de pagos
+            if total < lote:
+                time.sleep(intervalo)
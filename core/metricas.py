@@ -0,0 +1,226 @@
+# core/metricas.py
+"""
+Métricas de la aplicación en memoria del proceso, expuestas en formato Prometheus.
+
+- Por endpoint (ruta de Django, no la URL concreta, para acotar la cardinalidad):
+  histograma de latencia, cantidad y tiempo de SQL y tiempo de componentes
+  medidos con `medir("pandas")` / `medir("subprocess")`.
+- Consultas lentas (más de `SQL_LENTA_MS`) se registran en el log con el
+  archivo/línea del proyecto que las originó.
+
+`MetricasMiddleware` (core.middleware) abre una `MedicionRequest` por request y
+agrega el header `Server-Timing`. `envoltura_sql` se instala en cada conexión al
+abrirse (señal `connection_created`): bajo ASGI el ORM corre en hilos de
+`sync_to_async`, con conexiones distintas a las del hilo del middleware, y la
+medición les llega por el contextvar. Cada worker lleva sus propios contadores.
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+import traceback
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+SQL_LENTA_MS = float(os.getenv("SQL_LENTA_MS", "200"))
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_RAIZ_PROYECTO = str(settings.BASE_DIR)
+_ARCHIVOS_PROPIOS = (os.path.join("core", "metricas.py"), os.path.join("core", "middleware.py"))
+
+
+# ============================================
+# MEDICIÓN DEL REQUEST ACTUAL
+# ============================================
+class MedicionRequest:
+    __slots__ = ("inicio", "sql_cantidad", "sql_segundos", "componentes")
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.sql_cantidad = 0
+        self.sql_segundos = 0.0
+        self.componentes = defaultdict(float)  # componente -> segundos
+
+    def server_timing(self, total: float) -> str:
+        partes = [
+            f"app;dur={total * 1000:.1f}",
+            f'db;dur={self.sql_segundos * 1000:.1f};desc="{self.sql_cantidad} consultas"',
+        ]
+        partes.extend(f"{nombre};dur={seg * 1000:.1f}" for nombre, seg in self.componentes.items())
+        return ", ".join(partes)
+
+
+_medicion_actual = contextvars.ContextVar("medicion_request", default=None)
+
+
+def iniciar_medicion() -> tuple:
+    medicion = MedicionRequest()
+    return medicion, _medicion_actual.set(medicion)
+
+
+def terminar_medicion(token) -> None:
+    _medicion_actual.reset(token)
+
+
+@contextmanager
+def medir(componente: str):
+    """Mide el tiempo de un bloque o función (`with medir("pandas"):` o `@medir("subprocess")`)."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracion = time.perf_counter() - inicio
+        medicion = _medicion_actual.get()
+        if medicion is not None:
+            medicion.componentes[componente] += duracion
+        registro.componente(componente, duracion)
+
+
+# ============================================
+# SQL
+# ============================================
+def _origen_consulta() -> str:
+    """
+    Frame más interno del proyecto que disparó la consulta. Si el queryset se
+    evaluó dentro de una librería (p. ej. el paginador de DRF), esa librería.
+    """
+    pila = traceback.extract_stack()[:-3]
+    for frame in reversed(pila):
+        if (
+            frame.filename.startswith(_RAIZ_PROYECTO)
+            and "site-packages" not in frame.filename
+            and not frame.filename.endswith(_ARCHIVOS_PROPIOS)
+        ):
+            return f"{os.path.relpath(frame.filename, _RAIZ_PROYECTO)}:{frame.lineno} en {frame.name}"
+    for frame in reversed(pila):
+        if f"{os.sep}django{os.sep}" not in frame.filename:
+            return f"{frame.filename}:{frame.lineno} en {frame.name}"
+    return "desconocido"
+
+
+def envoltura_sql(execute, sql, params, many, context):
+    """execute_wrapper de Django: cuenta y cronometra cada consulta del request."""
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duracion = time.perf_counter() - inicio
+        medicion = _medicion_actual.get()
+        if medicion is not None:
+            medicion.sql_cantidad += 1
+            medicion.sql_segundos += duracion
+        if duracion * 1000 >= SQL_LENTA_MS:
+            registro.consulta_lenta()
+            logger.warning(
+                "Consulta lenta (%.0f ms) desde %s: %s", duracion * 1000, _origen_consulta(), sql[:500]
+            )
+
+
+def instalar_envoltura_sql(conexion) -> None:
+    """Idempotente: la lista `execute_wrappers` sobrevive a las reconexiones."""
+    if envoltura_sql not in conexion.execute_wrappers:
+        conexion.execute_wrappers.append(envoltura_sql)
+
+
+@receiver(connection_created)
+def _envolver_conexion_nueva(sender, connection, **kwargs):
+    instalar_envoltura_sql(connection)
+
+
+# ============================================
+# REGISTRO Y EXPOSICIÓN PROMETHEUS
+# ============================================
+class RegistroMetricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencia = {}  # (endpoint, método, status) -> [buckets..., suma, cantidad]
+        self._sql = defaultdict(lambda: [0, 0.0])  # (endpoint, método) -> [consultas, segundos]
+        self._componentes = defaultdict(lambda: [0, 0.0])  # componente -> [llamadas, segundos]
+        self._consultas_lentas = 0
+
+    def request(self, endpoint: str, metodo: str, status: int, duracion: float, medicion: MedicionRequest) -> None:
+        clave = (endpoint, metodo, str(status))
+        with self._lock:
+            serie = self._latencia.get(clave)
+            if serie is None:
+                serie = self._latencia[clave] = [0] * len(BUCKETS_LATENCIA) + [0.0, 0]
+            for i, limite in enumerate(BUCKETS_LATENCIA):
+                if duracion <= limite:
+                    serie[i] += 1
+            serie[-2] += duracion
+            serie[-1] += 1
+            sql = self._sql[(endpoint, metodo)]
+            sql[0] += medicion.sql_cantidad
+            sql[1] += medicion.sql_segundos
+
+    def componente(self, nombre: str, duracion: float) -> None:
+        with self._lock:
+            serie = self._componentes[nombre]
+            serie[0] += 1
+            serie[1] += duracion
+
+    def consulta_lenta(self) -> None:
+        with self._lock:
+            self._consultas_lentas += 1
+
+    def exportar(self) -> str:
+        """Texto en formato de exposición de Prometheus (0.0.4)."""
+        lineas = [
+            "# HELP http_request_duration_seconds Latencia de los requests por endpoint",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            for (endpoint, metodo, status), serie in sorted(self._latencia.items()):
+                etiquetas = f'endpoint="{_escapar(endpoint)}",method="{metodo}",status="{status}"'
+                for limite, valor in zip(BUCKETS_LATENCIA, serie):
+                    lineas.append(f'http_request_duration_seconds_bucket{{{etiquetas},le="{limite}"}} {valor}')
+                lineas.append(f'http_request_duration_seconds_bucket{{{etiquetas},le="+Inf"}} {serie[-1]}')
+                lineas.append(f"http_request_duration_seconds_sum{{{etiquetas}}} {serie[-2]:.6f}")
+                lineas.append(f"http_request_duration_seconds_count{{{etiquetas}}} {serie[-1]}")
+
+            lineas += [
+                "# HELP db_queries_total Consultas SQL ejecutadas por endpoint",
+                "# TYPE db_queries_total counter",
+            ]
+            lineas += [
+                f'db_queries_total{{endpoint="{_escapar(e)}",method="{m}"}} {c}'
+                for (e, m), (c, _) in sorted(self._sql.items())
+            ]
+            lineas += [
+                "# HELP db_query_seconds_total Tiempo en SQL por endpoint",
+                "# TYPE db_query_seconds_total counter",
+            ]
+            lineas += [
+                f'db_query_seconds_total{{endpoint="{_escapar(e)}",method="{m}"}} {s:.6f}'
+                for (e, m), (_, s) in sorted(self._sql.items())
+            ]
+            lineas += [
+                "# HELP componente_seconds_total Tiempo en componentes medidos (pandas, subprocess...)",
+                "# TYPE componente_seconds_total counter",
+            ]
+            lineas += [f'componente_seconds_total{{componente="{n}"}} {s:.6f}' for n, (_, s) in sorted(self._componentes.items())]
+            lineas += [
+                "# HELP componente_llamadas_total Llamadas a componentes medidos",
+                "# TYPE componente_llamadas_total counter",
+            ]
+            lineas += [f'componente_llamadas_total{{componente="{n}"}} {c}' for n, (c, _) in sorted(self._componentes.items())]
+            lineas += [
+                f"# HELP db_slow_queries_total Consultas de más de {SQL_LENTA_MS:.0f} ms",
+                "# TYPE db_slow_queries_total counter",
+                f"db_slow_queries_total {self._consultas_lentas}",
+            ]
+        return "\n".join(lineas) + "\n"
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registro = RegistroMetricas()
@@ -0,0 +1,129 @@
+# core/middleware.py
+"""Middlewares transversales del proyecto."""
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.middleware.gzip import GZipMiddleware
+
+from . import routers
+from .metricas import iniciar_medicion, instalar_envoltura_sql, registro, terminar_medicion
+
+# Tipos que vale la pena comprimir; PDF/Excel/imágenes ya vienen comprimidos
+TIPOS_COMPRIMIBLES = ("application/json", "text/", "application/javascript", "application/xml")
+
+
+class GZipUmbralMiddleware(GZipMiddleware):
+    """
+    GZip sólo para respuestas de texto/JSON de al menos `GZIP_MIN_BYTES`.
+    Por debajo del umbral el ahorro no compensa la CPU ni la latencia añadida.
+    """
+
+    def process_response(self, request, response):
+        tipo = response.get("Content-Type", "")
+        if not tipo.startswith(TIPOS_COMPRIMIBLES):
+            return response
+        if not response.streaming and len(response.content) < settings.GZIP_MIN_BYTES:
+            return response
+        return super().process_response(request, response)
+
+
+class MetricasMiddleware:
+    """
+    Latencia, SQL y componentes por request (ver core.metricas). Agrega el header
+    `Server-Timing` para verlo en las DevTools del navegador.
+
+    Soporta sync y async: bajo ASGI no obliga a Django a pasar las vistas async
+    por un hilo.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.es_async:
+            return self.__acall__(request)
+        # Conexiones abiertas antes de registrar la señal (p. ej. al arrancar)
+        for conexion in connections.all():
+            instalar_envoltura_sql(conexion)
+        medicion, token = iniciar_medicion()
+        try:
+            response = self.get_response(request)
+        finally:
+            terminar_medicion(token)
+        return self._registrar(request, response, medicion)
+
+    async def __acall__(self, request):
+        medicion, token = iniciar_medicion()
+        try:
+            response = await self.get_response(request)
+        finally:
+            terminar_medicion(token)
+        return self._registrar(request, response, medicion)
+
+    def _registrar(self, request, response, medicion):
+        duracion = time.perf_counter() - medicion.inicio
+        coincidencia = getattr(request, "resolver_match", None)
+        endpoint = coincidencia.route if coincidencia and coincidencia.route else "sin_ruta"
+        registro.request(endpoint, request.method, response.status_code, duracion, medicion)
+        response["Server-Timing"] = medicion.server_timing(duracion)
+        return response
+
+
+class ReplicaMiddleware:
+    """
+    Estado por request del router de réplica (ver core.routers):
+    - GET/HEAD de DB_REPLICA_RUTAS leen de la réplica;
+    - si el request escribe, la cookie `bd_primaria` fija al cliente a la primaria
+      durante DB_REPLICA_LAG_MAX segundos, para que lea lo que acaba de escribir.
+    Sin alias `replica` se desactiva.
+    """
+
+    sync_capable = True
+    async_capable = True
+    COOKIE = "bd_primaria"
+
+    def __init__(self, get_response):
+        if not routers.hay_replica():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
+
+    def _iniciar(self, request):
+        usar_replica = request.method in ("GET", "HEAD") and request.path.startswith(settings.DB_REPLICA_RUTAS)
+        return routers.iniciar_request(usar_replica, fijado_a_primaria=self.COOKIE in request.COOKIES)
+
+    def __call__(self, request):
+        if self.es_async:
+            return self.__acall__(request)
+        estado, tokens = self._iniciar(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.terminar_request(tokens)
+        return self._fijar(response, estado)
+
+    async def __acall__(self, request):
+        estado, tokens = self._iniciar(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.terminar_request(tokens)
+        return self._fijar(response, estado)
+
+    def _fijar(self, response, estado):
+        if estado["escribio"]:
+            response.set_cookie(
+                self.COOKIE, "1", max_age=max(1, round(settings.DB_REPLICA_LAG_MAX)), httponly=True, samesite="Lax"
+            )
+        return response
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoStripe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True, null=True)),
+                ('stripe_id', models.CharField(max_length=255, unique=True)),
+                ('tipo', models.CharField(max_length=100)),
+                ('session_id', models.CharField(blank=True, db_index=True, max_length=255, null=True)),
+                ('payment_intent', models.CharField(blank=True, db_index=True, max_length=255, null=True)),
+                ('payload', models.JSONField(default=dict)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesado', 'Procesado'), ('ignorado', 'Ignorado'), ('fallido', 'Fallido')], db_index=True, default='pendiente', max_length=20)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('resultado', models.JSONField(blank=True, null=True)),
+                ('procesado_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Evento de Stripe',
+                'verbose_name_plural': 'Eventos de Stripe',
+                'ordering': ('id',),
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authz', '0003_load_initial_fixture'),
+        ('core', '0002_eventostripe'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['estado', 'programada_para'], name='notificacion_programada_idx'),
+        ),
+    ]
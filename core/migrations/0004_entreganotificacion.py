@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:56
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_notificacion_programada_idx'),
+        ('tienda', '0007_fcmdevice_activos_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacion',
+            name='total_exitosos',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='notificacion',
+            name='total_fallidos',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='EntregaNotificacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('codigo', models.CharField(default='ok', max_length=50)),
+                ('error_clase', models.CharField(blank=True, default='', max_length=100)),
+                ('creado', models.DateTimeField(default=django.utils.timezone.now)),
+                ('dispositivo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='entregas', to='tienda.fcmdevice')),
+                ('notificacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entregas', to='core.notificacion')),
+            ],
+            options={
+                'verbose_name': 'Entrega de notificación',
+                'verbose_name_plural': 'Entregas de notificaciones',
+                'ordering': ('id',),
+                'indexes': [models.Index(fields=['notificacion', 'codigo'], name='entrega_notif_codigo_idx'), models.Index(fields=['creado'], name='entrega_creado_idx')],
+            },
+        ),
+    ]
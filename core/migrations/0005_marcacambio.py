@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:07
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_entreganotificacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarcaCambio',
+            fields=[
+                ('tabla', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('version', models.PositiveBigIntegerField(default=1)),
+                ('actualizado', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Marca de cambio',
+                'verbose_name_plural': 'Marcas de cambio',
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-19 11:39
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_marcacambio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FixtureCargado',
+            fields=[
+                ('archivo', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('checksum', models.CharField(max_length=64)),
+                ('cargado', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Fixture cargado',
+                'verbose_name_plural': 'Fixtures cargados',
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_fixturecargado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacion',
+            name='envio_cursor',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='notificacion',
+            name='envio_iniciado',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='notificacion',
+            name='estado',
+            field=models.CharField(choices=[('borrador', 'Borrador'), ('programada', 'Programada'), ('enviando', 'Enviando'), ('enviada', 'Enviada'), ('fallida', 'Fallida')], default='borrador', max_length=20),
+        ),
+    ]
@@ -1,10 +1,14 @@
 
 # Create your models here.
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, Q
 from django.utils import timezone
 
-from .notifications import enviar_tokens_push
+from .notifications import FCM_MAX_HILOS, FCM_MAX_TOKENS_POR_LOTE, enviar_tokens_push
+
+# Tokens leídos por consulta al enviar: un bloque llena todos los hilos del emisor
+TOKENS_POR_BLOQUE = FCM_MAX_TOKENS_POR_LOTE * FCM_MAX_HILOS
 
 
 class TimeStampedModel(models.Model):
@@ -19,6 +23,7 @@ class Notificacion(TimeStampedModel):
     class Estado(models.TextChoices):
         BORRADOR = "borrador", "Borrador"
         PROGRAMADA = "programada", "Programada"
+        ENVIANDO = "enviando", "Enviando"
         ENVIADA = "enviada", "Enviada"
         FALLIDA = "fallida", "Fallida"
 
@@ -35,6 +40,13 @@ class Notificacion(TimeStampedModel):
     )
     datos_extra = models.JSONField(default=dict, blank=True)
     ultimo_resultado = models.JSONField(null=True, blank=True)
+    # Contadores acumulados de todos los envíos; el detalle está en EntregaNotificacion
+    total_exitosos = models.PositiveIntegerField(default=0)
+    total_fallidos = models.PositiveIntegerField(default=0)
+    # Envío en curso: inicio (marca sus EntregaNotificacion) y pk del último dispositivo
+    # ya registrado; un despacho interrumpido sigue desde ahí sin repetir lo enviado
+    envio_iniciado = models.DateTimeField(null=True, blank=True)
+    envio_cursor = models.PositiveBigIntegerField(default=0)
     creado_por = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -47,6 +59,10 @@ class Notificacion(TimeStampedModel):
         ordering = ("-created_at",)
         verbose_name = "Notificación"
         verbose_name_plural = "Notificaciones"
+        indexes = [
+            # Usado por el despachador para encontrar las programadas vencidas
+            models.Index(fields=["estado", "programada_para"], name="notificacion_programada_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"{self.titulo} ({self.get_estado_display()})"
@@ -55,37 +71,97 @@ class Notificacion(TimeStampedModel):
         payload = datos if datos is not None else self.datos_extra or {}
         return {str(k): ("" if v is None else str(v)) for k, v in payload.items()}
 
-    def _tokens_destino(self):
+    def _tokens_destino(self, tamano: int = TOKENS_POR_BLOQUE, desde_pk: int = 0):
+        """Genera los tokens destino en bloques de `tamano`, paginando por pk desde `desde_pk`.
+
+        Los destinatarios se resuelven en SQL con una subconsulta, así que ni los
+        ids de usuario ni la tabla de dispositivos completa pasan por memoria.
+        """
         from tienda.models import FCMDevice
 
         queryset = FCMDevice.objects.filter(activo=True)
         if not self.enviar_a_todos:
-            destinatarios_ids = list(self.destinatarios.values_list("id", flat=True))
-            if not destinatarios_ids:
-                return []
-            queryset = queryset.filter(usuario_id__in=destinatarios_ids)
-        return list(queryset.values("registration_id", "tipo_dispositivo"))
-
-    def enviar(self, *, datos_extra: dict | None = None) -> dict:
-        tokens = self._tokens_destino()
-        ahora = timezone.now()
+            destinatarios = Notificacion.destinatarios.through.objects.filter(
+                notificacion_id=self.pk
+            ).values("usuario_id")
+            queryset = queryset.filter(usuario_id__in=destinatarios)
+
+        ultimo_pk = desde_pk
+        while True:
+            bloque = list(
+                queryset.filter(pk__gt=ultimo_pk)
+                .order_by("pk")
+                .values("pk", "registration_id", "tipo_dispositivo")[:tamano]
+            )
+            if not bloque:
+                return
+            ultimo_pk = bloque[-1]["pk"]
+            yield bloque
+            if len(bloque) < tamano:
+                return
 
-        if not tokens:
-            resultado = {
-                "success": 0,
-                "failure": 0,
-                "responses": [],
-                "detalle": "Sin tokens activos para enviar",
-            }
+    def _registrar_entregas(self, bloque: list, por_token: list) -> None:
+        """Guarda el log de entrega del bloque, sus contadores y el avance del envío en una transacción."""
+        dispositivos = {d["registration_id"]: d["pk"] for d in bloque}
+        entregas = []
+        exitosos = 0
+        for token, error in por_token:
+            if error is None:
+                exitosos += 1
+            entregas.append(EntregaNotificacion(
+                notificacion=self,
+                dispositivo_id=dispositivos.get(token),
+                codigo=EntregaNotificacion.codigo_desde_error(error),
+                error_clase="" if error is None else type(error).__name__[:100],
+                creado=self.envio_iniciado,
+            ))
+        self.envio_cursor = bloque[-1]["pk"]
+        with transaction.atomic():
+            EntregaNotificacion.objects.bulk_create(entregas, batch_size=500)
+            Notificacion.objects.filter(pk=self.pk).update(
+                total_exitosos=F("total_exitosos") + exitosos,
+                total_fallidos=F("total_fallidos") + (len(entregas) - exitosos),
+                envio_cursor=self.envio_cursor,
+                # update() no aplica auto_now: updated_at sirve de latido del envío
+                updated_at=timezone.now(),
+            )
+
+    def _resultado_envio(self) -> dict:
+        """Exitosos/fallidos del envío actual, también de la parte hecha antes de reanudarlo."""
+        conteo = self.entregas.filter(creado=self.envio_iniciado).aggregate(
+            success=Count("id", filter=Q(codigo=EntregaNotificacion.CODIGO_OK)),
+            failure=Count("id", filter=~Q(codigo=EntregaNotificacion.CODIGO_OK)),
+        )
+        return {"success": conteo["success"] or 0, "failure": conteo["failure"] or 0}
+
+    def enviar(self, *, datos_extra: dict | None = None, reanudar: bool = False) -> dict:
+        """
+        Envía a todos los destinatarios, bloque por bloque. Con `reanudar` sigue un
+        envío interrumpido desde `envio_cursor` (a lo sumo se repite el bloque que
+        estaba en curso); si no, empieza uno nuevo.
+        """
+        if not reanudar or self.envio_iniciado is None:
+            self.envio_iniciado = timezone.now()
+            self.envio_cursor = 0
+            self.save(update_fields=["envio_iniciado", "envio_cursor", "updated_at"])
+        payload = self._build_datos(datos_extra)
+
+        # Cada bloque va directo al emisor y al log de entregas; en la fila sólo
+        # quedan los contadores, no una respuesta por token
+        for bloque in self._tokens_destino(desde_pk=self.envio_cursor):
+            parcial = enviar_tokens_push(bloque, self.titulo, self.cuerpo, payload, detalle_por_token=True)
+            self._registrar_entregas(bloque, parcial.get("por_token", []))
+
+        ahora = timezone.now()
+        resultado = self._resultado_envio()
+        if resultado["success"] == 0 and resultado["failure"] == 0:
+            resultado["detalle"] = "Sin tokens activos para enviar"
             self.estado = Notificacion.Estado.FALLIDA
             self.enviada_en = ahora
             self.ultimo_resultado = resultado
             self.save(update_fields=["estado", "enviada_en", "ultimo_resultado", "updated_at"])
             return resultado
 
-        payload = self._build_datos(datos_extra)
-        resultado = enviar_tokens_push(tokens, self.titulo, self.cuerpo, payload)
-
         self.enviada_en = ahora
         self.ultimo_resultado = resultado
         self.estado = (
@@ -94,11 +170,143 @@ class Notificacion(TimeStampedModel):
             else Notificacion.Estado.FALLIDA
         )
         self.save(update_fields=["estado", "enviada_en", "ultimo_resultado", "updated_at"])
+        self.refresh_from_db(fields=["total_exitosos", "total_fallidos"])
         return resultado
 
     def puede_enviarse(self) -> bool:
-        if self.estado == Notificacion.Estado.ENVIADA:
+        if self.estado in (Notificacion.Estado.ENVIADA, Notificacion.Estado.ENVIANDO):
             return False
         if not self.enviar_a_todos and not self.destinatarios.exists():
             return False
         return True
+
+    def reclamar_envio(self) -> bool:
+        """
+        Pasa la notificación a ENVIANDO con un UPDATE condicional; False si otro
+        envío (la API o `despachar_notificaciones`) ya la tomó o ya se envió.
+        """
+        ahora = timezone.now()
+        tomada = Notificacion.objects.filter(
+            pk=self.pk,
+            estado__in=(Notificacion.Estado.BORRADOR, Notificacion.Estado.PROGRAMADA, Notificacion.Estado.FALLIDA),
+        ).update(estado=Notificacion.Estado.ENVIANDO, updated_at=ahora)
+        if tomada:
+            self.estado, self.updated_at = Notificacion.Estado.ENVIANDO, ahora
+        return bool(tomada)
+
+    def marcar_fallida(self, error) -> None:
+        """Envío que terminó con una excepción: FALLIDA, sin reintentos automáticos."""
+        ahora = timezone.now()
+        self.ultimo_resultado = {"success": 0, "failure": 0, "detalle": str(error)}
+        Notificacion.objects.filter(pk=self.pk).update(
+            estado=Notificacion.Estado.FALLIDA, enviada_en=ahora, ultimo_resultado=self.ultimo_resultado, updated_at=ahora
+        )
+        self.estado, self.enviada_en = Notificacion.Estado.FALLIDA, ahora
+
+
+class EntregaNotificacion(models.Model):
+    """Resultado de una notificación en un dispositivo (una fila por token enviado)."""
+
+    CODIGO_OK = "ok"
+
+    notificacion = models.ForeignKey(Notificacion, on_delete=models.CASCADE, related_name="entregas")
+    dispositivo = models.ForeignKey(
+        "tienda.FCMDevice",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="entregas",
+    )
+    codigo = models.CharField(max_length=50, default=CODIGO_OK)
+    error_clase = models.CharField(max_length=100, blank=True, default="")
+    creado = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ("id",)
+        verbose_name = "Entrega de notificación"
+        verbose_name_plural = "Entregas de notificaciones"
+        indexes = [
+            models.Index(fields=["notificacion", "codigo"], name="entrega_notif_codigo_idx"),
+            models.Index(fields=["creado"], name="entrega_creado_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.notificacion_id} → {self.dispositivo_id} ({self.codigo})"
+
+    @classmethod
+    def codigo_desde_error(cls, error) -> str:
+        """'ok', el código de error de FCM (p. ej. NOT_FOUND) o 'error' si no trae código."""
+        if error is None:
+            return cls.CODIGO_OK
+        codigo = getattr(error, "code", None)
+        return str(codigo)[:50] if codigo else "error"
+
+
+class EventoStripe(TimeStampedModel):
+    """Bandeja de entrada de webhooks de Stripe.
+
+    El endpoint del webhook sólo verifica la firma y guarda el evento; el worker
+    `procesar_eventos_stripe` lo procesa fuera del ciclo request/response.
+    """
+
+    class Estado(models.TextChoices):
+        PENDIENTE = "pendiente", "Pendiente"
+        PROCESADO = "procesado", "Procesado"
+        IGNORADO = "ignorado", "Ignorado"
+        FALLIDO = "fallido", "Fallido"
+
+    stripe_id = models.CharField(max_length=255, unique=True)
+    tipo = models.CharField(max_length=100)
+    session_id = models.CharField(max_length=255, null=True, blank=True, db_index=True)
+    payment_intent = models.CharField(max_length=255, null=True, blank=True, db_index=True)
+    payload = models.JSONField(default=dict)
+    estado = models.CharField(max_length=20, choices=Estado.choices, default=Estado.PENDIENTE, db_index=True)
+    intentos = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    resultado = models.JSONField(null=True, blank=True)
+    procesado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("id",)
+        verbose_name = "Evento de Stripe"
+        verbose_name_plural = "Eventos de Stripe"
+
+    def __str__(self) -> str:
+        return f"{self.tipo} {self.stripe_id} ({self.get_estado_display()})"
+
+
+class MarcaCambio(models.Model):
+    """Contador de versión por tabla, para ETag/Last-Modified sin leer la tabla.
+
+    Se incrementa desde señales (ver `core.condicional.registrar_cambio`); una sola
+    consulta por PK responde si algo cambió desde la última vez que el cliente preguntó.
+    """
+
+    tabla = models.CharField(max_length=50, primary_key=True)
+    version = models.PositiveBigIntegerField(default=1)
+    actualizado = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Marca de cambio"
+        verbose_name_plural = "Marcas de cambio"
+
+    def __str__(self) -> str:
+        return f"{self.tabla} v{self.version}"
+
+
+class FixtureCargado(models.Model):
+    """Checksum del contenido de cada fixture la última vez que se cargó en esta BD.
+
+    `core.semillas.cargar_fixtures` salta los archivos que no cambiaron desde entonces.
+    """
+
+    archivo = models.CharField(max_length=255, primary_key=True)
+    checksum = models.CharField(max_length=64)
+    cargado = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Fixture cargado"
+        verbose_name_plural = "Fixtures cargados"
+
+    def __str__(self) -> str:
+        return f"{self.archivo} ({self.checksum[:12]})"
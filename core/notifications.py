@@ -1,121 +1,258 @@
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Dict, Any, Iterable
 import os
 import logging
+import time
 logger = logging.getLogger(__name__)
 
-try:
-    # Import opcional: solo si se va a enviar realmente
-    from firebase_admin import messaging
-    from .firebase import iniciar_firebase
-    _HAS_FIREBASE = True
-except Exception:
-    messaging = None  # type: ignore
-    iniciar_firebase = None  # type: ignore
-    _HAS_FIREBASE = False
 
+@lru_cache(maxsize=None)
+def _firebase():
+    """
+    `(messaging, iniciar_firebase)` de firebase-admin, o None si no está instalado.
+    Se importa al primer envío real: los workers que nunca envían push no lo cargan.
+    """
+    try:
+        from firebase_admin import messaging
+        from .firebase import iniciar_firebase
+    except Exception:
+        return None
+    return messaging, iniciar_firebase
 
-def enviar_tokens_push(tokens: List[Any], titulo: str, cuerpo: str, datos: Dict[str, str] | None = None) -> Dict[str, Any]:
-    """Envía notificaciones a una lista de tokens usando firebase-admin.
 
-    Comportamiento seguro para desarrollo:
-    - Si la variable de entorno `SIMULAR_FCM` está activada, no intenta conectar con Firebase
-      y devuelve una respuesta simulada (útil para pruebas locales).
-    - Usa logging en lugar de prints.
-    """
-    simular = os.getenv('SIMULAR_FCM', '').lower() in ('1', 'true', 'si', 'yes')
-    if simular:
-        logger.info('SIMULACIÓN FCM: enviando a %d tokens', len(tokens))
-        return {'success': len(tokens), 'failure': 0, 'responses': ['simulado' for _ in tokens]}
+# FCM no acepta más de 500 tokens por MulticastMessage
+FCM_MAX_TOKENS_POR_LOTE = 500
+# Lotes enviados en paralelo; cada uno es una petición HTTP a FCM
+FCM_MAX_HILOS = int(os.getenv('FCM_MAX_HILOS', '4'))
 
-    if not _HAS_FIREBASE:
-        logger.error('firebase-admin no está disponible en el entorno; exporta SIMULAR_FCM=1 para pruebas locales')
-        return {'success': 0, 'failure': len(tokens), 'responses': ['firebase_not_installed' for _ in tokens]}
+_ERRORES_TOKEN_INVALIDO = ('registration-token-not-registered', 'invalid-registration-token', 'notregistered', 'not_registered')
 
-    try:
-        app = iniciar_firebase()
-    except Exception as e:
-        logger.exception('No se pudo inicializar Firebase: %s', e)
-        return {'success': 0, 'failure': len(tokens), 'responses': [str(e) for _ in tokens]}
-
-    # tokens puede ser una lista de strings (tokens) o dicts {'token':..., 'tipo': 'android'|'ios'|'web'}
-    mensajes = []
-    token_map = []  # mantendremos el token asociado a cada mensaje para manejar respuestas
-    for item in tokens:
-        if isinstance(item, str):
-            token = item
-            tipo = None
-        elif isinstance(item, dict):
-            token = item.get('token') or item.get('registration_id')
-            tipo = item.get('tipo') or item.get('tipo_dispositivo')
-        else:
-            # intentar acceder como tupla (token, tipo)
-            try:
-                token, tipo = item
-            except Exception:
-                logger.warning('Token en formato desconocido: %s', item)
-                continue
 
-        if not token:
-            continue
+class FirebaseNoDisponible(RuntimeError):
+    """firebase-admin no está instalado; `code` es el código que queda en EntregaNotificacion."""
+
+    code = 'firebase_not_installed'
+
 
-        # Construir configuración por plataforma si es posible
+# ============================================================================
+# Backends de envío
+# ============================================================================
+# Un backend expone `enviar_multicast(tokens, plataforma, titulo, cuerpo, datos)`
+# y devuelve una lista alineada con `tokens`: None si el envío fue correcto o el
+# error (excepción o texto) del token. Las pruebas pueden pasar su propio backend.
+
+class BackendFirebase:
+    """Envía cada lote como un `MulticastMessage` con firebase-admin."""
+
+    def __init__(self, app=None):
+        self.app = app
+        self.messaging = _firebase()[0]
+
+    def _configuracion(self, plataforma):
+        messaging = self.messaging
         android_conf = None
         apns_conf = None
-        if tipo and tipo.lower() == 'android' and _HAS_FIREBASE:
-            try:
-                android_conf = messaging.AndroidConfig(priority='high')
-            except Exception:
-                android_conf = None
-        if tipo and tipo.lower() in ('ios', 'apns') and _HAS_FIREBASE:
-            try:
-                apns_conf = messaging.APNSConfig(headers={'apns-priority': '10'})
-            except Exception:
-                apns_conf = None
+        if plataforma == 'android':
+            android_conf = messaging.AndroidConfig(priority='high')
+        elif plataforma == 'ios':
+            apns_conf = messaging.APNSConfig(headers={'apns-priority': '10'})
+        return android_conf, apns_conf
 
-        msg = messaging.Message(
-            token=token,
-            notification=messaging.Notification(title=titulo, body=cuerpo) if _HAS_FIREBASE else None,
+    def enviar_multicast(self, tokens, plataforma, titulo, cuerpo, datos):
+        messaging = self.messaging
+        android_conf, apns_conf = self._configuracion(plataforma)
+        mensaje = messaging.MulticastMessage(
+            tokens=list(tokens),
+            notification=messaging.Notification(title=titulo, body=cuerpo),
             data=datos or {},
             android=android_conf,
             apns=apns_conf,
         )
-        mensajes.append(msg)
-        token_map.append(token)
+        # send_each_for_multicast reemplaza a send_multicast en firebase-admin >= 6.2
+        enviar = getattr(messaging, 'send_each_for_multicast', None) or messaging.send_multicast
+        resp = enviar(mensaje, app=self.app)
+        return [r.exception if r.exception else None for r in resp.responses]
 
-    if not mensajes:
-        return {'success': 0, 'failure': 0, 'responses': []}
 
+class BackendSimulado:
+    """
+    Backend para `SIMULAR_FCM=1`: todos los envíos son exitosos. Cada lote tarda
+    `SIMULAR_LATENCIA_MS` (0 por defecto), para pruebas de carga sin salir a la red.
+    """
+
+    def enviar_multicast(self, tokens, plataforma, titulo, cuerpo, datos):
+        time.sleep(float(os.getenv('SIMULAR_LATENCIA_MS', '0')) / 1000)
+        logger.info('SIMULACIÓN FCM: lote de %d tokens (%s)', len(tokens), plataforma or 'sin plataforma')
+        return [None for _ in tokens]
+
+
+# ============================================================================
+# Agrupación en lotes
+# ============================================================================
+def _normalizar_token(item):
+    """Acepta un token (str), un dict {'token'|'registration_id', 'tipo'|'tipo_dispositivo'} o una tupla (token, tipo)."""
+    if isinstance(item, str):
+        return item, None
+    if isinstance(item, dict):
+        return item.get('token') or item.get('registration_id'), item.get('tipo') or item.get('tipo_dispositivo')
+    try:
+        token, tipo = item
+        return token, tipo
+    except Exception:
+        logger.warning('Token en formato desconocido: %s', item)
+        return None, None
+
+
+def _plataforma(tipo) -> str | None:
+    tipo = (tipo or '').lower()
+    if tipo == 'android':
+        return 'android'
+    if tipo in ('ios', 'apns'):
+        return 'ios'
+    return None
+
+
+def agrupar_en_lotes(tokens: Iterable[Any], tamano: int = FCM_MAX_TOKENS_POR_LOTE) -> List[tuple]:
+    """Agrupa los tokens por configuración de plataforma en lotes de hasta `tamano`.
+
+    Devuelve una lista de (plataforma, [tokens]). Los tokens repetidos se envían una sola vez.
+    """
+    por_plataforma: Dict[str | None, List[str]] = {}
+    vistos = set()
+    for item in tokens:
+        token, tipo = _normalizar_token(item)
+        if not token or token in vistos:
+            continue
+        vistos.add(token)
+        por_plataforma.setdefault(_plataforma(tipo), []).append(token)
+
+    lotes = []
+    for plataforma, lista in por_plataforma.items():
+        for i in range(0, len(lista), tamano):
+            lotes.append((plataforma, lista[i:i + tamano]))
+    return lotes
+
+
+def _es_token_invalido(error) -> bool:
+    err_str = str(error).lower()
+    return any(x in err_str for x in _ERRORES_TOKEN_INVALIDO)
+
+
+def _desactivar_tokens_invalidos(tokens: List[str]) -> None:
+    """Desactiva en una sola escritura todos los tokens rechazados durante el envío."""
+    # Importar modelo de forma local para evitar import cycles
+    from django.db import transaction
+    from django.utils import timezone
+    from tienda.models import FCMDevice
     try:
-        if len(mensajes) == 1:
-            resp = messaging.send(mensajes[0], app=app)
-            return {'success': 1, 'failure': 0, 'responses': [str(resp)]}
+        # Savepoint propio: si falla, la transacción de quien llama sigue usable
+        with transaction.atomic():
+            # update() no aplica auto_now: fecha_modificacion marca desde cuándo está inactivo
+            desactivados = FCMDevice.objects.filter(registration_id__in=tokens, activo=True).update(
+                activo=False, fecha_modificacion=timezone.now()
+            )
+        logger.info('Marcados %d tokens como inactivos', desactivados)
+    except Exception:
+        logger.exception('Error al marcar %d tokens inactivos', len(tokens))
+
+
+def _fallo_total(lotes, error, detalle_por_token: bool) -> Dict[str, Any]:
+    """Resultado cuando no se pudo enviar ningún lote (sin Firebase o sin credenciales)."""
+    tokens = [token for _, lista in lotes for token in lista]
+    resultado = {'success': 0, 'failure': len(tokens), 'responses': [str(error) for _ in tokens]}
+    if detalle_por_token:
+        resultado['por_token'] = [(token, error) for token in tokens]
+    return resultado
+
+
+# ============================================================================
+# Envío
+# ============================================================================
+def enviar_tokens_push(
+    tokens: List[Any],
+    titulo: str,
+    cuerpo: str,
+    datos: Dict[str, str] | None = None,
+    *,
+    backend=None,
+    max_hilos: int | None = None,
+    detalle_por_token: bool = False,
+) -> Dict[str, Any]:
+    """Envía notificaciones a una lista de tokens usando firebase-admin.
+
+    Los tokens se agrupan por plataforma en `MulticastMessage` de hasta 500 y los
+    lotes se envían en paralelo en un pool de `FCM_MAX_HILOS` hilos, así que el
+    tiempo crece con el número de lotes y no con el de tokens.
+
+    Comportamiento seguro para desarrollo:
+    - Si la variable de entorno `SIMULAR_FCM` está activada, no intenta conectar con Firebase
+      y usa un backend simulado (útil para pruebas locales).
+    - `backend` permite inyectar un backend falso en pruebas.
+    - Con `detalle_por_token=True` el resultado incluye `por_token`: lista de
+      (token, error) con error None si el envío fue correcto.
+    - Usa logging en lugar de prints.
+    """
+    lotes = agrupar_en_lotes(tokens)
+
+    if backend is None:
+        simular = os.getenv('SIMULAR_FCM', '').lower() in ('1', 'true', 'si', 'yes')
+        if simular:
+            backend = BackendSimulado()
+        elif _firebase() is None:
+            logger.error('firebase-admin no está disponible en el entorno; exporta SIMULAR_FCM=1 para pruebas locales')
+            return _fallo_total(lotes, FirebaseNoDisponible('firebase-admin no está instalado'), detalle_por_token)
         else:
-            resp = messaging.send_all(mensajes, app=app)
-            respuestas = []
-            # procesar respuestas y marcar tokens inválidos si corresponde
-            for idx, r in enumerate(resp.responses):
-                token = token_map[idx] if idx < len(token_map) else None
-                if r.exception:
-                    respuestas.append(str(r.exception))
-                    # marcaremos el token para revisión (devolveremos en responses); el caller puede limpiar
-                    logger.warning('FCM error for token %s: %s', token, r.exception)
-                    # Intentar marcar token inválido como inactivo si el error indica token no registrado
-                    try:
-                        err_str = str(r.exception).lower()
-                        if token and any(x in err_str for x in ('registration-token-not-registered', 'invalid-registration-token', 'notregistered', 'not_registered')):
-                            # Importar modelo de forma local para evitar import cycles
-                            from tienda.models import FCMDevice
-                            FCMDevice.objects.filter(registration_id=token).update(activo=False)
-                            logger.info('Marcado token como inactivo: %s', token)
-                    except Exception:
-                        logger.exception('Error al marcar token inactivo %s', token)
-                else:
-                    respuestas.append('ok')
-            return {
-                'success': resp.success_count,
-                'failure': resp.failure_count,
-                'responses': respuestas
-            }
-    except Exception as e:
-        logger.exception('Error al enviar mensajes FCM: %s', e)
-        return {'success': 0, 'failure': len(mensajes), 'responses': [str(e) for _ in mensajes]}
+            _, iniciar_firebase = _firebase()
+            try:
+                backend = BackendFirebase(iniciar_firebase())
+            except Exception as e:
+                logger.exception('No se pudo inicializar Firebase: %s', e)
+                return _fallo_total(lotes, e, detalle_por_token)
+
+    if not lotes:
+        return {'success': 0, 'failure': 0, 'responses': []}
+
+    def enviar_lote(lote):
+        plataforma, lista = lote
+        try:
+            return backend.enviar_multicast(lista, plataforma, titulo, cuerpo, datos)
+        except Exception as e:
+            # Un lote caído no invalida el resto del envío
+            logger.exception('Error al enviar lote FCM de %d tokens: %s', len(lista), e)
+            return [e for _ in lista]
+
+    hilos = max(1, min(max_hilos or FCM_MAX_HILOS, len(lotes)))
+    if hilos == 1:
+        resultados = [enviar_lote(lote) for lote in lotes]
+    else:
+        with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='fcm') as pool:
+            resultados = list(pool.map(enviar_lote, lotes))
+
+    # Agregar resultados en el hilo principal (el acceso a la BD queda fuera del pool)
+    success = 0
+    failure = 0
+    respuestas = []
+    invalidos = []
+    por_token = []
+    for (_, lista), errores in zip(lotes, resultados):
+        for token, error in zip(lista, errores):
+            if detalle_por_token:
+                por_token.append((token, error))
+            if error is None:
+                success += 1
+                respuestas.append('ok')
+                continue
+            failure += 1
+            respuestas.append(str(error))
+            logger.warning('FCM error for token %s: %s', token, error)
+            if _es_token_invalido(error):
+                invalidos.append(token)
+
+    if invalidos:
+        _desactivar_tokens_invalidos(invalidos)
+
+    resultado = {'success': success, 'failure': failure, 'responses': respuestas}
+    if detalle_por_token:
+        resultado['por_token'] = por_token
+    return resultado
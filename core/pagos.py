@@ -0,0 +1,367 @@
+# core/pagos.py
+"""Confirmación de pagos de Stripe fuera del request del usuario.
+
+Flujo:
+1. `registrar_evento_stripe` (llamado desde el webhook) verifica la firma y
+   guarda el evento en la bandeja `EventoStripe`, sin tocar la red.
+2. `procesar_eventos_pendientes` (worker `procesar_eventos_stripe`) reclama
+   eventos con `select_for_update(skip_locked=True)` y crea Venta/Pago/
+   DetalleVenta de forma idempotente por `payment_intent`.
+
+Para pruebas locales sin Stripe, exporta `SIMULAR_STRIPE=1`: el webhook acepta
+el JSON del evento sin verificar la firma y `cliente_stripe()` devuelve un
+cliente falso que crea sesiones de checkout tras `SIMULAR_LATENCIA_MS` (pruebas
+de carga sin salir a la red).
+"""
+import json
+import logging
+import os
+import time
+import uuid
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, When
+from django.utils import timezone
+
+from authz.models import Usuario
+from tienda.catalogo import invalidar_productos
+from tienda.models import DetalleVenta, Pago, Productos, Venta
+
+from .cache import invalidar_tags
+from .condicional import registrar_cambio
+from .models import EventoStripe
+
+logger = logging.getLogger(__name__)
+
+EVENTOS_SOPORTADOS = ("checkout.session.completed",)
+MAX_INTENTOS = 5
+# metadata.payment_type de las sesiones de crear_checkout_session (las únicas que crean ventas)
+TIPO_PAGO_CARRITO = "carrito"
+
+
+def _simular_stripe() -> bool:
+    return os.getenv('SIMULAR_STRIPE', '').lower() in ('1', 'true', 'si', 'yes')
+
+
+# ============================================================================
+# Descuento de stock y detalles de venta en lote
+# ============================================================================
+def descontar_stock_y_crear_detalles(venta, items):
+    """
+    Descuenta el stock de todos los productos del carrito y crea sus DetalleVenta
+    con un número constante de consultas, sin importar la cantidad de ítems:
+
+    1. Un único SELECT ... FOR UPDATE bloquea los productos activos del carrito.
+    2. Un único UPDATE condicional (stock >= cantidad) descuenta el stock con F().
+    3. Un único bulk_create inserta los detalles.
+
+    Debe llamarse dentro de transaction.atomic(). Si el UPDATE no afecta a todos
+    los productos esperados se lanza una excepción para revertir la venta, de modo
+    que el stock nunca quede negativo.
+
+    Devuelve (productos_procesados, productos_sin_stock).
+    """
+    productos_procesados = []
+    productos_sin_stock = []
+
+    lineas = []  # (producto_id, cantidad, precio_unitario)
+    for item in items:
+        producto_id = item.get("producto_id")
+        cantidad = int(item.get("cantidad", 1))
+        precio_unitario = float(item.get("precio", 0))
+
+        if not producto_id:
+            productos_sin_stock.append({
+                "producto": "Producto sin ID",
+                "solicitado": cantidad,
+                "disponible": 0,
+                "error": "Falta ID del producto"
+            })
+            continue
+        lineas.append((int(producto_id), cantidad, precio_unitario))
+
+    if not lineas:
+        return productos_procesados, productos_sin_stock
+
+    # Bloquear en orden de id para evitar deadlocks entre checkouts concurrentes
+    productos = {
+        p.id: p
+        for p in Productos.objects.select_for_update()
+        .filter(id__in={pid for pid, _, _ in lineas}, estado='Activo')
+        .only("id", "descripcion", "stock")
+        .order_by("id")
+    }
+
+    reservado = {}  # producto_id -> cantidad total a descontar
+    detalles = []
+    for producto_id, cantidad, precio_unitario in lineas:
+        producto = productos.get(producto_id)
+        if producto is None:
+            productos_sin_stock.append({
+                "producto": f"ID {producto_id}",
+                "solicitado": cantidad,
+                "disponible": 0,
+                "error": "Producto no encontrado"
+            })
+            continue
+
+        disponible = producto.stock - reservado.get(producto_id, 0)
+        if disponible < cantidad:
+            productos_sin_stock.append({
+                "producto": producto.descripcion,
+                "solicitado": cantidad,
+                "disponible": disponible
+            })
+            continue
+
+        reservado[producto_id] = reservado.get(producto_id, 0) + cantidad
+        productos_procesados.append({
+            "producto": producto.descripcion,
+            "cantidad": cantidad,
+            "stock_restante": disponible - cantidad
+        })
+        detalles.append(DetalleVenta(
+            venta=venta,
+            producto=producto,
+            cantidad=cantidad,
+            subtotal=precio_unitario * cantidad,
+        ))
+
+    if reservado:
+        condicion = Q()
+        for producto_id, cantidad in reservado.items():
+            condicion |= Q(id=producto_id, stock__gte=cantidad)
+
+        actualizados = Productos.objects.filter(condicion).update(
+            stock=Case(
+                *[When(id=producto_id, then=F("stock") - cantidad) for producto_id, cantidad in reservado.items()],
+                default=F("stock"),
+                output_field=IntegerField(),
+            )
+        )
+        if actualizados != len(reservado):
+            raise RuntimeError("El stock cambió durante el pago; la venta fue revertida")
+
+        DetalleVenta.objects.bulk_create(detalles)
+
+        # queryset.update() no dispara post_save: refrescar snapshot y listado al confirmar
+        ids_actualizados = list(reservado)
+        transaction.on_commit(lambda: invalidar_productos(ids_actualizados))
+        transaction.on_commit(lambda: invalidar_tags("productos"))
+        registrar_cambio("productos")
+
+    return productos_procesados, productos_sin_stock
+
+
+def cliente_stripe():
+    """
+    Módulo `stripe` con la API key configurada. Se importa al primer uso para que
+    los workers y comandos que no cobran no paguen el import del SDK.
+    """
+    if _simular_stripe():
+        return _STRIPE_SIMULADO
+    import stripe
+
+    stripe.api_key = settings.STRIPE_SECRET_KEY
+    return stripe
+
+
+def _latencia_simulada() -> None:
+    time.sleep(float(os.getenv('SIMULAR_LATENCIA_MS', '0')) / 1000)
+
+
+def _crear_sesion_simulada(**params):
+    _latencia_simulada()
+    session_id = f"cs_sim_{uuid.uuid4().hex[:24]}"
+    logger.info('SIMULACIÓN STRIPE: sesión de checkout %s', session_id)
+    return SimpleNamespace(
+        id=session_id,
+        url=f"https://checkout.stripe.com/c/pay/{session_id}",
+        expires_at=int(time.time()) + 24 * 3600,
+        payment_status="unpaid",
+        metadata=params.get("metadata", {}),
+    )
+
+
+def _recuperar_sesion_simulada(session_id):
+    _latencia_simulada()
+    return SimpleNamespace(id=session_id, url=f"https://checkout.stripe.com/c/pay/{session_id}", payment_status="paid")
+
+
+# Misma forma que el módulo `stripe` para lo que usan las vistas
+_STRIPE_SIMULADO = SimpleNamespace(
+    checkout=SimpleNamespace(
+        Session=SimpleNamespace(create=_crear_sesion_simulada, retrieve=_recuperar_sesion_simulada),
+    ),
+)
+
+
+# ============================================================================
+# Webhook: verificación y registro en la bandeja
+# ============================================================================
+def construir_evento(payload: bytes, firma: str | None) -> dict:
+    """Verifica la firma del webhook y devuelve el evento como dict.
+
+    Lanza ValueError si el payload o la firma no son válidos.
+    """
+    if _simular_stripe():
+        logger.info('SIMULACIÓN STRIPE: webhook aceptado sin verificar firma')
+        return json.loads(payload)
+
+    secreto = getattr(settings, 'STRIPE_WEBHOOK_SECRET', '')
+    if not secreto:
+        raise ValueError('STRIPE_WEBHOOK_SECRET no está configurado')
+    stripe = cliente_stripe()
+    try:
+        evento = stripe.Webhook.construct_event(payload, firma, secreto)
+    except stripe.error.SignatureVerificationError as e:
+        raise ValueError(f'Firma de Stripe inválida: {e}') from e
+    return evento.to_dict_recursive()
+
+
+def registrar_evento_stripe(evento: dict) -> tuple[EventoStripe, bool]:
+    """Guarda el evento en la bandeja. Stripe reintenta webhooks, así que es idempotente por id."""
+    tipo = evento.get('type', '')
+    objeto = (evento.get('data') or {}).get('object') or {}
+    estado = EventoStripe.Estado.PENDIENTE if tipo in EVENTOS_SOPORTADOS else EventoStripe.Estado.IGNORADO
+    return EventoStripe.objects.get_or_create(
+        stripe_id=evento['id'],
+        defaults={
+            'tipo': tipo,
+            'session_id': objeto.get('id') if objeto.get('object') == 'checkout.session' else None,
+            'payment_intent': objeto.get('payment_intent'),
+            'payload': evento,
+            'estado': estado,
+        },
+    )
+
+
+# ============================================================================
+# Worker: procesamiento de la bandeja
+# ============================================================================
+def _resultado_desde_pago(pago: Pago, mensaje: str) -> dict:
+    return {
+        "mensaje": mensaje,
+        "venta_id": pago.venta_id,
+        "pago_id": pago.id,
+        "total": float(pago.monto),
+    }
+
+
+def _es_sesion_de_carrito(metadata: dict) -> bool:
+    if metadata.get('payment_type') == TIPO_PAGO_CARRITO:
+        return True
+    # Sesiones del carrito creadas antes de etiquetarlas (expiran a las 24 h): sin
+    # payment_type pero con los items resueltos en el servidor
+    return 'payment_type' not in metadata and bool(metadata.get('items'))
+
+
+def procesar_evento(evento: EventoStripe) -> None:
+    """Crea Venta/Pago/DetalleVenta para un checkout completado del carrito.
+
+    Las sesiones con otro `payment_type` (reservas móviles) se marcan IGNORADO
+    sin tocar Usuario ni Venta.
+
+    Idempotente por `payment_intent`: si ya existe un Pago con esa clave se
+    reutiliza y no se vuelve a descontar stock. Debe ejecutarse en una transacción.
+    """
+    session = (evento.payload.get('data') or {}).get('object') or {}
+
+    if session.get('payment_status') != 'paid':
+        evento.estado = EventoStripe.Estado.IGNORADO
+        evento.resultado = {"mensaje": "El pago no se ha completado"}
+        return
+
+    metadata = session.get('metadata') or {}
+    if not _es_sesion_de_carrito(metadata):
+        # P. ej. reservas de la app móvil: su usuario_id es el del User, no el del perfil
+        evento.estado = EventoStripe.Estado.IGNORADO
+        evento.resultado = {
+            "mensaje": "La sesión no es un pago del carrito",
+            "payment_type": metadata.get('payment_type'),
+        }
+        return
+
+    payment_intent = session.get('payment_intent')
+    pago_existente = Pago.objects.filter(stripe_key=payment_intent).first()
+    if pago_existente:
+        evento.estado = EventoStripe.Estado.PROCESADO
+        evento.resultado = _resultado_desde_pago(pago_existente, "El pago ya fue procesado anteriormente")
+        return
+
+    usuario_venta = Usuario.objects.select_related('user').get(id=metadata.get('usuario_id'))
+    total = float(metadata.get('total', 0))
+    try:
+        items = json.loads(metadata.get('items', '[]'))
+    except json.JSONDecodeError:
+        items = []
+
+    venta = Venta.objects.create(
+        usuario=usuario_venta,
+        fecha=timezone.now(),
+        total=total,
+        estado='Pagado',
+    )
+    productos_procesados, productos_sin_stock = descontar_stock_y_crear_detalles(venta, items)
+    pago = Pago.objects.create(
+        monto=total,
+        stripe_key=payment_intent,
+        venta=venta,
+    )
+
+    resultado = _resultado_desde_pago(pago, "Pago procesado y venta creada exitosamente")
+    resultado.update({
+        "fecha": venta.fecha.isoformat(),
+        "usuario": f"{usuario_venta.user.first_name} {usuario_venta.user.last_name}",
+        "productos_procesados": productos_procesados,
+    })
+    if productos_sin_stock:
+        resultado["productos_sin_stock"] = productos_sin_stock
+        resultado["mensaje_stock"] = "Algunos productos tenían stock insuficiente"
+    else:
+        resultado["mensaje_stock"] = "Stock actualizado correctamente"
+
+    evento.estado = EventoStripe.Estado.PROCESADO
+    evento.resultado = resultado
+
+
+def procesar_eventos_pendientes(limite: int = 50) -> dict:
+    """Procesa un lote de eventos pendientes.
+
+    Los eventos se reclaman con `select_for_update(skip_locked=True)`, por lo que
+    pueden correr varios workers en paralelo sin procesar dos veces el mismo evento.
+    Cada evento se procesa en su propio savepoint: un fallo no revierte el lote.
+    """
+    conteo = {"procesados": 0, "ignorados": 0, "fallidos": 0}
+    with transaction.atomic():
+        eventos = list(
+            EventoStripe.objects.select_for_update(skip_locked=True)
+            .filter(estado=EventoStripe.Estado.PENDIENTE)
+            .order_by('id')[:limite]
+        )
+        for evento in eventos:
+            evento.intentos += 1
+            try:
+                with transaction.atomic():
+                    procesar_evento(evento)
+                evento.error = ""
+            except Exception as e:
+                logger.exception('Error procesando evento Stripe %s', evento.stripe_id)
+                evento.error = str(e)
+                if evento.intentos >= MAX_INTENTOS:
+                    evento.estado = EventoStripe.Estado.FALLIDO
+
+            if evento.estado == EventoStripe.Estado.PROCESADO:
+                conteo["procesados"] += 1
+            elif evento.estado == EventoStripe.Estado.IGNORADO:
+                conteo["ignorados"] += 1
+            elif evento.error:
+                conteo["fallidos"] += 1
+            if evento.estado != EventoStripe.Estado.PENDIENTE:
+                evento.procesado_en = timezone.now()
+            evento.save(update_fields=[
+                "estado", "intentos", "error", "resultado", "procesado_en", "updated_at",
+            ])
+    return conteo
@@ -0,0 +1,74 @@
+# core/renderers.py
+"""
+Serialización JSON rápida con orjson (opcional).
+
+- `JSONRapidoRenderer`: renderer por defecto de DRF (ver REST_FRAMEWORK en settings).
+- `JsonResponseRapida`: reemplazo de `JsonResponse` para las vistas Django puras.
+
+orjson serializa datetime, UUID, dataclasses y numpy de forma nativa; lo que no
+conoce (Decimal, lazy strings, QuerySet...) pasa por el mismo encoder que
+usaría la versión estándar, así que la salida es equivalente. Si orjson no está
+instalado, o no puede con un valor (p. ej. enteros de más de 64 bits), se usa
+el encoder de la librería estándar.
+"""
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder as EncoderDRF
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependencia opcional
+    orjson = None
+
+ORJSON_DISPONIBLE = orjson is not None
+
+if ORJSON_DISPONIBLE:
+    _OPCIONES = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    # DRF: Decimal -> float y datetime UTC con sufijo "Z", igual que su JSONEncoder
+    _OPCIONES_DRF = _OPCIONES | orjson.OPT_UTC_Z
+    # Django: datetime truncado a milisegundos y Decimal -> str, como DjangoJSONEncoder
+    _OPCIONES_DJANGO = _OPCIONES | orjson.OPT_PASSTHROUGH_DATETIME
+
+_ENCODER_DRF = EncoderDRF()
+_ENCODER_DJANGO = DjangoJSONEncoder()
+
+
+def _escapar_separadores(contenido: bytes) -> bytes:
+    # Igual que DRF: U+2028/U+2029 escapados para que el JSON sea JavaScript válido
+    return contenido.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+
+class JSONRapidoRenderer(JSONRenderer):
+    """JSONRenderer de DRF con orjson; con indentación (API navegable) usa el estándar."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not ORJSON_DISPONIBLE or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            contenido = orjson.dumps(data, default=_ENCODER_DRF.default, option=_OPCIONES_DRF)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return _escapar_separadores(contenido)
+
+
+class JsonResponseRapida(JsonResponse):
+    """JsonResponse serializado con orjson (mismos argumentos que JsonResponse)."""
+
+    def __init__(self, data, encoder=DjangoJSONEncoder, safe=True, json_dumps_params=None, **kwargs):
+        if not ORJSON_DISPONIBLE or encoder is not DjangoJSONEncoder or json_dumps_params:
+            super().__init__(data, encoder, safe, json_dumps_params, **kwargs)
+            return
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                "In order to allow non-dict objects to be serialized set the safe parameter to False."
+            )
+        try:
+            contenido = orjson.dumps(data, default=_ENCODER_DJANGO.default, option=_OPCIONES_DJANGO)
+        except orjson.JSONEncodeError:
+            super().__init__(data, encoder, safe, json_dumps_params, **kwargs)
+            return
+        kwargs.setdefault("content_type", "application/json")
+        super(JsonResponse, self).__init__(content=contenido, **kwargs)
@@ -0,0 +1,163 @@
+# core/routers.py
+"""
+Lecturas pesadas a la réplica de solo lectura (alias `replica`, configurado con
+DATABASE_REPLICA_URL) para que reportes, IA y listados analíticos no compitan
+con las escrituras del checkout en la primaria.
+
+Todo va a la primaria salvo lo marcado con `lecturas_en_replica()` (context
+manager o decorador) y los GET de DB_REPLICA_RUTAS (ver ReplicaMiddleware).
+Aun dentro de esa marca se lee de la primaria si:
+- el request ya escribió, o el cliente escribió hace menos de
+  DB_REPLICA_LAG_MAX segundos (cookie del middleware): lee lo que escribió;
+- hay una transacción abierta en la primaria;
+- el retraso de la réplica supera DB_REPLICA_LAG_MAX o no responde (se mide
+  cada LAG_CHEQUEO_SEGUNDOS por proceso).
+Sin alias `replica` el router lo manda todo a la primaria.
+"""
+import contextvars
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+REPLICA = "replica"
+LAG_CHEQUEO_SEGUNDOS = 5
+
+# Lecturas marcadas para la réplica en el contexto actual
+_en_replica = contextvars.ContextVar("bd_en_replica", default=False)
+# Estado del request: {"primaria": bool, "escribio": bool}. Es un dict mutable para
+# que una escritura en un hilo de sync_to_async se vea también fuera de él.
+_estado = contextvars.ContextVar("bd_estado_request", default=None)
+
+
+def hay_replica():
+    return REPLICA in settings.DATABASES
+
+
+def iniciar_request(usar_replica, fijado_a_primaria):
+    """Estado nuevo por request (lo llama ReplicaMiddleware). Devuelve los tokens para `terminar_request`."""
+    estado = {"primaria": fijado_a_primaria, "escribio": False}
+    return estado, (_estado.set(estado), _en_replica.set(usar_replica))
+
+
+def terminar_request(tokens):
+    token_estado, token_replica = tokens
+    _en_replica.reset(token_replica)
+    _estado.reset(token_estado)
+
+
+@contextmanager
+def _lecturas_en_replica():
+    # Fuera de un request (comandos, scripts) las escrituras del bloque también fijan la primaria
+    token_estado = _estado.set({"primaria": False, "escribio": False}) if _estado.get() is None else None
+    token = _en_replica.set(True)
+    try:
+        yield
+    finally:
+        _en_replica.reset(token)
+        if token_estado is not None:
+            _estado.reset(token_estado)
+
+
+def lecturas_en_replica(func=None):
+    """
+    Marca lecturas que toleran un retraso de hasta DB_REPLICA_LAG_MAX segundos:
+
+        with lecturas_en_replica():
+            ...
+
+        @lecturas_en_replica
+        def cargar_datos(...): ...
+    """
+    if func is None:
+        return _lecturas_en_replica()
+
+    @functools.wraps(func)
+    def envoltura(*args, **kwargs):
+        with _lecturas_en_replica():
+            return func(*args, **kwargs)
+
+    return envoltura
+
+
+# ==========================================================
+# RETRASO DE LA RÉPLICA
+# ==========================================================
+# Si ya se reprodujo todo el WAL recibido, la réplica está al día aunque la
+# primaria lleve tiempo sin escribir (pg_last_xact_replay_timestamp no avanza)
+_SQL_LAG_POSTGRES = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+_lag = {"medido_en": None, "al_dia": True}
+_lag_lock = threading.Lock()
+
+
+def medir_lag():
+    """Segundos de retraso de la réplica; infinito si no responde. Otros motores (SQLite): 0."""
+    conexion = connections[REPLICA]
+    if conexion.vendor != "postgresql":
+        return 0.0
+    try:
+        with conexion.cursor() as cursor:
+            cursor.execute(_SQL_LAG_POSTGRES)
+            return float(cursor.fetchone()[0])
+    except Exception as e:
+        logger.warning("No se pudo medir el retraso de la réplica: %s", e)
+        return float("inf")
+
+
+def replica_al_dia():
+    ahora = time.monotonic()
+    if _lag["medido_en"] is not None and ahora - _lag["medido_en"] < LAG_CHEQUEO_SEGUNDOS:
+        return _lag["al_dia"]
+    with _lag_lock:
+        if _lag["medido_en"] is None or ahora - _lag["medido_en"] >= LAG_CHEQUEO_SEGUNDOS:
+            lag = medir_lag()
+            al_dia = lag <= settings.DB_REPLICA_LAG_MAX
+            if al_dia != _lag["al_dia"]:
+                logger.warning("Réplica %s (retraso %.1f s)", "de nuevo en uso" if al_dia else "descartada", lag)
+            _lag.update(medido_en=ahora, al_dia=al_dia)
+    return _lag["al_dia"]
+
+
+# ==========================================================
+# ROUTER
+# ==========================================================
+class RouterReplica:
+    """DATABASE_ROUTERS: escrituras y migraciones siempre en la primaria."""
+
+    def db_for_read(self, model, **hints):
+        # Siempre explícito: con None Django usaría la BD de la instancia de la pista,
+        # y un objeto leído de la réplica arrastraría ahí sus relaciones
+        if not _en_replica.get() or not hay_replica():
+            return DEFAULT_DB_ALIAS
+        estado = _estado.get()
+        if estado and estado["primaria"]:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return REPLICA if replica_al_dia() else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        estado = _estado.get()
+        if estado is not None:
+            estado["primaria"] = estado["escribio"] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Mismos datos en ambos alias
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
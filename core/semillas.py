@@ -0,0 +1,177 @@
+# core/semillas.py
+"""
+Carga rápida de datos semilla desde fixtures JSON (formato de `dumpdata`).
+
+`loaddata` guarda objeto por objeto (un INSERT/UPDATE y sus señales por fila) y
+cada archivo es un comando aparte. Aquí:
+- todos los archivos en una sola transacción;
+- por modelo, en orden de sus FK, INSERTs por lotes que ignoran conflictos (lo
+  mismo que `bulk_create(ignore_conflicts=True)`, pero en modo raw como loaddata:
+  auto_now/auto_now_add conservan la fecha del fixture). Las filas que ya existen
+  (misma PK) no se tocan: la carga es idempotente y no pisa datos editados después;
+- las secuencias de PK se reajustan al final (Postgres), igual que en loaddata;
+- los archivos cuyo checksum coincide con el de la última carga en esa BD
+  (`FixtureCargado`) se saltan sin leerlos.
+
+No envía señales post_save: quien llama invalida lo que corresponda. Dentro de
+una migración se pasa su registro de apps (`apps=`) para usar los modelos
+históricos de ese punto.
+"""
+import hashlib
+import json
+import logging
+from collections import defaultdict
+from pathlib import Path
+
+from django.apps import apps as apps_globales
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.constants import OnConflict
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+LOTE = 500
+
+
+def checksum(ruta) -> str:
+    """sha256 del archivo, leído por bloques."""
+    suma = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(64 * 1024), b""):
+            suma.update(bloque)
+    return suma.hexdigest()
+
+
+def _nombre(ruta: Path) -> str:
+    """Ruta relativa al proyecto: la misma clave en cualquier máquina o contenedor."""
+    try:
+        return ruta.resolve().relative_to(Path(settings.BASE_DIR).resolve()).as_posix()
+    except ValueError:
+        return ruta.as_posix()
+
+
+def _instancia(modelo, registro, relaciones_m2m):
+    datos = {}
+    for nombre, valor in registro.get("fields", {}).items():
+        campo = modelo._meta.get_field(nombre)  # también acepta el attname (`producto_id`)
+        if campo.many_to_many:
+            relaciones_m2m.append((campo, valor))
+        elif campo.is_relation:
+            if isinstance(valor, (list, tuple)):
+                raise ValueError(f"{modelo._meta.label}.{nombre}: claves naturales no soportadas, usa la PK")
+            datos[campo.attname] = valor
+        else:
+            datos[campo.attname] = campo.to_python(valor)
+    if registro.get("pk") is not None:
+        datos[modelo._meta.pk.attname] = modelo._meta.pk.to_python(registro["pk"])
+    return modelo(**datos)
+
+
+def _orden_por_fk(modelos):
+    """Cada modelo después de aquellos a los que apunta con FK (entre los que se cargan)."""
+    pendientes, orden = set(modelos), []
+    while pendientes:
+        listos = [
+            m for m in pendientes
+            if not any(
+                campo.related_model in pendientes and campo.related_model is not m
+                for campo in m._meta.concrete_fields if campo.is_relation
+            )
+        ]
+        # Ciclo de FK: se insertan igual; las FK se validan al confirmar (diferidas)
+        listos = sorted(listos or pendientes, key=lambda m: m._meta.label)
+        orden.extend(listos)
+        pendientes.difference_update(listos)
+    return orden
+
+
+def insertar_raw(modelo, objetos, using=DEFAULT_DB_ALIAS):
+    """
+    INSERT ... ON CONFLICT DO NOTHING por lotes (hasta LOTE filas), sin pre_save (raw):
+    los valores se guardan tal cual, incluidos los campos auto_now/auto_now_add.
+    Sin señales ni PKs devueltas; para objetos sin PK la asigna la BD.
+    """
+    manager = modelo._base_manager.using(using)
+    campos = [f for f in modelo._meta.concrete_fields if not f.generated]
+    sin_pk = [f for f in campos if f is not modelo._meta.pk]
+    for grupo, columnas in (
+        ([o for o in objetos if o.pk is not None], campos),
+        ([o for o in objetos if o.pk is None], sin_pk),
+    ):
+        # SQLite admite 999 parámetros por consulta: lotes más chicos en tablas anchas
+        tamanio = max(1, min(LOTE, connections[using].ops.bulk_batch_size(columnas, grupo) or LOTE))
+        for i in range(0, len(grupo), tamanio):
+            manager._insert(grupo[i:i + tamanio], fields=columnas, using=using, raw=True, on_conflict=OnConflict.IGNORE)
+
+
+def _insertar_m2m(campo, pares, using):
+    through = campo.remote_field.through
+    if not through._meta.auto_created:
+        return  # los through explícitos vienen como modelo propio en el fixture
+    origen = through._meta.get_field(campo.m2m_field_name()).attname
+    destino = through._meta.get_field(campo.m2m_reverse_field_name()).attname
+    filas = [through(**{origen: pk, destino: otro}) for pk, valores in pares for otro in valores]
+    through._base_manager.using(using).bulk_create(filas, batch_size=LOTE, ignore_conflicts=True)
+
+
+def cargar_fixtures(rutas, using=DEFAULT_DB_ALIAS, apps=None, forzar=False, registrar=True):
+    """
+    Carga los fixtures que cambiaron desde la última carga (todos con `forzar`).
+    `registrar=False` no lee ni guarda checksums (p. ej. en migraciones anteriores
+    a la tabla `FixtureCargado`). Devuelve {modelo: filas nuevas}.
+    """
+    apps = apps or apps_globales
+    rutas = [Path(r) for r in rutas if Path(r).exists()]
+    sumas = {_nombre(r): checksum(r) for r in rutas}
+    Registro = apps.get_model("core", "FixtureCargado") if registrar else None
+
+    previas = {}
+    if Registro is not None and not forzar:
+        previas = dict(Registro._base_manager.using(using).filter(archivo__in=sumas).values_list("archivo", "checksum"))
+    pendientes = [r for r in rutas if previas.get(_nombre(r)) != sumas[_nombre(r)]]
+    if not pendientes:
+        return {}
+
+    objetos = defaultdict(list)
+    m2m = defaultdict(lambda: defaultdict(list))  # modelo -> campo -> [(pk, [pks relacionados])]
+    for ruta in pendientes:
+        with open(ruta, encoding="utf-8") as f:
+            registros = json.load(f)
+        for registro in registros:
+            modelo = apps.get_model(registro["model"])
+            relaciones = []
+            objeto = _instancia(modelo, registro, relaciones)
+            objetos[modelo].append(objeto)
+            for campo, valores in relaciones:
+                m2m[modelo][campo].append((objeto.pk, valores))
+
+    nuevas = {}
+    with transaction.atomic(using=using):
+        for modelo in _orden_por_fk(objetos):
+            manager = modelo._base_manager.using(using)
+            antes = manager.count()
+            insertar_raw(modelo, objetos[modelo], using)
+            nuevas[modelo._meta.label] = manager.count() - antes
+            for campo, pares in m2m[modelo].items():
+                _insertar_m2m(campo, pares, using)
+
+        conexion = connections[using]
+        sql_secuencias = conexion.ops.sequence_reset_sql(no_style(), list(objetos))
+        if sql_secuencias:
+            with conexion.cursor() as cursor:
+                for sql in sql_secuencias:
+                    cursor.execute(sql)
+
+        if Registro is not None:
+            ahora = timezone.now()
+            Registro._base_manager.using(using).bulk_create(
+                [Registro(archivo=_nombre(r), checksum=sumas[_nombre(r)], cargado=ahora) for r in pendientes],
+                update_conflicts=True,
+                unique_fields=["archivo"],
+                update_fields=["checksum", "cargado"],
+            )
+
+    logger.info("Fixtures cargados (%s archivos): %s", len(pendientes), nuevas)
+    return nuevas
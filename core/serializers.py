@@ -39,6 +39,8 @@ class NotificacionSerializer(serializers.ModelSerializer):
             "destinatarios_detalle",
             "datos_extra",
             "ultimo_resultado",
+            "total_exitosos",
+            "total_fallidos",
             "puede_enviarse",
             "creado_por",
             "created_at",
@@ -47,6 +49,8 @@ class NotificacionSerializer(serializers.ModelSerializer):
         read_only_fields = (
             "enviada_en",
             "ultimo_resultado",
+            "total_exitosos",
+            "total_fallidos",
             "puede_enviarse",
             "creado_por",
             "created_at",
@@ -78,6 +82,15 @@ class NotificacionSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError(
                     {"destinatarios": "Debe seleccionar destinatarios cuando enviar_a_todos es falso."}
                 )
+        estado = attrs.get("estado", self.instance.estado if self.instance else None)
+        programada_para = attrs.get(
+            "programada_para",
+            self.instance.programada_para if self.instance else None,
+        )
+        if estado == Notificacion.Estado.PROGRAMADA and programada_para is None:
+            raise serializers.ValidationError(
+                {"programada_para": "Debe indicar la fecha de envío para una notificación programada."}
+            )
         datos_extra = attrs.get("datos_extra")
         if datos_extra is not None and not isinstance(datos_extra, dict):
             raise serializers.ValidationError({"datos_extra": "Debe ser un objeto JSON válido."})
@@ -1,3 +1,460 @@
-from django.test import TestCase
+import json
+import os
+import threading
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from django.contrib.auth.models import User
+
+from authz.models import Rol, Usuario
+from core import routers
+from core.notifications import FCM_MAX_TOKENS_POR_LOTE, enviar_tokens_push
+from core.pagos import descontar_stock_y_crear_detalles
+from core.middleware import ReplicaMiddleware
+from core.models import EventoStripe, Notificacion
+from tienda.models import DetalleVenta, FCMDevice, Pago, Productos, Venta
+from core.routers import REPLICA, lecturas_en_replica
+
+
+# ==========================================================
+# ROUTER DE RÉPLICA (core/routers.py, ReplicaMiddleware)
+# ==========================================================
+# TransactionTestCase: dentro del atomic de TestCase el router lee siempre de la
+# primaria. `replica` es un espejo SQLite de `default` (config/settings.py).
+class RouterReplicaTests(TransactionTestCase):
+    databases = {DEFAULT_DB_ALIAS, REPLICA}
+
+    def setUp(self):
+        # Medición de retraso nueva en cada test
+        routers._lag.update(medido_en=None, al_dia=True)
+        self.addCleanup(routers._lag.update, medido_en=None, al_dia=True)
+
+    def _consultas(self, func):
+        """Ejecuta func y devuelve (consultas en default, consultas en replica)."""
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primaria, \
+                CaptureQueriesContext(connections[REPLICA]) as replica:
+            func()
+        return len(primaria), len(replica)
+
+    def test_hay_dos_alias(self):
+        self.assertTrue(routers.hay_replica())
+
+    def test_lecturas_marcadas_van_a_la_replica(self):
+        def leer():
+            with lecturas_en_replica():
+                list(Rol.objects.all())
+
+        self.assertEqual(self._consultas(leer), (0, 1))
+
+    def test_decorador_lee_de_la_replica(self):
+        @lecturas_en_replica
+        def leer():
+            return Rol.objects.count()
+
+        self.assertEqual(self._consultas(leer), (0, 1))
+
+    def test_lecturas_sin_marcar_van_a_la_primaria(self):
+        self.assertEqual(self._consultas(lambda: list(Rol.objects.all())), (1, 0))
+
+    def test_escrituras_siempre_en_la_primaria(self):
+        def escribir():
+            with lecturas_en_replica():
+                Rol.objects.create(rol="Prueba")
+                Rol.objects.filter(rol="Prueba").update(rol="Prueba 2")
+                Rol.objects.filter(rol="Prueba 2").delete()
+
+        primaria, replica = self._consultas(escribir)
+        self.assertGreater(primaria, 0)
+        self.assertEqual(replica, 0)
+
+    def test_tras_escribir_lee_de_la_primaria(self):
+        def escribir_y_leer():
+            with lecturas_en_replica():
+                Rol.objects.create(rol="Prueba")
+                self.assertTrue(Rol.objects.filter(rol="Prueba").exists())
+
+        self.assertEqual(self._consultas(escribir_y_leer)[1], 0)
+
+    def test_transaccion_abierta_lee_de_la_primaria(self):
+        def leer():
+            with transaction.atomic(), lecturas_en_replica():
+                list(Rol.objects.all())
+
+        self.assertEqual(self._consultas(leer)[1], 0)
+
+    def test_retraso_alto_vuelve_a_la_primaria(self):
+        def leer():
+            with lecturas_en_replica():
+                list(Rol.objects.all())
+
+        with mock.patch.object(routers, "medir_lag", return_value=settings.DB_REPLICA_LAG_MAX + 1):
+            self.assertEqual(self._consultas(leer), (1, 0))
+
+    def test_replica_sin_respuesta_vuelve_a_la_primaria(self):
+        def leer():
+            with lecturas_en_replica():
+                list(Rol.objects.all())
+
+        with mock.patch.object(routers, "medir_lag", return_value=float("inf")):
+            self.assertEqual(self._consultas(leer), (1, 0))
+
+        # Pasado LAG_CHEQUEO_SEGUNDOS se vuelve a medir y la réplica se usa otra vez
+        routers._lag["medido_en"] -= routers.LAG_CHEQUEO_SEGUNDOS
+        self.assertEqual(self._consultas(leer), (0, 1))
+
+    def test_migraciones_solo_en_la_primaria(self):
+        router = routers.RouterReplica()
+        self.assertTrue(router.allow_migrate(DEFAULT_DB_ALIAS, "authz"))
+        self.assertFalse(router.allow_migrate(REPLICA, "authz"))
+
+
+class ReplicaMiddlewareTests(TransactionTestCase):
+    databases = {DEFAULT_DB_ALIAS, REPLICA}
+
+    def setUp(self):
+        routers._lag.update(medido_en=None, al_dia=True)
+        self.addCleanup(routers._lag.update, medido_en=None, al_dia=True)
+        self.factory = RequestFactory()
+        self.ruta = settings.DB_REPLICA_RUTAS[0] + "prueba/"
+
+    def _vista(self, request):
+        if request.method == "POST":
+            Rol.objects.create(rol="Prueba")
+        list(Rol.objects.all())
+        return HttpResponse("ok")
+
+    def _pedir(self, request):
+        """Respuesta del middleware y alias de la lectura de la vista."""
+        with CaptureQueriesContext(connections[REPLICA]) as replica:
+            response = ReplicaMiddleware(self._vista)(request)
+        return response, REPLICA if len(replica) else DEFAULT_DB_ALIAS
+
+    def test_get_de_ruta_de_replica(self):
+        response, alias = self._pedir(self.factory.get(self.ruta))
+        self.assertEqual(alias, REPLICA)
+        self.assertNotIn(ReplicaMiddleware.COOKIE, response.cookies)
+
+    def test_get_de_otra_ruta_lee_de_la_primaria(self):
+        _response, alias = self._pedir(self.factory.get("/api/tienda/"))
+        self.assertEqual(alias, DEFAULT_DB_ALIAS)
+
+    def test_escritura_fija_al_cliente_a_la_primaria(self):
+        response, alias = self._pedir(self.factory.post(self.ruta))
+        self.assertEqual(alias, DEFAULT_DB_ALIAS)
+        cookie = response.cookies[ReplicaMiddleware.COOKIE]
+        self.assertEqual(cookie["max-age"], max(1, round(settings.DB_REPLICA_LAG_MAX)))
+
+        # El siguiente GET con la cookie lee lo que escribió, de la primaria
+        request = self.factory.get(self.ruta)
+        request.COOKIES[ReplicaMiddleware.COOKIE] = cookie.value
+        _response, alias = self._pedir(request)
+        self.assertEqual(alias, DEFAULT_DB_ALIAS)
+
+    def test_estado_no_se_filtra_entre_requests(self):
+        self._pedir(self.factory.post(self.ruta))
+        _response, alias = self._pedir(self.factory.get(self.ruta))
+        self.assertEqual(alias, REPLICA)
+
+
+# ==========================================================
+# ENVÍO DE NOTIFICACIONES DESDE LA API (reclamo del envío)
+# ==========================================================
+class EnvioNotificacionApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("admin_notif", "admin@notif.com", "x"))
+        self.notificacion = Notificacion.objects.create(titulo="Hola", cuerpo="Prueba")
+
+    def test_solo_un_envio_reclama_la_notificacion(self):
+        otra_copia = Notificacion.objects.get(pk=self.notificacion.pk)
+        self.assertTrue(self.notificacion.reclamar_envio())
+        self.assertFalse(otra_copia.reclamar_envio())
+        self.notificacion.refresh_from_db()
+        self.assertEqual(self.notificacion.estado, Notificacion.Estado.ENVIANDO)
+
+    def test_enviar_responde_409_si_otro_envio_la_tomo(self):
+        # La vista ya validó puede_enviarse() cuando el despacho la reclama
+        Notificacion.objects.filter(pk=self.notificacion.pk).update(estado=Notificacion.Estado.ENVIANDO)
+        with mock.patch.object(Notificacion, "puede_enviarse", return_value=True), \
+                mock.patch.object(Notificacion, "enviar") as enviar:
+            response = self.client.post(f"/api/notificaciones/{self.notificacion.pk}/enviar/")
+        self.assertEqual(response.status_code, 409)
+        enviar.assert_not_called()
+
+    def test_enviar_reclama_antes_de_enviar(self):
+        estados = []
+
+        def enviar(notificacion, **kwargs):
+            estados.append(Notificacion.objects.get(pk=notificacion.pk).estado)
+            return {"success": 0, "failure": 0}
+
+        with mock.patch.object(Notificacion, "enviar", autospec=True, side_effect=enviar):
+            response = self.client.post(f"/api/notificaciones/{self.notificacion.pk}/enviar/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(estados, [Notificacion.Estado.ENVIANDO])
+
+    def test_error_al_enviar_la_deja_fallida(self):
+        with mock.patch.object(Notificacion, "enviar", side_effect=RuntimeError("sin red")), \
+                self.assertRaises(RuntimeError):
+            self.client.post(f"/api/notificaciones/{self.notificacion.pk}/enviar/")
+        self.notificacion.refresh_from_db()
+        self.assertEqual(self.notificacion.estado, Notificacion.Estado.FALLIDA)
+
+
+# ==========================================================
+# BANDEJA DE WEBHOOKS DE STRIPE (core/pagos.py) con SIMULAR_STRIPE=1
+# ==========================================================
+@mock.patch.dict(os.environ, {"SIMULAR_STRIPE": "1"})
+class BandejaStripeTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user("cliente_stripe", "cliente@stripe.com", "x")
+        self.perfil = Usuario.objects.create(user=user)
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.producto_a = Productos.objects.create(descripcion="A", precio=10, stock=5)
+        self.producto_b = Productos.objects.create(descripcion="B", precio=20, stock=3)
+
+    def _evento(self, stripe_id, session_id, payment_intent, pagado=True):
+        items = [
+            {"producto_id": self.producto_a.id, "cantidad": 2, "precio": 10},
+            {"producto_id": self.producto_b.id, "cantidad": 1, "precio": 20},
+        ]
+        return {
+            "id": stripe_id,
+            "type": "checkout.session.completed",
+            "data": {"object": {
+                "object": "checkout.session",
+                "id": session_id,
+                "payment_intent": payment_intent,
+                "payment_status": "paid" if pagado else "unpaid",
+                "metadata": {
+                    "payment_type": "carrito",
+                    "usuario_id": str(self.perfil.id),
+                    "total": "40",
+                    "items": json.dumps(items),
+                },
+            }},
+        }
+
+    def _webhook(self, evento):
+        return self.client.post("/api/stripe/webhook/", json.dumps(evento), content_type="application/json")
+
+    def _ventas(self):
+        # La base de pruebas trae las ventas semilla de los fixtures
+        return Venta.objects.filter(usuario=self.perfil)
+
+    def _procesar(self):
+        call_command("procesar_eventos_stripe", stdout=StringIO())
+
+    def test_webhook_guarda_el_evento_una_vez(self):
+        evento = self._evento("evt_1", "cs_1", "pi_1")
+        self.assertEqual(self._webhook(evento).status_code, 200)
+        # Stripe reintenta el webhook: mismo id, misma fila
+        self.assertEqual(self._webhook(evento).status_code, 200)
+
+        guardado = EventoStripe.objects.get()
+        self.assertEqual(guardado.estado, EventoStripe.Estado.PENDIENTE)
+        self.assertEqual((guardado.session_id, guardado.payment_intent), ("cs_1", "pi_1"))
+        self.assertFalse(self._ventas().exists())
+
+    def test_webhook_invalido(self):
+        response = self.client.post("/api/stripe/webhook/", "no es json", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(EventoStripe.objects.exists())
+
+    def test_worker_crea_venta_pago_y_detalles(self):
+        self._webhook(self._evento("evt_1", "cs_1", "pi_1"))
+        self._procesar()
+
+        venta = self._ventas().get()
+        self.assertEqual((venta.usuario, venta.total, venta.estado), (self.perfil, 40, "Pagado"))
+        self.assertEqual(Pago.objects.get(venta=venta).stripe_key, "pi_1")
+        self.assertEqual(DetalleVenta.objects.filter(venta=venta).count(), 2)
+        self.producto_a.refresh_from_db()
+        self.producto_b.refresh_from_db()
+        self.assertEqual((self.producto_a.stock, self.producto_b.stock), (3, 2))
+        self.assertEqual(EventoStripe.objects.get().estado, EventoStripe.Estado.PROCESADO)
+
+    def test_payment_intent_repetido_no_duplica_la_venta(self):
+        self._webhook(self._evento("evt_1", "cs_1", "pi_1"))
+        self._webhook(self._evento("evt_2", "cs_1", "pi_1"))
+        self._procesar()
+
+        self.assertEqual(self._ventas().count(), 1)
+        self.assertEqual(Pago.objects.filter(stripe_key="pi_1").count(), 1)
+        self.producto_a.refresh_from_db()
+        self.assertEqual(self.producto_a.stock, 3)
+        self.assertEqual(
+            set(EventoStripe.objects.values_list("estado", flat=True)), {EventoStripe.Estado.PROCESADO}
+        )
+
+    def test_verificar_pago(self):
+        def verificar(session_id=None):
+            params = {"session_id": session_id} if session_id else {}
+            return self.client.get("/api/verificar-pago/", params)
+
+        self.assertEqual(verificar().status_code, 400)
+        # Sin evento o pendiente: el cliente vuelve a consultar
+        self.assertEqual(verificar("cs_1").status_code, 202)
+        self._webhook(self._evento("evt_1", "cs_1", "pi_1"))
+        self.assertEqual(verificar("cs_1").status_code, 202)
+
+        self._procesar()
+        response = verificar("cs_1")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["pago_exitoso"])
+        self.assertEqual(response.json()["venta_id"], self._ventas().get().id)
+
+        # Pago no completado: el worker lo ignora
+        self._webhook(self._evento("evt_2", "cs_2", "pi_2", pagado=False))
+        self._procesar()
+        self.assertEqual(verificar("cs_2").status_code, 400)
+
+
+# ==========================================================
+# ENVÍO PUSH POR LOTES (core/notifications.py) con un backend falso
+# ==========================================================
+class BackendFalso:
+    """Registra cada lote; rechaza los tokens de `invalidos` (FCM) y falla los de `caidos`."""
+
+    def __init__(self, invalidos=(), caidos=()):
+        self.invalidos, self.caidos = set(invalidos), set(caidos)
+        self.lotes = []
+        self._lock = threading.Lock()  # los lotes llegan desde el pool de hilos
+
+    def enviar_multicast(self, tokens, plataforma, titulo, cuerpo, datos):
+        with self._lock:
+            self.lotes.append((plataforma, list(tokens)))
+        return [
+            "registration-token-not-registered" if t in self.invalidos
+            else RuntimeError("UNAVAILABLE") if t in self.caidos
+            else None
+            for t in tokens
+        ]
+
+
+class EnvioPushTests(TestCase):
+    def test_lotes_de_hasta_500_por_plataforma(self):
+        android = [f"android_{i}" for i in range(1201)]
+        ios = [(f"ios_{i}", "ios") for i in range(3)]
+        backend = BackendFalso()
+
+        # Los repetidos se envían una sola vez
+        resultado = enviar_tokens_push(android + android[:10] + ios, "T", "C", backend=backend, max_hilos=4)
+
+        tamanos = sorted(len(lote) for _, lote in backend.lotes)
+        self.assertEqual(tamanos, [3, 201, 500, 500])
+        self.assertTrue(all(len(lote) <= FCM_MAX_TOKENS_POR_LOTE for _, lote in backend.lotes))
+        self.assertEqual({p for p, _ in backend.lotes}, {None, "ios"})
+        enviados = [t for _, lote in backend.lotes for t in lote]
+        self.assertEqual(len(enviados), len(set(enviados)))
+        self.assertEqual(resultado["success"], 1204)
+
+    def test_suma_exitos_y_fallos(self):
+        tokens = [f"t_{i}" for i in range(700)]
+        backend = BackendFalso(invalidos={"t_1", "t_600"}, caidos={"t_2"})
+
+        resultado = enviar_tokens_push(tokens, "T", "C", backend=backend, detalle_por_token=True)
+
+        self.assertEqual((resultado["success"], resultado["failure"]), (697, 3))
+        self.assertEqual(len(resultado["responses"]), 700)
+        errores = {token: error for token, error in resultado["por_token"] if error is not None}
+        self.assertEqual(set(errores), {"t_1", "t_2", "t_600"})
+        self.assertIsInstance(errores["t_2"], RuntimeError)
+
+    def test_tokens_rechazados_se_desactivan_en_un_update(self):
+        FCMDevice.objects.bulk_create([FCMDevice(registration_id=f"t_{i}") for i in range(600)])
+        backend = BackendFalso(invalidos={"t_1", "t_550"}, caidos={"t_2"})
+
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as consultas:
+            enviar_tokens_push([f"t_{i}" for i in range(600)], "T", "C", backend=backend)
+
+        updates = [q["sql"] for q in consultas if q["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+        self.assertIn("registration_id", updates[0])
+        inactivos = set(FCMDevice.objects.filter(activo=False).values_list("registration_id", flat=True))
+        # Un error transitorio (UNAVAILABLE) no desactiva el token
+        self.assertEqual(inactivos, {"t_1", "t_550"})
+
+
+# ==========================================================
+# DESCUENTO DE STOCK DEL CHECKOUT (core/pagos.py)
+# ==========================================================
+class DescontarStockTests(TestCase):
+    def setUp(self):
+        perfil = Usuario.objects.create(user=User.objects.create_user("cliente_stock", "stock@x.com", "x"))
+        self.venta = Venta.objects.create(usuario=perfil, fecha=timezone.now(), total=0)
+        self.productos = [Productos.objects.create(descripcion=f"P{i}", precio=10, stock=5) for i in range(3)]
+
+    def _items(self, *cantidades):
+        return [{"producto_id": p.id, "cantidad": c, "precio": 10} for p, c in zip(self.productos, cantidades)]
+
+    def _stock(self):
+        return [p.stock for p in Productos.objects.filter(pk__in=[p.pk for p in self.productos]).order_by("id")]
+
+    def test_descuenta_cada_producto_una_vez(self):
+        # Dos líneas del mismo producto se suman en un único descuento
+        items = self._items(2, 1, 5) + [{"producto_id": self.productos[0].id, "cantidad": 1, "precio": 10}]
+        with transaction.atomic():
+            procesados, sin_stock = descontar_stock_y_crear_detalles(self.venta, items)
+
+        self.assertEqual(sin_stock, [])
+        self.assertEqual(len(procesados), 4)
+        self.assertEqual(self._stock(), [2, 4, 0])
+        self.assertEqual(DetalleVenta.objects.filter(venta=self.venta).count(), 4)
+
+    def test_consultas_constantes(self):
+        def consultas(items):
+            with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as capturadas, transaction.atomic():
+                descontar_stock_y_crear_detalles(self.venta, items)
+            return len(capturadas)
+
+        self.productos += [Productos.objects.create(descripcion=f"Q{i}", precio=10, stock=5) for i in range(7)]
+        self.assertEqual(consultas(self._items(1)), consultas(self._items(*[1] * 10)))
+
+    def test_stock_que_cambia_antes_del_update_revierte_todo_el_carrito(self):
+        # Otra compra deja sin stock al segundo producto entre la lectura bloqueada
+        # y el UPDATE condicional (sin FOR UPDATE, como en SQLite)
+        leer = Productos.objects.select_for_update
+        otro = self.productos[1]
+
+        def lectura_y_compra_concurrente(*args, **kwargs):
+            class Consulta:
+                def filter(self, **filtro):
+                    self.filtro = filtro
+                    return self
+
+                def only(self, *campos):
+                    return self
+
+                def order_by(self, *campos):
+                    leidos = list(leer().filter(**self.filtro).order_by(*campos))
+                    Productos.objects.filter(pk=otro.pk).update(stock=0)
+                    return leidos
+
+            return Consulta()
+
+        with mock.patch.object(Productos.objects, "select_for_update", side_effect=lectura_y_compra_concurrente):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                descontar_stock_y_crear_detalles(self.venta, self._items(2, 1, 1))
+
+        # El savepoint se revierte entero: ni descuentos ni detalles (ni la compra simulada)
+        self.assertEqual(self._stock(), [5, 5, 5])
+        self.assertFalse(DetalleVenta.objects.filter(venta=self.venta).exists())
+
+    def test_linea_sin_stock_al_leer_se_informa(self):
+        with transaction.atomic():
+            procesados, sin_stock = descontar_stock_y_crear_detalles(self.venta, self._items(2, 6, 1))
+
+        self.assertEqual([p["producto"] for p in procesados], ["P0", "P2"])
+        self.assertEqual(sin_stock, [{"producto": "P1", "solicitado": 6, "disponible": 5}])
+        self.assertEqual(self._stock(), [3, 5, 4])
@@ -3,6 +3,7 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     crear_checkout_session,
     verificar_pago,
+    stripe_webhook,
     
     crear_checkout_session_mobile,
     pago_exitoso_mobile,
@@ -17,6 +18,7 @@ urlpatterns = [
     # Endpoints web existentes
     path('crear-checkout-session/', crear_checkout_session, name='crear-checkout-session'),
     path('verificar-pago/', verificar_pago, name='verificar-pago'),
+    path('stripe/webhook/', stripe_webhook, name='stripe-webhook'),
     
     path('crear-checkout-session-mobile/', crear_checkout_session_mobile, name='crear-checkout-mobile'),
     path('pago-exitoso-mobile/', pago_exitoso_mobile, name='pago-exitoso-mobile'),
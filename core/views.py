@@ -1,26 +1,38 @@
 # core/views.py
 
 from datetime import datetime
+from decimal import Decimal
 import json
+import logging
+from asgiref.sync import sync_to_async
 from django.http import HttpResponse
-import stripe
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 from django.conf import settings
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+from django.utils.dateparse import parse_date
 from rest_framework.decorators import api_view, authentication_classes, permission_classes, action
 from rest_framework.response import Response
 import os
 from dotenv import load_dotenv
 from rest_framework import status, viewsets, permissions
-from django.db import transaction
-from tienda.models import Pago, Venta, Productos, DetalleVenta
+from authz.autenticacion import TokenCacheadoAuthentication, perfil_de
 from authz.models import Usuario
-from rest_framework.authentication import TokenAuthentication
+from tienda.catalogo import resolver_productos
 from rest_framework.permissions import IsAuthenticated
 
-from .models import Notificacion
+from .asincrono import externo, request_drf
+from .metricas import registro as registro_metricas
+from .models import EntregaNotificacion, EventoStripe, Notificacion
+from .pagos import TIPO_PAGO_CARRITO, cliente_stripe, construir_evento, registrar_evento_stripe
+from .renderers import JsonResponseRapida
+from .routers import lecturas_en_replica
 from .serializers import NotificacionSerializer, UsuarioSimpleSerializer
 
+logger = logging.getLogger(__name__)
+
 load_dotenv()
-stripe.api_key = settings.STRIPE_SECRET_KEY
 url_frontend = os.getenv("URL_FRONTEND", "http://127.0.0.1:3000")
 
 
@@ -42,52 +54,86 @@ def redirect_to_deep_link(url):
 
 # @permission_classes([IsAuthenticated])
 
-@api_view(["POST"])
-def crear_checkout_session(request):
+@csrf_exempt
+@require_POST
+async def crear_checkout_session(request):
+    """
+    POST /api/crear-checkout-session/ (vista async, ver core/asincrono.py).
+
+    Precios, stock y usuario se resuelven con el ORM; la creación de la sesión en
+    Stripe, que es la espera larga, corre fuera del event loop.
+    """
+    drf_request, error = await request_drf(request)
+    if error:
+        return error
+
     try:
-        data = request.data
+        data = drf_request.data
         items = data.get("items", [])  # Lista de productos
         descripcion_general = data.get("descripcion", "Compra en MiTienda")
         
         if not items:
-            return Response({"error": "No hay productos en el carrito"}, status=status.HTTP_400_BAD_REQUEST)
+            return JsonResponseRapida({"error": "No hay productos en el carrito"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Resolver precios en el servidor (una sola búsqueda para todo el carrito,
+        # con promociones vigentes aplicadas); no se confía en precio/nombre del cliente
+        try:
+            catalogo = await sync_to_async(resolver_productos)(
+                [item.get("producto_id") for item in items if item.get("producto_id")]
+            )
+        except (TypeError, ValueError):
+            return JsonResponseRapida({"error": "ID de producto inválido"}, status=status.HTTP_400_BAD_REQUEST)
 
         # Calcular total y preparar items para Stripe
-        total = 0
+        total = Decimal("0")
         line_items = []
-        
+        items_venta = []
+
         for item in items:
             producto_id = item.get("producto_id")
             cantidad = int(item.get("cantidad", 1))
-            precio_unitario = float(item.get("precio", 0))
-            nombre = item.get("nombre", "Producto")
-            
+            producto = catalogo.get(int(producto_id)) if producto_id else None
+
+            if producto is None or producto["estado"] != "Activo":
+                return JsonResponseRapida({"error": f"Producto no disponible: {producto_id}"}, status=status.HTTP_400_BAD_REQUEST)
+            if cantidad <= 0:
+                return JsonResponseRapida({"error": f"Cantidad inválida para {producto['descripcion']}"}, status=status.HTTP_400_BAD_REQUEST)
+            if producto["stock"] < cantidad:
+                return JsonResponseRapida({"error": f"Stock insuficiente para {producto['descripcion']}"}, status=status.HTTP_400_BAD_REQUEST)
+
+            precio_unitario = producto["precio_final"]
             if precio_unitario <= 0:
-                return Response({"error": f"Precio inválido para {nombre}"}, status=status.HTTP_400_BAD_REQUEST)
-            
+                return JsonResponseRapida({"error": f"Precio inválido para {producto['descripcion']}"}, status=status.HTTP_400_BAD_REQUEST)
+
             total += precio_unitario * cantidad
-            
+
             line_items.append({
                 "price_data": {
                     "currency": "bob",
-                    "product_data": {"name": nombre},
+                    "product_data": {"name": producto["descripcion"]},
                     "unit_amount": int(precio_unitario * 100),  # Convertir a centavos
                 },
                 "quantity": cantidad,
             })
+            items_venta.append({
+                "producto_id": producto["id"],
+                "cantidad": cantidad,
+                "precio": str(precio_unitario),
+            })
+
+        total = float(total)
 
         if total <= 0:
-            return Response({"error": "Total inválido"}, status=status.HTTP_400_BAD_REQUEST)
+            return JsonResponseRapida({"error": "Total inválido"}, status=status.HTTP_400_BAD_REQUEST)
 
         # ✅ CORREGIDO: Obtener usuario autenticado actual
-        if not request.user.is_authenticated:
-            return Response({"error": "Usuario no autenticado. Por favor inicia sesión."}, status=status.HTTP_401_UNAUTHORIZED)
+        if not drf_request.user.is_authenticated:
+            return JsonResponseRapida({"error": "Usuario no autenticado. Por favor inicia sesión."}, status=status.HTTP_401_UNAUTHORIZED)
 
-        try:
-            usuario = Usuario.objects.get(user=request.user)
-            usuario_id = str(usuario.id)
-        except Usuario.DoesNotExist:
-            return Response({"error": "Perfil de usuario no encontrado"}, status=status.HTTP_404_NOT_FOUND)
+        usuario = await sync_to_async(perfil_de)(drf_request)
+        if usuario is None:
+            return JsonResponseRapida({"error": "Perfil de usuario no encontrado"}, status=status.HTTP_404_NOT_FOUND)
+        usuario_id = str(usuario.id)
 
 
         # Construir URLs de retorno
@@ -96,23 +142,25 @@ def crear_checkout_session(request):
         cancel_url = f"{url_frontend}/pago-cancelado/"
 
         # Crear sesión de checkout en Stripe
-        session = stripe.checkout.Session.create(
+        session = await externo(
+            cliente_stripe().checkout.Session.create,
             payment_method_types=["card"],
             mode="payment",
             line_items=line_items,
             success_url=success_url,
             cancel_url=cancel_url,
             metadata={
+                "payment_type": TIPO_PAGO_CARRITO,  # el worker sólo crea ventas para estas sesiones
                 "usuario_id": usuario_id,  
                 "descripcion": descripcion_general,
                 "total": str(total),
                 "fecha": datetime.now().isoformat(),
-                "items": json.dumps(items),  # Guardar todos los items como JSON
+                "items": json.dumps(items_venta),  # Items con precios resueltos en el servidor
                 "fecha_solicitud": datetime.now(),  #
             },
         )
 
-        return Response({
+        return JsonResponseRapida({
             "checkout_url": session.url,
             "session_id": session.id,
             "total": total,
@@ -121,174 +169,93 @@ def crear_checkout_session(request):
 
     except Exception as e:
         print("❌ Error creando sesión de Stripe:", e)
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return JsonResponseRapida({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 @api_view(["GET"])
-@authentication_classes([TokenAuthentication])  # 🔐 Agregar esto
+@authentication_classes([TokenCacheadoAuthentication])  # 🔐 Agregar esto
 @permission_classes([IsAuthenticated])          # 🔐 Y esto
 def verificar_pago(request):
+    """
+    Consulta el estado local del pago de una sesión de Checkout.
+
+    La venta la crea el worker `procesar_eventos_stripe` a partir del webhook
+    `checkout.session.completed`; aquí sólo se lee la bandeja, sin llamar a Stripe.
+    Mientras el evento no llegue o esté pendiente se responde 202 para que el
+    cliente vuelva a consultar.
+    """
     session_id = request.GET.get("session_id")
 
     if not session_id:
         return Response({"error": "Falta session_id"}, status=status.HTTP_400_BAD_REQUEST)
 
-    try:
-        # DEBUG: Verificar autenticación
-        print(f"🔐 Usuario autenticado: {request.user}")
-        print(f"🔐 Is authenticated: {request.user.is_authenticated}")
-        
-        # Recuperar la sesión de Stripe
-        session = stripe.checkout.Session.retrieve(session_id)
-        pago_exitoso = session.payment_status == "paid"
-
-        if not pago_exitoso:
-            return Response({
-                "pago_exitoso": False,
-                "mensaje": "El pago no se ha completado"
-            }, status=status.HTTP_400_BAD_REQUEST)
-
-        # El resto de tu código permanece igual...
-        metadata = getattr(session, "metadata", {}) or {}
-        usuario_id = metadata.get("usuario_id")
-        descripcion = metadata.get("descripcion", "Compra en MiTienda")
-        total = float(metadata.get("total", 0))
-        items_json = metadata.get("items", "[]")
-        
-        try:
-            items = json.loads(items_json)
-        except json.JSONDecodeError:
-            items = []
+    evento = (
+        EventoStripe.objects.filter(session_id=session_id, tipo="checkout.session.completed")
+        .only("estado", "resultado", "error")
+        .first()
+    )
 
-        # Buscar si ya existe una venta para esta sesión
-        pago_existente = Pago.objects.filter(stripe_key=session.payment_intent).first()
-        
-        if pago_existente:
-            return Response({
-                "pago_exitoso": True,
-                "mensaje": "El pago ya fue procesado anteriormente",
-                "venta_id": pago_existente.venta.id,
-                "pago_id": pago_existente.id,
-                "total": float(pago_existente.monto)
-            })
+    if evento is None or evento.estado == EventoStripe.Estado.PENDIENTE:
+        return Response({
+            "pago_exitoso": False,
+            "pendiente": True,
+            "mensaje": "El pago se está confirmando, intenta nuevamente en unos segundos"
+        }, status=status.HTTP_202_ACCEPTED)
 
-        # ✅ Ahora request.user está autenticado gracias a los decoradores
-        try:
-            usuario_venta = Usuario.objects.get(user=request.user)
-        except Usuario.DoesNotExist:
-            return Response({
-                "error": "Perfil de usuario no encontrado"
-            }, status=status.HTTP_404_NOT_FOUND)
-
-        # Crear venta, pago y reducir stock en una transacción
-        with transaction.atomic():
-            venta = Venta.objects.create(
-                usuario=usuario_venta,
-                total=total,
-                estado='Pagado',
-            )
+    if evento.estado == EventoStripe.Estado.PROCESADO:
+        return Response({"pago_exitoso": True, **(evento.resultado or {})})
 
-            productos_sin_stock = []
-            productos_procesados = []  # Para debug
-            
-            # Crear detalles de venta y reducir stock
-            for item in items:
-                producto_id = item.get("producto_id")
-                cantidad = int(item.get("cantidad", 1))
-                precio_unitario = float(item.get("precio", 0))
-                
-                if not producto_id:
-                    productos_sin_stock.append({
-                        "producto": "Producto sin ID",
-                        "solicitado": cantidad,
-                        "disponible": 0,
-                        "error": "Falta ID del producto"
-                    })
-                    continue
-
-                try:
-                    producto = Productos.objects.get(id=producto_id, estado='Activo')
-                    
-                    # ✅ VERIFICAR Y REDUCIR STOCK
-                    print(f"📦 Procesando producto: {producto.descripcion}")
-                    print(f"📦 Stock antes: {producto.stock}, Cantidad a reducir: {cantidad}")
-                    
-                    if producto.stock < cantidad:
-                        productos_sin_stock.append({
-                            "producto": producto.descripcion,
-                            "solicitado": cantidad,
-                            "disponible": producto.stock
-                        })
-                        continue
-                    
-                    # ✅ REDUCIR EL STOCK - ¡Esto es lo importante!
-                    producto.stock -= cantidad
-                    producto.save()
-                    
-                    print(f"📦 Stock después: {producto.stock}")
-                    productos_procesados.append({
-                        "producto": producto.descripcion,
-                        "cantidad": cantidad,
-                        "stock_restante": producto.stock
-                    })
-                    
-                except Productos.DoesNotExist:
-                    productos_sin_stock.append({
-                        "producto": f"ID {producto_id}",
-                        "solicitado": cantidad,
-                        "disponible": 0,
-                        "error": "Producto no encontrado"
-                    })
-                    continue
-
-                # Calcular subtotal y crear detalle de venta
-                subtotal = precio_unitario * cantidad
-                
-                DetalleVenta.objects.create(
-                    venta=venta,
-                    producto=producto,
-                    cantidad=cantidad,
-                    subtotal=subtotal
-                )
+    if evento.estado == EventoStripe.Estado.IGNORADO:
+        return Response({
+            "pago_exitoso": False,
+            "mensaje": "El pago no se ha completado"
+        }, status=status.HTTP_400_BAD_REQUEST)
 
-            # Debug: mostrar productos procesados
-            print(f"✅ Productos procesados: {productos_procesados}")
-            print(f"⚠️ Productos sin stock: {productos_sin_stock}")
+    return Response({"error": evento.error or "Error procesando pago"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            # Crear el pago
-            pago = Pago.objects.create(
-                monto=total,
-                stripe_key=session.payment_intent,
-                venta=venta
-            )
 
-        # Construir respuesta
-        respuesta = {
-            "pago_exitoso": True,
-            "mensaje": "Pago procesado y venta creada exitosamente",
-            "venta_id": venta.id,
-            "pago_id": pago.id,
-            "total": total,
-            "fecha": venta.fecha.isoformat(),
-            "usuario": f"{usuario_venta.user.first_name} {usuario_venta.user.last_name}",
-            "productos_procesados": productos_procesados,  # Para debug
-        }
+@csrf_exempt
+@require_POST
+def stripe_webhook(request):
+    """
+    Webhook de Stripe (POST /api/stripe/webhook/).
 
-        if productos_sin_stock:
-            respuesta["productos_sin_stock"] = productos_sin_stock
-            respuesta["mensaje_stock"] = "Algunos productos tenían stock insuficiente"
-        else:
-            respuesta["mensaje_stock"] = "Stock actualizado correctamente"
+    Verifica la firma (`Stripe-Signature`) y guarda el evento en la bandeja
+    `EventoStripe`; el procesamiento ocurre en el worker, así Stripe recibe su
+    200 de inmediato aunque lleguen ráfagas de pagos.
+    """
+    try:
+        evento = construir_evento(request.body, request.META.get("HTTP_STRIPE_SIGNATURE"))
+        registrar_evento_stripe(evento)
+    except (ValueError, KeyError) as e:
+        logger.warning("Webhook de Stripe rechazado: %s", e)
+        return HttpResponse(status=400)
+    return HttpResponse(status=200)
+
+
+# ============================================================================
+# MÉTRICAS (formato Prometheus)
+# ============================================================================
+_IPS_LOCALES = {"127.0.0.1", "::1"}
+
+
+@require_GET
+def metricas_prometheus(request):
+    """
+    GET /metrics — métricas del worker que atiende el request.
+
+    Sólo desde localhost, o con `Authorization: Bearer <METRICAS_TOKEN>` si la
+    variable está definida (para un scraper externo).
+    """
+    token = os.getenv("METRICAS_TOKEN")
+    autorizado = request.META.get("REMOTE_ADDR") in _IPS_LOCALES or (
+        token and request.headers.get("Authorization") == f"Bearer {token}"
+    )
+    if not autorizado:
+        return HttpResponse(status=403)
+    return HttpResponse(registro_metricas.exportar(), content_type="text/plain; version=0.0.4; charset=utf-8")
 
-        return Response(respuesta)
 
-    except stripe.error.InvalidRequestError as e:
-        print("❌ Error de Stripe:", e)
-        return Response({"error": "Sesión de pago no válida"}, status=status.HTTP_400_BAD_REQUEST)
-    except Exception as e:
-        print("❌ Error procesando pago:", e)
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    
 # ============================================================================
 # 📱 ENDPOINTS ESPECÍFICOS PARA APP MÓVIL FLUTTER - STRIPE CON DEEP LINKS
 # ============================================================================
@@ -467,7 +434,7 @@ def crear_checkout_session_mobile(request):
             session_params["customer_email"] = request.user.email
 
         # Crear sesión en Stripe
-        session = stripe.checkout.Session.create(**session_params)
+        session = cliente_stripe().checkout.Session.create(**session_params)
 
         # Log para debugging
         print(f"✅ Sesión Stripe móvil creada")
@@ -545,7 +512,7 @@ def pago_exitoso_mobile(request):
 
     try:
         # Verificar sesión con Stripe API
-        session = stripe.checkout.Session.retrieve(session_id)
+        session = cliente_stripe().checkout.Session.retrieve(session_id)
 
         print(f"   Estado de pago: {session.payment_status}")
         print(f"   Monto: {session.amount_total} centavos")
@@ -700,7 +667,7 @@ class NotificacionViewSet(viewsets.ModelViewSet):
     queryset = Notificacion.objects.select_related("creado_por").prefetch_related("destinatarios")
     serializer_class = NotificacionSerializer
     permission_classes = [permissions.IsAuthenticated]
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [TokenCacheadoAuthentication]
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -726,6 +693,27 @@ class NotificacionViewSet(viewsets.ModelViewSet):
         datos = request.data.get("datos_extra") if hasattr(request, "data") else None
         return datos if isinstance(datos, dict) else None
 
+    def _enviar_reclamada(self, notificacion, request):
+        """
+        Resultado del envío, o None si otro envío (otra llamada a la API o el
+        despacho de programadas) ya la tomó: sin el reclamo, cada token recibiría
+        el push dos veces.
+        """
+        if not notificacion.reclamar_envio():
+            return None
+        try:
+            return notificacion.enviar(datos_extra=self._datos_extra(request))
+        except Exception as e:
+            notificacion.marcar_fallida(e)
+            raise
+
+    @staticmethod
+    def _respuesta_en_envio():
+        return Response(
+            {"detail": "La notificación ya se está enviando o ya fue enviada."},
+            status=status.HTTP_409_CONFLICT,
+        )
+
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -734,7 +722,9 @@ class NotificacionViewSet(viewsets.ModelViewSet):
         )
         resultado = None
         if self._should_send(request) and notificacion.puede_enviarse():
-            resultado = notificacion.enviar(datos_extra=self._datos_extra(request))
+            resultado = self._enviar_reclamada(notificacion, request)
+            if resultado is None:
+                return self._respuesta_en_envio()
 
         response_serializer = self.get_serializer(notificacion)
         data = response_serializer.data
@@ -752,7 +742,9 @@ class NotificacionViewSet(viewsets.ModelViewSet):
 
         resultado = None
         if self._should_send(request) and notificacion.puede_enviarse():
-            resultado = notificacion.enviar(datos_extra=self._datos_extra(request))
+            resultado = self._enviar_reclamada(notificacion, request)
+            if resultado is None:
+                return self._respuesta_en_envio()
 
         response_serializer = self.get_serializer(notificacion)
         data = response_serializer.data
@@ -769,13 +761,91 @@ class NotificacionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        resultado = notificacion.enviar(datos_extra=self._datos_extra(request))
+        resultado = self._enviar_reclamada(notificacion, request)
+        if resultado is None:
+            return self._respuesta_en_envio()
         serializer = self.get_serializer(notificacion)
         data = serializer.data
         data["ultimo_resultado"] = resultado
         return Response(data)
 
+    @staticmethod
+    def _tasa(exitosos: int, total: int) -> float:
+        return round(exitosos / total * 100, 2) if total else 0.0
+
+    @staticmethod
+    def _fecha_param(request, nombre):
+        """Fecha AAAA-MM-DD del query param, None si no viene; ValueError si no es válida."""
+        valor = request.query_params.get(nombre)
+        if not valor:
+            return None
+        try:
+            fecha = parse_date(valor)
+        except ValueError:
+            fecha = None
+        if fecha is None:
+            raise ValueError(f"'{nombre}' debe ser una fecha AAAA-MM-DD")
+        return fecha
+
+    @action(detail=True, methods=["get"], url_path="entregas")
+    def entregas(self, request, pk=None):
+        """Tasa de entrega de una notificación y sus fallos agrupados por código/clase de error."""
+        notificacion = self.get_object()
+        total = notificacion.total_exitosos + notificacion.total_fallidos
+        errores = (
+            EntregaNotificacion.objects.filter(notificacion=notificacion)
+            .exclude(codigo=EntregaNotificacion.CODIGO_OK)
+            .values("codigo", "error_clase")
+            .annotate(cantidad=Count("id"))
+            .order_by("-cantidad")
+        )
+        return Response({
+            "notificacion": notificacion.id,
+            "total": total,
+            "exitosos": notificacion.total_exitosos,
+            "fallidos": notificacion.total_fallidos,
+            "tasa_entrega": self._tasa(notificacion.total_exitosos, total),
+            "errores": list(errores),
+        })
+
+    @action(detail=False, methods=["get"], url_path="metricas-entrega")
+    def metricas_entrega(self, request):
+        """Tasa de entrega global (desde los contadores) y fallos por código en el rango ?desde=&hasta=."""
+        notificaciones = Notificacion.objects.all()
+        entregas = EntregaNotificacion.objects.all()
+        try:
+            desde = self._fecha_param(request, "desde")
+            hasta = self._fecha_param(request, "hasta")
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if desde:
+            notificaciones = notificaciones.filter(enviada_en__date__gte=desde)
+            entregas = entregas.filter(creado__date__gte=desde)
+        if hasta:
+            notificaciones = notificaciones.filter(enviada_en__date__lte=hasta)
+            entregas = entregas.filter(creado__date__lte=hasta)
+
+        totales = notificaciones.aggregate(
+            exitosos=Coalesce(Sum("total_exitosos"), 0),
+            fallidos=Coalesce(Sum("total_fallidos"), 0),
+            notificaciones=Count("id"),
+        )
+        total = totales["exitosos"] + totales["fallidos"]
+        errores = (
+            entregas.exclude(codigo=EntregaNotificacion.CODIGO_OK)
+            .values("codigo")
+            .annotate(cantidad=Count("id"))
+            .order_by("-cantidad")
+        )
+        return Response({
+            **totales,
+            "total": total,
+            "tasa_entrega": self._tasa(totales["exitosos"], total),
+            "errores": list(errores),
+        })
+
     @action(detail=False, methods=["get"], url_path="destinatarios")
+    @lecturas_en_replica
     def listar_destinatarios(self, request):
         usuarios = Usuario.objects.filter(estado=True).select_related("user", "rol").order_by(
             "user__first_name", "user__last_name"
@@ -2,18 +2,6 @@
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 
-from scikit_learn_ia.paths import (
-    DATA_DIR,
-    MODEL_DIR,
-    VENTAS_CSV,
-    DETALLES_CSV,
-    PRED_TOTALES_CSV,
-    MODEL_CANTIDADES,
-    METADATA_CANT,
-    PDF_PATH,
-    XLSX_PATH
-)
-
 
 @csrf_exempt
 def debug_volumen(request):
@@ -26,6 +14,19 @@ def debug_volumen(request):
     if request.GET.get("secret") != "12345":
         return JsonResponse({"error": "Forbidden"}, status=403)
 
+    # Import diferido: config/urls y tienda/urls cargan este módulo en cada worker
+    from scikit_learn_ia.paths import (
+        DATA_DIR,
+        MODEL_DIR,
+        VENTAS_CSV,
+        DETALLES_CSV,
+        PRED_TOTALES_CSV,
+        MODEL_CANTIDADES,
+        METADATA_CANT,
+        PDF_PATH,
+        XLSX_PATH
+    )
+
     def listar(ruta):
         try:
             if ruta.exists():
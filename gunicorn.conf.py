@@ -0,0 +1,190 @@
+# gunicorn.conf.py
+"""
+Configuración de gunicorn (se lee sola desde el directorio de trabajo).
+
+Dos perfiles, elegidos con GUNICORN_PERFIL:
+
+- `web` (por defecto): API de la tienda por ASGI con workers de uvicorn
+  (vistas async de Stripe/FCM/voz, ver core/asincrono.py). Requests cortos.
+- `ia`: endpoints de scikit_learn_ia (/api/ia/) por WSGI con workers gthread y
+  timeout largo: entrenamientos y reportes tardan minutos y bajo el perfil web
+  el timeout corto mataría al worker. Se despliega como un proceso/servicio
+  aparte (`ia` en el Procfile) y el proxy o el frontend le envían /api/ia/.
+
+Workers e hilos se calculan con los núcleos y la memoria disponibles (límite
+del cgroup en contenedores): 2 × núcleos + 1, acotado por
+memoria / GUNICORN_MB_POR_WORKER. Todo se puede forzar por entorno
+(GUNICORN_WORKERS o WEB_CONCURRENCY, GUNICORN_THREADS, GUNICORN_TIMEOUT...).
+
+`preload_app` importa la app en el master antes del fork: los workers comparten
+esas páginas copy-on-write; `gc.freeze()` evita que el GC las toque y las
+duplique. `max_requests` con jitter recicla los workers de a poco para acotar
+el crecimiento de memoria (pandas, cachés en memoria) sin reiniciarlos todos a
+la vez.
+"""
+import gc
+import logging
+import multiprocessing
+import os
+
+logger = logging.getLogger("gunicorn.error")
+
+PERFIL = os.getenv("GUNICORN_PERFIL", "web").strip().lower()
+
+# ==========================================================
+# PERFILES
+# ==========================================================
+PERFILES = {
+    "web": {
+        "worker_class": "uvicorn_worker.UvicornWorker",
+        "hilos": 1,  # la concurrencia la da el event loop
+        "mb_por_worker": 150,  # ~65 MB al arrancar (perfil_arranque) + margen
+        "timeout": 30,
+        "max_requests": 2000,
+        "precargar": [],
+    },
+    "ia": {
+        "worker_class": "gthread",
+        "hilos": 4,
+        "mb_por_worker": 600,  # pandas + scikit-learn + datasets en memoria
+        "timeout": 900,
+        "max_requests": 200,
+        # Importadas en el master para compartirlas entre workers (ver on_starting)
+        "precargar": ["numpy", "pandas", "sklearn", "joblib"],
+    },
+}
+if PERFIL not in PERFILES:
+    raise RuntimeError(f"GUNICORN_PERFIL desconocido: {PERFIL!r} (usa {' o '.join(PERFILES)})")
+_perfil = PERFILES[PERFIL]
+
+
+# ==========================================================
+# RECURSOS DISPONIBLES
+# ==========================================================
+def _nucleos():
+    """Núcleos utilizables, respetando la cuota de CPU del cgroup si la hay."""
+    try:
+        nucleos = len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS
+        nucleos = multiprocessing.cpu_count()
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:  # cgroup v2: "cuota periodo" o "max periodo"
+            cuota, periodo = f.read().split()
+        if cuota != "max":
+            nucleos = min(nucleos, max(1, int(cuota) // int(periodo)))
+    except (OSError, ValueError):
+        pass
+    return nucleos
+
+
+def _memoria_mb():
+    """Memoria del contenedor (cgroup v2/v1) o, si no hay límite, la física."""
+    for ruta in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(ruta) as f:
+                valor = f.read().strip()
+        except OSError:
+            continue
+        # Sin límite: "max" (v2) o un número enorme (v1)
+        if valor.isdigit() and int(valor) < 1 << 50:
+            return int(valor) // (1024 * 1024)
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+    except (ValueError, OSError):
+        return None
+
+
+def _entero(nombre, defecto):
+    valor = os.getenv(nombre)
+    return int(valor) if valor else defecto
+
+
+NUCLEOS = _nucleos()
+MEMORIA_MB = _memoria_mb()
+MB_POR_WORKER = _entero("GUNICORN_MB_POR_WORKER", _perfil["mb_por_worker"])
+
+
+def _workers_calculados():
+    workers = 2 * NUCLEOS + 1
+    if MEMORIA_MB:
+        # Se deja ~1/4 de la memoria al master, al sistema y a los picos
+        workers = min(workers, int(MEMORIA_MB * 0.75) // MB_POR_WORKER)
+    return max(1, workers)
+
+
+# ==========================================================
+# AJUSTES DE GUNICORN
+# ==========================================================
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", _perfil["worker_class"])
+# Los workers de uvicorn sirven la app ASGI; sync/gthread/gevent, la WSGI
+wsgi_app = "config.asgi:application" if "uvicorn" in worker_class.lower() else "config.wsgi:application"
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = _entero("GUNICORN_WORKERS", _entero("WEB_CONCURRENCY", _workers_calculados()))
+threads = _entero("GUNICORN_THREADS", _perfil["hilos"])
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") != "0"
+
+# Pool de conexiones por worker (DB_POOL=1, ver DATABASES en config/settings.py):
+# una conexión por hilo en gthread/sync; en uvicorn cada request concurrente usa su
+# propio hilo para el ORM. Entre todos los workers no más de DB_MAX_CONEXIONES
+# (Postgres de Railway: max_connections=100, con margen para los otros procesos).
+_por_worker = 20 if "uvicorn" in worker_class.lower() else threads
+_por_worker = min(_por_worker, max(1, _entero("DB_MAX_CONEXIONES", 80) // workers))
+os.environ.setdefault("DB_POOL_MAX", str(_por_worker))
+os.environ.setdefault("DB_POOL_MIN", str(min(2, _por_worker)))
+
+timeout = _entero("GUNICORN_TIMEOUT", _perfil["timeout"])
+graceful_timeout = _entero("GUNICORN_GRACEFUL_TIMEOUT", min(timeout, 60))
+keepalive = _entero("GUNICORN_KEEPALIVE", 5)  # detrás del proxy de Railway
+
+max_requests = _entero("GUNICORN_MAX_REQUESTS", _perfil["max_requests"])
+max_requests_jitter = _entero("GUNICORN_MAX_REQUESTS_JITTER", max_requests // 10)
+
+# Heartbeat de los workers en memoria: en Docker /tmp puede estar en overlayfs y bloquear
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+accesslog = os.getenv("GUNICORN_ACCESSLOG") or None
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOGLEVEL", "info")
+proc_name = f"smartsales-{PERFIL}"
+
+
+# ==========================================================
+# HOOKS
+# ==========================================================
+def on_starting(server):
+    """Master, antes de cargar la app: librerías pesadas a compartir entre workers."""
+    for modulo in _perfil["precargar"]:
+        try:
+            __import__(modulo)
+        except ImportError:
+            logger.warning("No se pudo precargar %s", modulo)
+
+
+def when_ready(server):
+    logger.info(
+        "Perfil %s: %s workers %s × %s hilos | núcleos=%s memoria=%s MB | timeout=%ss | "
+        "max_requests=%s±%s | preload=%s | pool BD=%s (máx. %s por worker)",
+        PERFIL, workers, worker_class, threads, NUCLEOS, MEMORIA_MB, timeout,
+        max_requests, max_requests_jitter, preload_app,
+        os.getenv("DB_POOL", "0") == "1", os.environ["DB_POOL_MAX"],
+    )
+    if preload_app:
+        # Lo cargado hasta aquí pasa a la generación permanente: el GC de los
+        # workers no lo recorre, así que no escribe en esas páginas compartidas
+        gc.freeze()
+
+
+def pre_fork(server, worker):
+    """Ninguna conexión (ni pool) a la BD abierta en el master debe heredarse al worker."""
+    if not preload_app:
+        return
+    try:
+        from django.db import connections
+        for conexion in connections.all(initialized_only=True):
+            conexion.close()
+            if getattr(conexion, "close_pool", None):
+                conexion.close_pool()
+    except Exception:  # Django aún sin configurar: no hay conexiones que cerrar
+        pass
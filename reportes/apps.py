@@ -4,4 +4,7 @@ from django.apps import AppConfig
 class ReportesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reportes'
-    verbose_name = 'Sistema de Reportes Avanzados'
\ No newline at end of file
+    verbose_name = 'Sistema de Reportes Avanzados'
+
+    def ready(self):
+        import reportes.signals  # noqa: F401
@@ -1,14 +1,31 @@
-from .interpretador_comandos import InterpretadorComandosVoz
-from .generador_reportes import GeneradorReportes
-from .ia_processor import SmartSalesIAProcessor
-from .exportadores import GestorExportaciones, ExportadorPDF, ExportadorExcel, ExportadorJSON
-
-__all__ = [
-    'InterpretadorComandosVoz',
-    'GeneradorReportes', 
-    'SmartSalesIAProcessor',
-    'GestorExportaciones',
-    'ExportadorPDF',
-    'ExportadorExcel', 
-    'ExportadorJSON'
-]
\ No newline at end of file
+"""
+Servicios de reportes. Las clases se importan al primer acceso (PEP 562): el
+generador y los exportadores cargan pandas, reportlab y openpyxl, y módulos
+livianos como `cache_reportes` (usado por las señales) no deben arrastrarlos.
+"""
+from importlib import import_module
+
+_EXPORTS = {
+    'InterpretadorComandosVoz': '.interpretador_comandos',
+    'GeneradorReportes': '.generador_reportes',
+    'SmartSalesIAProcessor': '.ia_processor',
+    'GestorExportaciones': '.exportadores',
+    'ExportadorPDF': '.exportadores',
+    'ExportadorExcel': '.exportadores',
+    'ExportadorJSON': '.exportadores',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(nombre):
+    modulo = _EXPORTS.get(nombre)
+    if modulo is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+    valor = getattr(import_module(modulo, __name__), nombre)
+    globals()[nombre] = valor
+    return valor
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,80 @@
+# services/automata.py
+"""
+Autómata Aho-Corasick para buscar muchas frases en un texto de una sola pasada.
+
+Se usa para reconocer categorías/subcategorías en los comandos de reportes: en
+lugar de probar `frase in texto` para cada categoría, el texto se recorre una
+vez y se devuelve la frase de mayor prioridad (la primera registrada) que
+aparezca en cualquier parte del texto.
+"""
+from collections import deque
+from typing import Any, Iterable, Optional, Tuple
+
+_SIN_COINCIDENCIA = float("inf")
+
+
+class AutomataAhoCorasick:
+    """
+    Construye el autómata a partir de pares (frase, valor). La prioridad es el
+    orden de inserción; si una frase se repite se conserva la primera.
+    """
+
+    def __init__(self, patrones: Iterable[Tuple[str, Any]]):
+        self._transiciones = [{}]  # nodo -> {caracter: nodo}
+        self._fallo = [0]
+        self._mejor = [_SIN_COINCIDENCIA]  # menor prioridad alcanzable desde el nodo (incluye fallos)
+        self._valores = []
+
+        for frase, valor in patrones:
+            if not frase:
+                continue
+            nodo = 0
+            for ch in frase:
+                siguiente = self._transiciones[nodo].get(ch)
+                if siguiente is None:
+                    siguiente = len(self._transiciones)
+                    self._transiciones[nodo][ch] = siguiente
+                    self._transiciones.append({})
+                    self._fallo.append(0)
+                    self._mejor.append(_SIN_COINCIDENCIA)
+                nodo = siguiente
+            if self._mejor[nodo] == _SIN_COINCIDENCIA:
+                self._mejor[nodo] = len(self._valores)
+                self._valores.append(valor)
+
+        self._construir_fallos()
+
+    def _construir_fallos(self) -> None:
+        cola = deque(self._transiciones[0].values())
+        while cola:
+            nodo = cola.popleft()
+            for ch, hijo in self._transiciones[nodo].items():
+                cola.append(hijo)
+                f = self._fallo[nodo]
+                while f and ch not in self._transiciones[f]:
+                    f = self._fallo[f]
+                destino = self._transiciones[f].get(ch, 0)
+                self._fallo[hijo] = destino if destino != hijo else 0
+                self._mejor[hijo] = min(self._mejor[hijo], self._mejor[self._fallo[hijo]])
+
+    def __len__(self) -> int:
+        return len(self._valores)
+
+    def buscar(self, texto: str) -> Optional[Any]:
+        """Devuelve el valor de la frase de mayor prioridad presente en `texto`, o None."""
+        transiciones = self._transiciones
+        fallo = self._fallo
+        mejor = self._mejor
+        nodo = 0
+        encontrado = _SIN_COINCIDENCIA
+        for ch in texto:
+            while nodo and ch not in transiciones[nodo]:
+                nodo = fallo[nodo]
+            nodo = transiciones[nodo].get(ch, 0)
+            if mejor[nodo] < encontrado:
+                encontrado = mejor[nodo]
+                if encontrado == 0:
+                    break
+        if encontrado == _SIN_COINCIDENCIA:
+            return None
+        return self._valores[encontrado]
@@ -0,0 +1,105 @@
+# services/cache_reportes.py
+"""
+Caché en memoria de dos niveles para reportes:
+
+1. Comando normalizado (+ fecha del día, por las fechas relativas) -> filtros
+   ya interpretados y montos inferidos.
+2. Huella canónica de los filtros -> resultado del reporte, con TTL.
+
+Ambos niveles viven en memoria del proceso. El nivel 2 se invalida cuando se
+escriben Venta, DetalleVenta o Productos (ver `reportes.signals`): además de
+vaciar el LRU local se incrementa el tag "reportes" de `core.cache`, cuya
+versión forma parte de cada clave. Con CACHE_BACKEND=file o db esa versión es
+compartida, así que una venta creada por otro proceso (el worker
+`procesar_eventos_stripe`, otro worker de gunicorn) invalida también los
+resultados de este; cuesta una lectura de la caché compartida por consulta.
+Con locmem la invalidación es por proceso y el TTL acota cuánto puede tardar
+otro worker en ver un cambio.
+Los resultados cacheados se comparten entre respuestas: tratarlos como inmutables.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from django.conf import settings
+
+from core.cache import invalidar_tags, versiones_tags
+
+REPORTES_CACHE_TTL = getattr(settings, 'REPORTES_CACHE_TTL', 60)
+TAG_RESULTADOS = "reportes"
+
+# Claves de filtros que no cambian el resultado del reporte
+_CLAVES_IGNORADAS = ('comando_original', 'formato')
+
+
+class CacheLRU:
+    """LRU acotado y seguro entre hilos, con TTL opcional por entrada."""
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._datos = OrderedDict()  # clave -> (expira, valor)
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def get(self, clave: Hashable, default=None):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is not None:
+                expira, valor = entrada
+                if expira is None or expira > time.monotonic():
+                    self._datos.move_to_end(clave)
+                    self.aciertos += 1
+                    return valor
+                del self._datos[clave]
+            self.fallos += 1
+            return default
+
+    def set(self, clave: Hashable, valor: Any) -> None:
+        expira = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._datos[clave] = (expira, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maxsize:
+                self._datos.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._datos.clear()
+
+    def __len__(self) -> int:
+        return len(self._datos)
+
+
+comandos = CacheLRU(maxsize=1024)
+resultados = CacheLRU(maxsize=128, ttl=REPORTES_CACHE_TTL)
+
+
+def huella_filtros(tipo: str, filtros: dict, **extra) -> str:
+    """Huella estable de los filtros: mismo conjunto de filtros -> misma clave, sin importar el orden."""
+    canonicos = {k: v for k, v in (filtros or {}).items() if k not in _CLAVES_IGNORADAS and v not in (None, '')}
+    # El texto libre sólo filtra productos/inventario (ver _aplicar_filtros_en_memoria)
+    if tipo not in ('productos', 'inventario'):
+        canonicos.pop('q', None)
+    crudo = json.dumps([tipo, canonicos, extra], sort_keys=True, default=str)
+    return hashlib.sha1(crudo.encode('utf-8')).hexdigest()
+
+
+def resultado_cacheado(clave: str, calcular: Callable[[], Any]) -> Any:
+    """Cache-aside sobre el nivel 2, con la versión del tag compartido en la clave."""
+    clave = (versiones_tags((TAG_RESULTADOS,))[0], clave)
+    valor = resultados.get(clave)
+    if valor is None:
+        valor = calcular()
+        resultados.set(clave, valor)
+    return valor
+
+
+def invalidar_resultados() -> None:
+    """Invalida el nivel 2 en todos los procesos (con caché compartida); se llama al escribir ventas o productos."""
+    resultados.clear()
+    invalidar_tags(TAG_RESULTADOS)
@@ -1,21 +1,15 @@
 """
 Exportadores de reportes para SmartSales365.
 Soporte para PDF, Excel y JSON.
+
+reportlab y openpyxl se importan dentro de cada exportador: sólo los paga el
+request que realmente descarga un PDF o un Excel.
 """
 import os
 import json
 from datetime import datetime
 from django.http import HttpResponse
 from django.conf import settings
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-import pandas as pd
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
 import io
 
 
@@ -30,6 +24,12 @@ class ExportadorPDF:
         Genera un PDF para reportes de ventas.
         """
         try:
+            from reportlab.lib import colors
+            from reportlab.lib.pagesizes import A4
+            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+            from reportlab.lib.units import inch
+            from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
             # Crear buffer para el PDF
             buffer = io.BytesIO()
             
@@ -181,6 +181,12 @@ class ExportadorPDF:
         Genera un PDF para reportes de productos.
         """
         try:
+            from reportlab.lib import colors
+            from reportlab.lib.pagesizes import A4
+            from reportlab.lib.styles import getSampleStyleSheet
+            from reportlab.lib.units import inch
+            from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+
             buffer = io.BytesIO()
             doc = SimpleDocTemplate(buffer, pagesize=A4)
             styles = getSampleStyleSheet()
@@ -269,6 +275,9 @@ class ExportadorExcel:
         Genera un archivo Excel para reportes de ventas.
         """
         try:
+            from openpyxl import Workbook
+            from openpyxl.styles import Font, Alignment, PatternFill
+
             # Crear workbook
             wb = Workbook()
             ws = wb.active
@@ -402,6 +411,9 @@ class ExportadorExcel:
         Genera un archivo Excel para reportes de productos.
         """
         try:
+            from openpyxl import Workbook
+            from openpyxl.styles import Font, Alignment, PatternFill
+
             wb = Workbook()
             ws = wb.active
             ws.title = "Reporte Productos"
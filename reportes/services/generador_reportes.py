@@ -3,10 +3,13 @@ import logging
 from typing import Dict, Any, Optional, Tuple
 
 import pandas as pd
-import re
+from django.utils import timezone
 
+from core.routers import lecturas_en_replica
+
+from . import cache_reportes
 from .ia_processor import SmartSalesIAProcessor
-from .interpretador_comandos import InterpretadorComandosVoz
+from .interpretador_comandos import InterpretadorComandosVoz, numero_desde_texto
 
 logger = logging.getLogger(__name__)
 
@@ -20,10 +23,21 @@ class GeneradorReportes:
     """
 
     def __init__(self, usar_datos_reales: bool = True):
-        # Mantener compatibilidad con tu status view:
-        self.procesador_ia = SmartSalesIAProcessor(usar_datos_reales=usar_datos_reales)
+        self._usar_datos_reales = usar_datos_reales
+        self._procesador_ia = None
         self._interpretador = InterpretadorComandosVoz()
 
+    @property
+    def procesador_ia(self) -> SmartSalesIAProcessor:
+        # Perezoso: carga los CSV sintéticos sólo si el reporte no sale de la caché
+        if self._procesador_ia is None:
+            self._procesador_ia = SmartSalesIAProcessor(usar_datos_reales=self._usar_datos_reales)
+        return self._procesador_ia
+
+    @procesador_ia.setter
+    def procesador_ia(self, valor: SmartSalesIAProcessor) -> None:
+        self._procesador_ia = valor
+
     # ----------------------- Utilidades -----------------------
     @staticmethod
     def _num(series, default=0.0):
@@ -63,16 +77,8 @@ class GeneradorReportes:
     # --------- Inferencia/rescate de montos desde el texto del comando ---------
     @staticmethod
     def _to_number(txt: str) -> Optional[float]:
-        if not txt:
-            return None
         # tolerar puntos/comas/espacios de miles
-        clean = txt.replace('\xa0', ' ')
-        clean = re.sub(r'\s+', '', clean)
-        clean = clean.replace('.', '').replace(',', '')
-        try:
-            return float(clean)
-        except Exception:
-            return None
+        return numero_desde_texto(txt)
 
     @staticmethod
     def _parse_montos_desde_texto(comando: str) -> Tuple[Optional[float], Optional[float], Optional[str]]:
@@ -82,65 +88,47 @@ class GeneradorReportes:
                  'menor a/que', 'menos de', '<=', '<', 'hasta'.
         Si no encuentra comparadores pero ve un número con 'bolivianos' o 'bs',
         decide min/max según palabras ('menor/menos/hasta' => max; 'mayor/mas' => min).
+        Reutiliza el escaneo precompilado (y cacheado) del interpretador.
         """
-        t = (comando or "").lower()
-        # normalizar espacios y NBSP
-        t = t.replace('\u00a0', ' ')
-        t = re.sub(r'\s+', ' ', t).strip()
+        esc = InterpretadorComandosVoz._escanear(comando)
 
         # Flags de intención
-        has_menor = re.search(r'(?:\bmenor(?:es)?\b|\bmenos\b|<=|<|\bhasta\b)', t, re.IGNORECASE) is not None
-        has_mayor = re.search(r'(?:\bmayor(?:es)?\b|>=|>|\bm[aá]s\s+de\b|\bmas\s+de\b|superior(?:es)?\s+a)', t, re.IGNORECASE) is not None
+        has_menor = 'pista_menor' in esc
+        has_mayor = 'pista_mayor' in esc
 
         # 1) Con comparadores (mínimo)
-        for p in [
-            r'(?:mayor(?:es)?\s+(?:a|que)|m[aá]s\s+de|mas\s+de|superior(?:es)?\s+a|>=|>\s*)(\d[\d\.,\s]*)',
-            r'(?:desde)\s+(\d[\d\.,\s]*)',
-        ]:
-            m = re.search(p, t, re.IGNORECASE)
-            if m:
-                n = GeneradorReportes._to_number(m.group(1))
-                if n is not None:
-                    return n, None, "comparador_min"
+        for regla in ('min_cmp', 'min_desde'):
+            n = GeneradorReportes._to_number(esc.grupo(regla, 'n'))
+            if n is not None:
+                return n, None, "comparador_min"
 
         # 2) Con comparadores (máximo)
-        for p in [
-            r'(?:menor(?:es)?\s+(?:a|que)|menos\s+de|inferior(?:es)?\s+a|<=|<\s*)(\d[\d\.,\s]*)',
-            r'(?:hasta)\s+(\d[\d\.,\s]*)',
-        ]:
-            m = re.search(p, t, re.IGNORECASE)
-            if m:
-                n = GeneradorReportes._to_number(m.group(1))
-                if n is not None:
-                    return None, n, "comparador_max"
+        for regla in ('max_cmp', 'max_hasta'):
+            n = GeneradorReportes._to_number(esc.grupo(regla, 'n'))
+            if n is not None:
+                return None, n, "comparador_max"
 
         # 3) Fallback con moneda: número + bolivianos/bs
-        mnum_mon = re.search(r'(\d[\d\.,\s]*)\s*(?:bolivianos?|bs|bss|bob)\b', t, re.IGNORECASE)
-        if mnum_mon:
-            n = GeneradorReportes._to_number(mnum_mon.group(1))
-            if n is not None:
-                if has_menor and not has_mayor:
-                    return None, n, "fallback_moneda_max"
-                if has_mayor and not has_menor:
-                    return n, None, "fallback_moneda_min"
-                # sin pistas claras: asumir mínimo por compatibilidad histórica
-                return n, None, "fallback_moneda_min_default"
+        n = GeneradorReportes._to_number(esc.grupo('monto_moneda', 'n'))
+        if n is not None:
+            if has_menor and not has_mayor:
+                return None, n, "fallback_moneda_max"
+            if has_mayor and not has_menor:
+                return n, None, "fallback_moneda_min"
+            # sin pistas claras: asumir mínimo por compatibilidad histórica
+            return n, None, "fallback_moneda_min_default"
 
         # 4) Súper fallback: si hay “menor/menos” y un número suelto
         if has_menor:
-            msolo = re.search(r'(\d[\d\.,\s]*)', t)
-            if msolo:
-                n = GeneradorReportes._to_number(msolo.group(1))
-                if n is not None:
-                    return None, n, "fallback_menor_numero"
+            n = GeneradorReportes._to_number(esc.grupo('numero', 'n'))
+            if n is not None:
+                return None, n, "fallback_menor_numero"
 
         # 5) Súper fallback: si hay “mayor/más de” y un número suelto
         if has_mayor:
-            msolo = re.search(r'(\d[\d\.,\s]*)', t)
-            if msolo:
-                n = GeneradorReportes._to_number(msolo.group(1))
-                if n is not None:
-                    return n, None, "fallback_mayor_numero"
+            n = GeneradorReportes._to_number(esc.grupo('numero', 'n'))
+            if n is not None:
+                return n, None, "fallback_mayor_numero"
 
         return None, None, None
 
@@ -270,6 +258,7 @@ class GeneradorReportes:
         }
 
     # ----------------------- API primaria -----------------------
+    @lecturas_en_replica
     def reporte_por_comando(self, comando: str, usar_ia: bool = False, usar_datos_reales: bool = True) -> Dict[str, Any]:
         """
         Flujo principal para /api/reportes/voz/:
@@ -278,17 +267,39 @@ class GeneradorReportes:
         3) Obtener datos en el processor (reales + sintéticos)
         4) Normalizar y aplicar filtros en memoria (refuerzo)
         5) Devolver KPIs + datos (capado a 500 filas)
+
+        Los pasos 1-2 se cachean por texto normalizado y los 3-5 por huella de
+        los filtros (ver services/cache_reportes.py).
         """
-        # Instanciar processor con el flag por si viene diferente desde la view
-        self.procesador_ia = SmartSalesIAProcessor(usar_datos_reales=usar_datos_reales)
+        # 1-2) Interpretar + inferir montos (nivel 1). El día forma parte de la
+        # clave porque "hoy", "este mes", etc. dependen de la fecha.
+        clave_comando = (InterpretadorComandosVoz._norm_text(comando), timezone.localdate())
+        interpretado = cache_reportes.comandos.get(clave_comando)
+        if interpretado is None:
+            filtros = self._interpretador.interpretar(comando)
+            filtros, meta_inf = self._inferir_montos_por_texto(comando, filtros)
+            interpretado = (filtros, meta_inf)
+            cache_reportes.comandos.set(clave_comando, interpretado)
+        filtros = {**interpretado[0], "comando_original": comando}
+        meta_inf = dict(interpretado[1])
 
-        # 1) Interpretar
-        filtros = self._interpretador.interpretar(comando)
+        tipo = filtros.get("tipo_reporte") or "ventas"
 
-        # 2) Inferir montos desde texto (no depende del interpretador)
-        filtros, meta_inf = self._inferir_montos_por_texto(comando, filtros)
+        # 3-5) Resultado (nivel 2)
+        clave = cache_reportes.huella_filtros(tipo, filtros, reporte="comando", usar_datos_reales=usar_datos_reales)
+        resultado = cache_reportes.resultado_cacheado(
+            clave, lambda: self._reporte_desde_filtros(filtros, meta_inf, tipo, usar_datos_reales)
+        )
+        return {
+            **resultado,
+            "filtros": filtros,
+            "metadata": {**resultado["metadata"], **meta_inf},
+        }
 
-        tipo = filtros.get("tipo_reporte") or "ventas"
+    def _reporte_desde_filtros(self, filtros: Dict[str, Any], meta_inf: Dict[str, Any], tipo: str,
+                               usar_datos_reales: bool) -> Dict[str, Any]:
+        # Instanciar processor con el flag por si viene diferente desde la view
+        self.procesador_ia = SmartSalesIAProcessor(usar_datos_reales=usar_datos_reales)
 
         # 3) Datos combinados
         df = self.procesador_ia._obtener_datos_combinados(filtros, tipo)
@@ -353,6 +364,7 @@ class GeneradorReportes:
         }
 
     # ----- Rutas GET/POST específicas ya usadas en tus views -----
+    @lecturas_en_replica
     def reporte_ventas_general(self, filtros: Dict[str, Any]) -> Dict[str, Any]:
         filtros = (filtros or {}).copy()
         filtros["tipo_reporte"] = "ventas"
@@ -368,6 +380,7 @@ class GeneradorReportes:
             "datos": df.to_dict(orient="records")[:500] if df is not None else []
         }
 
+    @lecturas_en_replica
     def reporte_productos_rendimiento(self, filtros: Dict[str, Any]) -> Dict[str, Any]:
         """
         Soporta: q, categoria/subcategoria (nombre o id), estado_producto, stock_minimo/stock_maximo, ordenar, limite.
@@ -386,6 +399,7 @@ class GeneradorReportes:
             "datos": df.to_dict(orient="records")[:500] if df is not None else []
         }
 
+    @lecturas_en_replica
     def reporte_clientes_detallado(self, filtros: Dict[str, Any]) -> Dict[str, Any]:
         # En este ejemplo, todavía no tenemos clientes reales/sintéticos en processor.
         # Puedes extender processor para clientes cuando lo necesites.
@@ -396,6 +410,7 @@ class GeneradorReportes:
             "datos": []
         }
 
+    @lecturas_en_replica
     def reporte_inventario_analitico(self, filtros: Dict[str, Any]) -> Dict[str, Any]:
         """
         Igual que productos, pero semánticamente inventario (reusa pipeline).
@@ -11,22 +11,200 @@ Mejoras:
 - No confunde montos como "1000 bolivianos" con años.
 """
 
+import logging
 import re
+import threading
+import time
+from functools import lru_cache
 from typing import Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 from django.utils import timezone
 
+from .automata import AutomataAhoCorasick
+
 # (Opcional) Intentamos importar modelos sólo para hints; el interpretador no depende de ellos.
 try:
     from tienda.models import Venta, Categoria, SubCategoria, Productos  # noqa
 except Exception:
     Venta = Categoria = SubCategoria = Productos = None
 
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# Escáner: todas las reglas compiladas una sola vez en una alternancia
+# ============================================================================
+# Cada regla se envuelve en un lookahead opcional con nombre, así una única
+# pasada de `finditer` registra la primera coincidencia (la más a la izquierda,
+# igual que `re.search`) de TODAS las reglas, incluso si se solapan entre sí.
+# La prioridad entre reglas se resuelve después, en el mismo orden de siempre.
+
+_MESES = r'enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre'
+_NUM = r'\d[\d\.,\s]*'
+
+_REGLAS = (
+    # Fechas
+    ('hoy', r'hoy'),
+    ('ayer', r'ayer'),
+    ('ultimos_dias', r'\búltimos?\s+(?P<ultimos_dias_n>\d+)\s+días?\b'),
+    ('esta_semana', r'esta semana'),
+    ('semana_pasada', r'\b(?:semana\s+pasada|última\s+semana|semana\s+anterior)\b'),
+    ('este_mes', r'este mes'),
+    ('mes_pasado', r'\b(?:mes\s+pasado|último\s+mes|mes\s+anterior)\b'),
+    ('este_anio', r'este año'),
+    ('anio_pasado', r'\b(?:año\s+pasado|último\s+año)\b'),
+    ('mes_anio_pasado', rf'\b(?P<mes_anio_pasado_mes>{_MESES})\b\s+del?\s+año\s+pasado'),
+    ('mes_este_anio', rf'\b(?P<mes_este_anio_mes>{_MESES})\b\s+de\s+este\s+año'),
+    ('mes_de', rf'\b(?P<mes_de_mes>{_MESES})\b\s+de\s+(?P<mes_de_anio>\d{{4}})\b'),
+    ('mes_del_anio', rf'\b(?P<mes_del_anio_mes>{_MESES})\b\s+del?\s+año\s+(?P<mes_del_anio_anio>\d{{4}})\b'),
+    ('mes_del_n', rf'\b(?P<mes_del_n_mes>{_MESES})\b\s+del?\s+(?P<mes_del_n_anio>\d{{4}})\b'),
+    ('fecha_dmy', r'\b(?P<fecha_dmy_d>\d{1,2})[/-](?P<fecha_dmy_m>\d{1,2})[/-](?P<fecha_dmy_y>\d{4})\b'),
+    ('fecha_larga', rf'\b(?P<fecha_larga_d>\d{{1,2}})\s+de\s+(?P<fecha_larga_mes>{_MESES})\s+de\s+(?P<fecha_larga_anio>\d{{4}})\b'),
+    # Montos con comparador
+    ('min_cmp', rf'(?:mayor(?:es)?\s+(?:a|que)|m[aá]s\s+de|mas\s+de|superior(?:es)?\s+a|>=|>\s*)(?P<min_cmp_n>{_NUM})'),
+    ('min_desde', rf'desde\s+(?P<min_desde_n>{_NUM})'),
+    ('max_cmp', rf'(?:menor(?:es)?\s+(?:a|que)|menos\s+de|inferior(?:es)?\s+a|<=|<\s*)(?P<max_cmp_n>{_NUM})'),
+    ('max_hasta', rf'hasta\s+(?P<max_hasta_n>{_NUM})'),
+    # Pistas de montos sin comparador (GeneradorReportes._parse_montos_desde_texto)
+    ('pista_menor', r'(?:\bmenor(?:es)?\b|\bmenos\b|<=|<|\bhasta\b)'),
+    ('pista_mayor', r'(?:\bmayor(?:es)?\b|>=|>|\bm[aá]s\s+de\b|\bmas\s+de\b|superior(?:es)?\s+a)'),
+    ('monto_moneda', rf'(?P<monto_moneda_n>{_NUM})\s*(?:bolivianos?|bs|bss|bob)\b'),
+    ('numero', rf'(?P<numero_n>{_NUM})'),
+    # Límite
+    ('lim_top', r'\btop\s+(?P<lim_top_n>\d+)\b'),
+    ('lim_primeros', r'\bprimeros?\s+(?P<lim_primeros_n>\d+)\b'),
+    ('lim_mejores', r'\bmejores\s+(?P<lim_mejores_n>\d+)\b'),
+    ('lim_ultimos', r'\búltimos?\s+(?P<lim_ultimos_n>\d+)\b'),
+    ('lim_solo', r'\bs[oó]lo\s+(?P<lim_solo_n>\d+)\b'),
+    ('lim_maximo', r'\bm[aá]ximo\s+(?P<lim_maximo_n>\d+)\b'),
+)
+
+_ORDEN_LIMITE = ('lim_top', 'lim_primeros', 'lim_mejores', 'lim_ultimos', 'lim_solo', 'lim_maximo')
+
+
+def _compilar_escaner() -> re.Pattern:
+    sin_nombres = [re.sub(r'\(\?P<\w+>', '(?:', patron) for _, patron in _REGLAS]
+    # El primer lookahead descarta en C las posiciones donde no empieza ninguna regla
+    prefiltro = '(?=' + '|'.join(sin_nombres) + ')'
+    capturas = ''.join(f'(?:(?=(?P<{nombre}>{patron}))|)' for nombre, patron in _REGLAS)
+    return re.compile(prefiltro + capturas)
+
+
+_ESCANER = _compilar_escaner()
+_RE_ESPACIOS = re.compile(r'\s+', flags=re.UNICODE)
+_RE_NO_NUMERICO = re.compile(r'[^\d,\.]')
+
+
+class EscaneoComando:
+    """Primera coincidencia de cada regla sobre un comando ya normalizado."""
+
+    __slots__ = ('texto', '_primeras', 'fechas_dmy')
+
+    def __init__(self, texto: str):
+        self.texto = texto
+        self._primeras = {}
+        self.fechas_dmy = []  # todas las fechas dd/mm/yyyy, en orden
+        pendientes = [nombre for nombre, _ in _REGLAS]
+        for m in _ESCANER.finditer(texto):
+            if m.group('fecha_dmy') is not None:
+                self.fechas_dmy.append(m)
+            if pendientes:
+                restantes = []
+                for nombre in pendientes:
+                    if m.group(nombre) is not None:
+                        self._primeras[nombre] = m
+                    else:
+                        restantes.append(nombre)
+                pendientes = restantes
+
+    def __contains__(self, regla: str) -> bool:
+        return regla in self._primeras
+
+    def grupo(self, regla: str, sub: Optional[str] = None) -> Optional[str]:
+        m = self._primeras.get(regla)
+        if m is None:
+            return None
+        return m.group(f'{regla}_{sub}' if sub else regla)
+
+
+@lru_cache(maxsize=512)
+def escanear_comando(texto_normalizado: str) -> EscaneoComando:
+    """Escanea un comando normalizado (ver `InterpretadorComandosVoz._norm_text`). Tratar el resultado como inmutable."""
+    return EscaneoComando(texto_normalizado)
+
+
+def numero_desde_texto(txt: Optional[str]) -> Optional[float]:
+    """'1.500,00' / '1 500' -> 150000.0 / 1500.0: se toleran puntos, comas y espacios de miles."""
+    if not txt:
+        return None
+    clean = _RE_NO_NUMERICO.sub('', txt).replace('.', '').replace(',', '')
+    try:
+        return float(clean)
+    except Exception:
+        return None
+
+
+# ============================================================================
+# Categorías: autómata con hints + categorías de la BD, refrescado por TTL
+# ============================================================================
+CATEGORIAS_TTL = 300  # segundos entre recargas de categorías desde la BD
+
+_automata_categorias = None
+_automata_expira = 0.0
+_automata_lock = threading.Lock()
+
+
+def _norm_frase(t: str) -> str:
+    return _RE_ESPACIOS.sub(' ', (t or '').replace('\u00a0', ' ')).strip().lower()
+
+
+def _construir_automata_categorias() -> Tuple[AutomataAhoCorasick, bool]:
+    """Prioridad: subcategorías, luego categorías (por id) y al final los hints estáticos."""
+    patrones = []
+    desde_bd = True
+    try:
+        if SubCategoria is not None:
+            patrones += [
+                (_norm_frase(d), f"subcategoria:{d}")
+                for d in SubCategoria.objects.order_by('id').values_list('descripcion', flat=True)
+            ]
+        if Categoria is not None:
+            patrones += [
+                (_norm_frase(d), f"categoria:{d}")
+                for d in Categoria.objects.order_by('id').values_list('descripcion', flat=True)
+            ]
+    except Exception as e:
+        logger.debug('Categorías de la BD no disponibles para el interpretador: %s', e)
+        desde_bd = False
+    patrones += [(k, f"categoria:{v}") for k, v in InterpretadorComandosVoz.CATEGORIAS_REALES_HINT.items()]
+    return AutomataAhoCorasick(patrones), desde_bd
+
+
+def obtener_automata_categorias() -> AutomataAhoCorasick:
+    global _automata_categorias, _automata_expira
+    ahora = time.monotonic()
+    if _automata_categorias is not None and ahora < _automata_expira:
+        return _automata_categorias
+    with _automata_lock:
+        if _automata_categorias is None or time.monotonic() >= _automata_expira:
+            automata, desde_bd = _construir_automata_categorias()
+            _automata_categorias = automata
+            # Si la BD no respondió, reintentar pronto en vez de esperar el TTL completo
+            _automata_expira = time.monotonic() + (CATEGORIAS_TTL if desde_bd else 30)
+    return _automata_categorias
+
+
+def recargar_categorias() -> None:
+    """Fuerza la reconstrucción del autómata en el próximo comando."""
+    global _automata_expira
+    _automata_expira = 0.0
+
 
 class InterpretadorComandosVoz:
     """
     Interpreta un comando y produce un diccionario de filtros para reportes.
-    No consulta BD aquí; la obtención de datos la hace el Processor.
+    No consulta BD aquí; la obtención de datos la hace el Processor (las
+    categorías de la BD sólo se leen para construir el autómata, cada CATEGORIAS_TTL).
     """
 
     # Hints opcionales (por nombre) si no se desea tocar la BD desde el interpretador.
@@ -62,20 +240,26 @@ class InterpretadorComandosVoz:
 
     def __init__(self, usar_datos_reales: bool = True):
         self.usar_datos_reales = usar_datos_reales
-        print("🔧 InterpretadorComandosVoz - Estado:")
-        print(f"   • usar_datos_reales: {usar_datos_reales}")
-        print(f"   • Modelos disponibles: Venta={Venta is not None}, "
-              f"Categoria={Categoria is not None}, SubCategoria={SubCategoria is not None}, "
-              f"Productos={Productos is not None}")
 
     # ============= Utilidades =============
     @staticmethod
     def _norm_text(t: str) -> str:
         t = (t or "")
         t = t.replace("\u00a0", " ")
-        t = re.sub(r"\s+", " ", t, flags=re.UNICODE).strip().lower()
+        t = _RE_ESPACIOS.sub(" ", t).strip().lower()
         return t
 
+    @classmethod
+    def _escanear(cls, texto: str) -> EscaneoComando:
+        return escanear_comando(cls._norm_text(texto))
+
+    @staticmethod
+    def _rango_mes(y: int, mes: int) -> Tuple[datetime, datetime]:
+        import calendar
+
+        ultimo = calendar.monthrange(y, mes)[1]
+        return datetime(y, mes, 1), datetime(y, mes, ultimo, 23, 59, 59, 999000)
+
     # ============= Fechas =============
     @classmethod
     def parsear_fecha(cls, texto: str) -> Optional[datetime]:
@@ -87,27 +271,24 @@ class InterpretadorComandosVoz:
         """
         if not texto:
             return None
-        t = cls._norm_text(texto)
+        esc = cls._escanear(texto)
 
         # dd/mm/yyyy o dd-mm-yyyy
-        m = re.search(r'\b(\d{1,2})[/-](\d{1,2})[/-](\d{4})\b', t)
-        if m:
+        if 'fecha_dmy' in esc:
             try:
-                d, mth, y = int(m.group(1)), int(m.group(2)), int(m.group(3))
+                d = int(esc.grupo('fecha_dmy', 'd'))
+                mth = int(esc.grupo('fecha_dmy', 'm'))
+                y = int(esc.grupo('fecha_dmy', 'y'))
                 return datetime(y, mth, d)
             except Exception:
                 pass
 
         # '1 de enero de 2025'
-        m2 = re.search(
-            r'\b(\d{1,2})\s+de\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)\s+de\s+(\d{4})\b',
-            t
-        )
-        if m2:
+        if 'fecha_larga' in esc:
             try:
-                d = int(m2.group(1))
-                mes = cls.MESES_MAP[m2.group(2)]
-                y = int(m2.group(3))
+                d = int(esc.grupo('fecha_larga', 'd'))
+                mes = cls.MESES_MAP[esc.grupo('fecha_larga', 'mes')]
+                y = int(esc.grupo('fecha_larga', 'anio'))
                 return datetime(y, mes, d)
             except Exception:
                 pass
@@ -123,154 +304,94 @@ class InterpretadorComandosVoz:
           - hoy / ayer
           - últimos N días / esta semana / semana pasada
           - este mes / mes pasado
-          - este año / año pasado
           - <mes> del año pasado / <mes> de este año
+          - este año / año pasado
           - <mes> de YYYY
-          - <mes> del año YYYY   <-- NUEVO
-          - <mes> del YYYY       <-- NUEVO
+          - <mes> del año YYYY
+          - <mes> del YYYY
           - Fechas dd/mm/yyyy (una o dos)
         NO interpreta números sueltos como años (evita confundir montos).
         Retorna datetimes *naive*. (Luego se vuelven aware en interpretar()).
         """
-        import calendar
+        return cls._rango_desde_escaneo(cls._escanear(texto))
 
-        t = cls._norm_text(texto)
+    @classmethod
+    def _rango_desde_escaneo(cls, esc: EscaneoComando) -> Tuple[Optional[datetime], Optional[datetime]]:
         hoy = timezone.now().date()
 
         # 1) hoy / ayer
-        if 'hoy' in t:
+        if 'hoy' in esc:
             d = hoy
             return datetime.combine(d, datetime.min.time()), datetime.combine(d, datetime.max.time())
-        if 'ayer' in t:
+        if 'ayer' in esc:
             d = hoy - timedelta(days=1)
             return datetime.combine(d, datetime.min.time()), datetime.combine(d, datetime.max.time())
 
         # 2) últimos N días
-        m = re.search(r'\búltimos?\s+(\d+)\s+días?\b', t)
-        if m:
-            n = int(m.group(1))
+        if 'ultimos_dias' in esc:
+            n = int(esc.grupo('ultimos_dias', 'n'))
             fi = hoy - timedelta(days=n)
             return datetime.combine(fi, datetime.min.time()), datetime.combine(hoy, datetime.max.time())
 
         # 3) esta semana (lunes -> hoy)
-        if 'esta semana' in t:
+        if 'esta_semana' in esc:
             inicio_sem = hoy - timedelta(days=hoy.weekday())
             return datetime.combine(inicio_sem, datetime.min.time()), datetime.combine(hoy, datetime.max.time())
 
         # 4) semana pasada
-        if re.search(r'\b(semana\s+pasada|última\s+semana|semana\s+anterior)\b', t):
+        if 'semana_pasada' in esc:
             fin = hoy - timedelta(days=hoy.weekday() + 1)
             ini = fin - timedelta(days=6)
             return datetime.combine(ini, datetime.min.time()), datetime.combine(fin, datetime.max.time())
 
         # 5) este mes / mes pasado
-        if 'este mes' in t:
+        if 'este_mes' in esc:
             ini = hoy.replace(day=1)
             return datetime.combine(ini, datetime.min.time()), datetime.combine(hoy, datetime.max.time())
 
-        if re.search(r'\b(mes\s+pasado|último\s+mes|mes\s+anterior)\b', t):
+        if 'mes_pasado' in esc:
             primer_dia_mes_actual = hoy.replace(day=1)
             ultimo_dia_mes_pasado = primer_dia_mes_actual - timedelta(days=1)
             primer_dia_mes_pasado = ultimo_dia_mes_pasado.replace(day=1)
             return datetime.combine(primer_dia_mes_pasado, datetime.min.time()), datetime.combine(ultimo_dia_mes_pasado, datetime.max.time())
 
-        # 6) este año / año pasado
-        if 'este año' in t:
+        # 6) <mes> del año pasado / <mes> de este año
+        #    Antes que "este año"/"año pasado", que de otro modo los tapaban
+        if 'mes_anio_pasado' in esc:
+            return cls._rango_mes(hoy.year - 1, cls.MESES_MAP[esc.grupo('mes_anio_pasado', 'mes')])
+
+        if 'mes_este_anio' in esc:
+            return cls._rango_mes(hoy.year, cls.MESES_MAP[esc.grupo('mes_este_anio', 'mes')])
+
+        # 7) este año / año pasado
+        if 'este_anio' in esc:
             ini = hoy.replace(month=1, day=1)
             return datetime.combine(ini, datetime.min.time()), datetime.combine(hoy, datetime.max.time())
 
-        if re.search(r'\b(año\s+pasado|último\s+año)\b', t):
+        if 'anio_pasado' in esc:
             y = hoy.year - 1
             fi = datetime(y, 1, 1)
             ff = datetime(y, 12, 31, 23, 59, 59, 999000)
             return fi, ff
 
-        # 7) <mes> del año pasado
-        m_rel = re.search(
-            r'\b(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)\b\s+del?\s+año\s+pasado',
-            t
-        )
-        if m_rel:
-            mes = cls.MESES_MAP[m_rel.group(1)]
-            y = hoy.year - 1
-            ultimo = calendar.monthrange(y, mes)[1]
-            fi = datetime(y, mes, 1)
-            ff = datetime(y, mes, ultimo, 23, 59, 59, 999000)
-            return fi, ff
-
-        # 8) <mes> de este año
-        m_rel2 = re.search(
-            r'\b(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)\b\s+de\s+este\s+año',
-            t
-        )
-        if m_rel2:
-            mes = cls.MESES_MAP[m_rel2.group(1)]
-            y = hoy.year
-            ultimo = calendar.monthrange(y, mes)[1]
-            fi = datetime(y, mes, 1)
-            ff = datetime(y, mes, ultimo, 23, 59, 59, 999000)
-            return fi, ff
-
-        # 9) <mes> de YYYY  (explícito)
-        m_exp = re.search(
-            r'\b(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)\b\s+de\s+(\d{4})\b',
-            t
-        )
-        if m_exp:
-            try:
-                mes = cls.MESES_MAP[m_exp.group(1)]
-                y = int(m_exp.group(2))
-                ultimo = calendar.monthrange(y, mes)[1]
-                fi = datetime(y, mes, 1)
-                ff = datetime(y, mes, ultimo, 23, 59, 59, 999000)
-                return fi, ff
-            except Exception:
-                pass
-
-        # 10) <mes> del año YYYY  (NUEVO)  — ej: "noviembre del año 2025"
-        m_exp_del_anio = re.search(
-            r'\b(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)\b\s+del?\s+año\s+(\d{4})\b',
-            t
-        )
-        if m_exp_del_anio:
-            try:
-                mes = cls.MESES_MAP[m_exp_del_anio.group(1)]
-                y = int(m_exp_del_anio.group(2))
-                ultimo = calendar.monthrange(y, mes)[1]
-                fi = datetime(y, mes, 1)
-                ff = datetime(y, mes, ultimo, 23, 59, 59, 999000)
-                return fi, ff
-            except Exception:
-                pass
+        # 8) <mes> de YYYY / <mes> del año YYYY / <mes> del YYYY
+        for regla in ('mes_de', 'mes_del_anio', 'mes_del_n'):
+            if regla in esc:
+                try:
+                    return cls._rango_mes(int(esc.grupo(regla, 'anio')), cls.MESES_MAP[esc.grupo(regla, 'mes')])
+                except Exception:
+                    pass
 
-        # 11) <mes> del YYYY  (NUEVO) — ej: "noviembre del 2025"
-        m_exp_del = re.search(
-            r'\b(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)\b\s+del?\s+(\d{4})\b',
-            t
-        )
-        if m_exp_del:
-            try:
-                mes = cls.MESES_MAP[m_exp_del.group(1)]
-                y = int(m_exp_del.group(2))
-                ultimo = calendar.monthrange(y, mes)[1]
-                fi = datetime(y, mes, 1)
-                ff = datetime(y, mes, ultimo, 23, 59, 59, 999000)
-                return fi, ff
-            except Exception:
-                pass
+        # 9) Fechas sueltas dd/mm/yyyy (una o dos)
+        def _p(m) -> datetime:
+            return datetime(int(m.group('fecha_dmy_y')), int(m.group('fecha_dmy_m')), int(m.group('fecha_dmy_d')))
 
-        # 12) Fechas sueltas dd/mm/yyyy (una o dos)
-        fechas = re.findall(r'\b\d{1,2}[/-]\d{1,2}[/-]\d{4}\b', t)
-        if len(fechas) >= 2:
-            def _p(dmy: str) -> datetime:
-                d, mth, y = re.split(r'[/-]', dmy)
-                return datetime(int(y), int(mth), int(d))
-            fi = _p(fechas[0])
-            ff = _p(fechas[1]).replace(hour=23, minute=59, second=59, microsecond=999000)
+        if len(esc.fechas_dmy) >= 2:
+            fi = _p(esc.fechas_dmy[0])
+            ff = _p(esc.fechas_dmy[1]).replace(hour=23, minute=59, second=59, microsecond=999000)
             return fi, ff
-        elif len(fechas) == 1:
-            d, mth, y = re.split(r'[/-]', fechas[0])
-            fi = datetime(int(y), int(mth), int(d))
+        elif len(esc.fechas_dmy) == 1:
+            fi = _p(esc.fechas_dmy[0])
             ff = datetime.combine(hoy, datetime.max.time())
             return fi, ff
 
@@ -279,85 +400,38 @@ class InterpretadorComandosVoz:
 
     # ============= Montos =============
     @staticmethod
-    def extraer_monto_minimo(texto: str) -> Optional[float]:
+    def _monto_desde_escaneo(esc: EscaneoComando, reglas: Tuple[str, ...]) -> Optional[float]:
+        for regla in reglas:
+            n = numero_desde_texto(esc.grupo(regla, 'n'))
+            if n is not None:
+                return n
+        return None
+
+    @classmethod
+    def extraer_monto_minimo(cls, texto: str) -> Optional[float]:
         """
         Detecta comparadores de mínimo: mayor a/que, más de, superior a, >=, >, desde.
         Retorna float o None.
         """
-        t = InterpretadorComandosVoz._norm_text(texto)
-        patrones = [
-            r'(?:mayor(?:es)?\s+(?:a|que)|m[aá]s\s+de|mas\s+de|superior(?:es)?\s+a|>=|>\s*)(\d[\d\.,\s]*)',
-            r'(?:desde)\s+(\d[\d\.,\s]*)',
-        ]
-        for p in patrones:
-            m = re.search(p, t, re.IGNORECASE)
-            if m:
-                num = m.group(1)
-                clean = re.sub(r'[^\d,\.]', '', num).replace('.', '').replace(',', '')
-                try:
-                    return float(clean)
-                except Exception:
-                    continue
-        return None
+        return cls._monto_desde_escaneo(cls._escanear(texto), ('min_cmp', 'min_desde'))
 
-    @staticmethod
-    def extraer_monto_maximo(texto: str) -> Optional[float]:
+    @classmethod
+    def extraer_monto_maximo(cls, texto: str) -> Optional[float]:
         """
         Detecta comparadores de máximo: menor a/que, menos de, inferior a, <=, <, hasta.
         Retorna float o None.
         """
-        t = InterpretadorComandosVoz._norm_text(texto)
-        patrones = [
-            r'(?:menor(?:es)?\s+(?:a|que)|menos\s+de|inferior(?:es)?\s+a|<=|<\s*)(\d[\d\.,\s]*)',
-            r'(?:hasta)\s+(\d[\d\.,\s]*)',
-        ]
-        for p in patrones:
-            m = re.search(p, t, re.IGNORECASE)
-            if m:
-                num = m.group(1)
-                clean = re.sub(r'[^\d,\.]', '', num).replace('.', '').replace(',', '')
-                try:
-                    return float(clean)
-                except Exception:
-                    continue
-        return None
+        return cls._monto_desde_escaneo(cls._escanear(texto), ('max_cmp', 'max_hasta'))
 
     # ============= Categoría / Estado / Otros =============
     def extraer_categoria(self, texto: str) -> Optional[str]:
         """
-        Intenta reconocer categoría/subcategoría:
-        1) Si hay modelos: buscar por coincidencia en BD (descripcion).
-        2) Si no, usar hints estáticos (CATEGORIAS_REALES_HINT).
+        Reconoce categoría/subcategoría en una sola pasada con un autómata
+        Aho-Corasick. Prioridad: subcategorías de la BD, categorías de la BD y
+        luego hints estáticos (CATEGORIAS_REALES_HINT).
         Retorna texto (nombre canónico) para que el Processor lo interprete.
         """
-        t = self._norm_text(texto)
-
-        # 1) SubCategoria
-        if SubCategoria is not None:
-            try:
-                for sc in SubCategoria.objects.all():
-                    name = (sc.descripcion or "").lower()
-                    if name and name in t:
-                        return f"subcategoria:{sc.descripcion}"
-            except Exception:
-                pass
-
-        # 2) Categoria
-        if Categoria is not None:
-            try:
-                for c in Categoria.objects.all():
-                    name = (c.descripcion or "").lower()
-                    if name and name in t:
-                        return f"categoria:{c.descripcion}"
-            except Exception:
-                pass
-
-        # 3) Hints
-        for k, v in self.CATEGORIAS_REALES_HINT.items():
-            if k in t:
-                return f"categoria:{v}"
-
-        return None
+        return obtener_automata_categorias().buscar(self._norm_text(texto))
 
     @staticmethod
     def extraer_estado(texto: str) -> Optional[str]:
@@ -370,24 +444,16 @@ class InterpretadorComandosVoz:
             return 'Cancelado'
         return None
 
+    @classmethod
+    def extraer_limite(cls, texto: str) -> Optional[int]:
+        return cls._limite_desde_escaneo(cls._escanear(texto))
+
     @staticmethod
-    def extraer_limite(texto: str) -> Optional[int]:
-        t = (texto or "").lower()
-        patrones = [
-            r'\btop\s+(\d+)\b',
-            r'\bprimeros?\s+(\d+)\b',
-            r'\bmejores\s+(\d+)\b',
-            r'\búltimos?\s+(\d+)\b',
-            r'\bs[oó]lo\s+(\d+)\b',
-            r'\bm[aá]ximo\s+(\d+)\b',
-        ]
-        for p in patrones:
-            m = re.search(p, t, re.IGNORECASE)
-            if m:
-                try:
-                    return int(m.group(1))
-                except Exception:
-                    continue
+    def _limite_desde_escaneo(esc: EscaneoComando) -> Optional[int]:
+        for regla in _ORDEN_LIMITE:
+            n = esc.grupo(regla, 'n')
+            if n is not None:
+                return int(n)
         return None
 
     @staticmethod
@@ -413,18 +479,20 @@ class InterpretadorComandosVoz:
     def interpretar(cls, comando_voz: str) -> Dict[str, Any]:
         """
         Interpreta un comando y retorna filtros estructurados.
-        Convierte fechas a timezone-aware si vienen naive.
+        El texto se normaliza y escanea una sola vez; todas las extracciones
+        leen del mismo escaneo. Convierte fechas a timezone-aware si vienen naive.
         """
-        inst = cls()
+        t = cls._norm_text(comando_voz)
+        esc = escanear_comando(t)
 
         filtros: Dict[str, Any] = {'comando_original': comando_voz}
 
         # Tipo de reporte
-        tipo = cls.extraer_tipo_reporte(comando_voz)
+        tipo = cls.extraer_tipo_reporte(t)
         filtros['tipo_reporte'] = tipo
 
         # Rango de fechas
-        fi, ff = cls.extraer_rango_fechas(comando_voz)
+        fi, ff = cls._rango_desde_escaneo(esc)
         if fi is not None:
             if timezone.is_naive(fi):
                 fi = timezone.make_aware(fi)
@@ -435,34 +503,34 @@ class InterpretadorComandosVoz:
             filtros['fecha_fin'] = ff
 
         # Montos
-        mmin = cls.extraer_monto_minimo(comando_voz)
+        mmin = cls._monto_desde_escaneo(esc, ('min_cmp', 'min_desde'))
         if mmin is not None:
             filtros['monto_minimo'] = float(mmin)
-        mmax = cls.extraer_monto_maximo(comando_voz)
+        mmax = cls._monto_desde_escaneo(esc, ('max_cmp', 'max_hasta'))
         if mmax is not None:
             filtros['monto_maximo'] = float(mmax)
 
         # Categoria/Subcategoria
-        cat = inst.extraer_categoria(comando_voz)
+        cat = obtener_automata_categorias().buscar(t)
         if cat:
             filtros['categoria'] = cat  # ej: "categoria:Lavandería" o "subcategoria:Televisores"
 
         # Estado
-        estado = cls.extraer_estado(comando_voz)
+        estado = cls.extraer_estado(t)
         if estado:
             filtros['estado'] = estado
 
         # Límite
-        lim = cls.extraer_limite(comando_voz)
+        lim = cls._limite_desde_escaneo(esc)
         if lim:
             filtros['limite'] = lim
 
         # Formato
-        formato = cls.extraer_formato(comando_voz)
+        formato = cls.extraer_formato(t)
         if formato:
             filtros['formato'] = formato
 
         # Query libre (para debug/búsqueda textual aguas arriba)
-        filtros['q'] = cls._norm_text(comando_voz)
+        filtros['q'] = t
 
         return filtros
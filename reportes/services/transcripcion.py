@@ -0,0 +1,202 @@
+# services/transcripcion.py
+"""
+Audio de voz -> texto para `ReporteVozAudioView`, acotado en tamaño, duración
+y concurrencia.
+
+1. Decodificación en memoria: el archivo entra a ffmpeg por stdin y sale por
+   stdout como PCM de 16 bits, mono, 16 kHz (lo que usan los reconocedores), sin
+   archivos temporales. ffmpeg corre con un hilo y corta a VOZ_MAX_SEGUNDOS
+   (+ margen): un audio largo se rechaza sin decodificarlo entero. Un WAV que ya
+   viene en ese formato no pasa por ffmpeg.
+2. Reconocimiento con un backend intercambiable (VOZ_RECONOCEDOR):
+   `google` (speech_recognition, en línea), `local` (sin red, para pruebas) o
+   la ruta a una clase propia con el método `reconocer(pcm, frecuencia)`.
+
+La parte de CPU (ffmpeg y reconocedores locales) corre en un pool propio de
+VOZ_WORKERS hilos; el reconocedor en línea espera la red en el pool de
+`core.asincrono.externo`. Como mucho VOZ_WORKERS + VOZ_COLA_MAX audios a la vez
+por proceso: el siguiente recibe `VozOcupada` (503) en lugar de encolarse sin
+límite, así una ráfaga de audios no agota la CPU ni los workers.
+"""
+import array
+import asyncio
+import io
+import logging
+import math
+import subprocess
+import threading
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from core.asincrono import externo
+
+logger = logging.getLogger(__name__)
+
+FRECUENCIA = 16000
+BYTES_POR_MUESTRA = 2  # PCM s16le
+
+VOZ_RECONOCEDOR = getattr(settings, 'VOZ_RECONOCEDOR', 'google')
+VOZ_IDIOMA = getattr(settings, 'VOZ_IDIOMA', 'es-ES')
+VOZ_MAX_BYTES = getattr(settings, 'VOZ_MAX_BYTES', 5 * 1024 * 1024)
+VOZ_MAX_SEGUNDOS = getattr(settings, 'VOZ_MAX_SEGUNDOS', 30)
+VOZ_WORKERS = getattr(settings, 'VOZ_WORKERS', 2)
+VOZ_COLA_MAX = getattr(settings, 'VOZ_COLA_MAX', 8)
+VOZ_TIMEOUT = getattr(settings, 'VOZ_TIMEOUT', 60)
+VOZ_FFMPEG = getattr(settings, 'VOZ_FFMPEG', 'ffmpeg')
+
+
+class AudioInvalido(ValueError):
+    """Audio que no se puede procesar: demasiado grande, largo o ilegible."""
+
+    def __init__(self, mensaje, status=400):
+        super().__init__(mensaje)
+        self.status = status
+
+
+class VozOcupada(Exception):
+    """Ya hay VOZ_WORKERS + VOZ_COLA_MAX audios en proceso."""
+
+
+# ==========================================================
+# DECODIFICACIÓN
+# ==========================================================
+def _pcm_de_wav(datos):
+    """Frames de un WAV que ya es PCM 16 bits mono 16 kHz; None si hay que convertirlo."""
+    try:
+        with wave.open(io.BytesIO(datos)) as wav:
+            if (wav.getnchannels(), wav.getsampwidth(), wav.getframerate()) != (1, BYTES_POR_MUESTRA, FRECUENCIA):
+                return None
+            return wav.readframes(min(wav.getnframes(), int(VOZ_MAX_SEGUNDOS * FRECUENCIA) + FRECUENCIA))
+    except (wave.Error, EOFError):
+        return None
+
+
+def _pcm_con_ffmpeg(datos):
+    comando = [
+        VOZ_FFMPEG, "-nostdin", "-hide_banner", "-loglevel", "error", "-threads", "1",
+        "-i", "pipe:0",
+        # Un segundo de más basta para saber si supera el límite
+        "-t", str(VOZ_MAX_SEGUNDOS + 1),
+        "-ac", "1", "-ar", str(FRECUENCIA), "-f", "s16le", "pipe:1",
+    ]
+    try:
+        proceso = subprocess.run(comando, input=datos, capture_output=True, timeout=VOZ_TIMEOUT, check=False)
+    except FileNotFoundError:
+        raise RuntimeError(f"No se encontró ffmpeg ({VOZ_FFMPEG})")
+    except subprocess.TimeoutExpired:
+        raise AudioInvalido("El audio tardó demasiado en decodificarse")
+    if proceso.returncode != 0:
+        logger.info("ffmpeg no pudo decodificar el audio: %s", proceso.stderr.decode(errors="replace")[-300:])
+        raise AudioInvalido("No se pudo leer el archivo de audio")
+    return proceso.stdout
+
+
+def decodificar(archivo):
+    """PCM s16le mono a 16 kHz del archivo subido, validando tamaño y duración."""
+    if archivo.size and archivo.size > VOZ_MAX_BYTES:
+        raise AudioInvalido(f"El audio supera {VOZ_MAX_BYTES / (1024 * 1024):g} MB", status=413)
+    datos = archivo.read(VOZ_MAX_BYTES + 1)
+    if len(datos) > VOZ_MAX_BYTES:
+        raise AudioInvalido(f"El audio supera {VOZ_MAX_BYTES / (1024 * 1024):g} MB", status=413)
+    if not datos:
+        raise AudioInvalido("El archivo de audio está vacío")
+
+    pcm = _pcm_de_wav(datos)
+    if pcm is None:
+        pcm = _pcm_con_ffmpeg(datos)
+
+    segundos = len(pcm) / (FRECUENCIA * BYTES_POR_MUESTRA)
+    if segundos > VOZ_MAX_SEGUNDOS:
+        raise AudioInvalido(f"El audio dura más de {VOZ_MAX_SEGUNDOS:g} segundos")
+    if segundos < 0.1:
+        raise AudioInvalido("El audio no tiene sonido")
+    return pcm
+
+
+# ==========================================================
+# RECONOCEDORES
+# ==========================================================
+class ReconocedorGoogle:
+    """Google Web Speech vía speech_recognition (necesita red)."""
+
+    local = False  # espera la red: no ocupa un hilo de CPU del pool
+
+    def reconocer(self, pcm, frecuencia):
+        import speech_recognition as sr
+
+        audio = sr.AudioData(pcm, frecuencia, BYTES_POR_MUESTRA)
+        recognizer = sr.Recognizer()
+        recognizer.operation_timeout = VOZ_TIMEOUT
+        try:
+            return recognizer.recognize_google(audio, language=VOZ_IDIOMA)
+        except sr.UnknownValueError:
+            return None
+        except sr.RequestError as e:
+            logger.warning("Error del servicio de reconocimiento de voz: %s", e)
+            return None
+
+
+class ReconocedorLocal:
+    """
+    Sin red ni modelos, para pruebas y desarrollo: si el audio tiene sonido
+    devuelve VOZ_TEXTO_LOCAL; si es silencio, None.
+    """
+
+    local = True
+    UMBRAL_RMS = 200  # sobre 32767
+
+    def reconocer(self, pcm, frecuencia):
+        muestras = array.array("h", pcm[:len(pcm) - len(pcm) % BYTES_POR_MUESTRA])
+        if not muestras:
+            return None
+        rms = math.sqrt(sum(m * m for m in muestras) / len(muestras))
+        if rms < self.UMBRAL_RMS:
+            return None
+        return getattr(settings, 'VOZ_TEXTO_LOCAL', 'reporte de ventas del último mes')
+
+
+_RECONOCEDORES = {"google": ReconocedorGoogle, "local": ReconocedorLocal}
+
+
+@lru_cache(maxsize=None)
+def reconocedor():
+    clase = _RECONOCEDORES.get(VOZ_RECONOCEDOR) or import_string(VOZ_RECONOCEDOR)
+    return clase()
+
+
+# ==========================================================
+# POOL ACOTADO
+# ==========================================================
+_POOL_VOZ = ThreadPoolExecutor(max_workers=VOZ_WORKERS, thread_name_prefix="voz")
+_cupos = threading.BoundedSemaphore(VOZ_WORKERS + VOZ_COLA_MAX)
+
+
+async def _en_pool(func, *args):
+    return await asyncio.wrap_future(_POOL_VOZ.submit(func, *args))
+
+
+async def _pipeline(archivo):
+    try:
+        pcm = await _en_pool(decodificar, archivo)
+        backend = reconocedor()
+        if getattr(backend, "local", True):
+            return await _en_pool(backend.reconocer, pcm, FRECUENCIA)
+        return await externo(backend.reconocer, pcm, FRECUENCIA)
+    finally:
+        _cupos.release()
+
+
+async def transcribir(archivo):
+    """
+    Texto del audio subido, o None si no se reconoció nada. Lanza `AudioInvalido`
+    (400/413) o `VozOcupada` (503).
+    """
+    if not _cupos.acquire(blocking=False):
+        raise VozOcupada()
+    # Si el cliente corta, el request se cancela pero el trabajo ya lanzado sigue
+    # en los hilos: el cupo se libera cuando ese trabajo termina, no antes
+    return await asyncio.shield(asyncio.ensure_future(_pipeline(archivo)))
@@ -0,0 +1,19 @@
+# reportes/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from tienda.models import DetalleVenta, Productos, Venta
+
+from .services.cache_reportes import invalidar_resultados
+
+
+# =======================================
+# INVALIDACIÓN DE LA CACHÉ DE REPORTES
+# =======================================
+@receiver([post_save, post_delete], sender=Venta)
+@receiver([post_save, post_delete], sender=DetalleVenta)
+@receiver([post_save, post_delete], sender=Productos)
+def invalidar_cache_reportes(sender, **kwargs):
+    # Al confirmar: antes, otro worker podría volver a cachear los datos previos al commit
+    transaction.on_commit(invalidar_resultados)
@@ -1,3 +1,125 @@
-from django.test import TestCase
+import io
+import math
+import struct
+import wave
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from authz.models import Usuario
+from core.cache import invalidar_tags
+from reportes.services import cache_reportes, transcripcion
+from tienda.models import Venta
+
+RUTA = "/api/reportes/voz/audio/"
+
+
+def wav(segundos, amplitud=8000):
+    """WAV PCM 16 bits mono 16 kHz (no pasa por ffmpeg); amplitud 0 = silencio."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as archivo:
+        archivo.setnchannels(1)
+        archivo.setsampwidth(transcripcion.BYTES_POR_MUESTRA)
+        archivo.setframerate(transcripcion.FRECUENCIA)
+        muestras = int(segundos * transcripcion.FRECUENCIA)
+        archivo.writeframes(b"".join(struct.pack("<h", int(amplitud * math.sin(i / 10))) for i in range(muestras)))
+    return buffer.getvalue()
+
+
+# ==========================================================
+# AUDIO DE VOZ (services/transcripcion.py, ReporteVozAudioView)
+# ==========================================================
+class ReporteVozAudioTests(SimpleTestCase):
+    def setUp(self):
+        # Reconocedor local: sin red; la generación del reporte no es parte de estas pruebas
+        self.enterContext(mock.patch.object(transcripcion, "VOZ_RECONOCEDOR", "local"))
+        transcripcion.reconocedor.cache_clear()
+        self.addCleanup(transcripcion.reconocedor.cache_clear)
+        self.enterContext(mock.patch("reportes.views._reporte_por_comando", return_value={"metadata": {}}))
+
+    def _enviar(self, datos, nombre="audio.wav"):
+        return self.client.post(RUTA, {"audio": SimpleUploadedFile(nombre, datos)})
+
+    def test_tono_devuelve_texto(self):
+        with self.settings(VOZ_TEXTO_LOCAL="ventas del mes"):
+            response = self._enviar(wav(1))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["comando_detectado"], "ventas del mes")
+
+    def test_silencio(self):
+        response = self._enviar(wav(1, amplitud=0))
+        self.assertEqual(response.status_code, 400)
+
+    def test_demasiado_largo(self):
+        with mock.patch.object(transcripcion, "VOZ_MAX_SEGUNDOS", 1):
+            response = self._enviar(wav(2))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("dura más", response.json()["error"])
+
+    def test_vacio(self):
+        response = self._enviar(b"")
+        self.assertEqual(response.status_code, 400)
+
+    def test_demasiado_grande(self):
+        datos = wav(1)
+        with mock.patch.object(transcripcion, "VOZ_MAX_BYTES", len(datos) - 1):
+            response = self._enviar(datos)
+        self.assertEqual(response.status_code, 413)
+
+    def test_sin_cupos_responde_503(self):
+        ocupados = 0
+        while transcripcion._cupos.acquire(blocking=False):
+            ocupados += 1
+        try:
+            response = self._enviar(wav(1))
+        finally:
+            for _ in range(ocupados):
+                transcripcion._cupos.release()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "5")
+        self.assertEqual(ocupados, transcripcion.VOZ_WORKERS + transcripcion.VOZ_COLA_MAX)
+
+        # Con los cupos libres vuelve a aceptar audios
+        self.assertEqual(self._enviar(wav(1)).status_code, 200)
+
+
+# ==========================================================
+# CACHÉ DE RESULTADOS DE REPORTES (services/cache_reportes.py)
+# ==========================================================
+class CacheResultadosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        cache_reportes.resultados.clear()
+        self.addCleanup(cache_reportes.resultados.clear)
+        self.calculos = 0
+
+    def _reporte(self):
+        def calcular():
+            self.calculos += 1
+            return {"total": self.calculos}
+
+        return cache_reportes.resultado_cacheado("clave", calcular)
+
+    def test_invalidacion_desde_otro_proceso(self):
+        self._reporte()
+        self._reporte()
+        self.assertEqual(self.calculos, 1)
+
+        # Otro proceso con la misma caché compartida sólo incrementa el tag:
+        # el LRU de este proceso sigue lleno pero su entrada ya no se lee
+        invalidar_tags(cache_reportes.TAG_RESULTADOS)
+        self.assertEqual(self._reporte(), {"total": 2})
+
+    def test_venta_invalida_al_confirmar(self):
+        self._reporte()
+        perfil = Usuario.objects.create(user=User.objects.create_user("cliente_rep", "rep@x.com", "x"))
+        with self.captureOnCommitCallbacks(execute=True):
+            Venta.objects.create(usuario=perfil, fecha=timezone.now(), total=10)
+            self._reporte()
+            self.assertEqual(self.calculos, 1)
+        self._reporte()
+        self.assertEqual(self.calculos, 2)
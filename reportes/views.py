@@ -1,13 +1,32 @@
 """
 Vistas para el sistema de reportes de SmartSales365.
 """
-from django.http import JsonResponse
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 import json
 
-from .services.generador_reportes import GeneradorReportes
+from asgiref.sync import sync_to_async
+
+from core.renderers import JsonResponseRapida
+from .services import cache_reportes, transcripcion
+
+
+def _generador():
+    """Nuevo GeneradorReportes; pandas se importa con el primer reporte, no al cargar las URLs."""
+    from .services.generador_reportes import GeneradorReportes
+
+    return GeneradorReportes()
+
+
+def _reporte_por_comando(texto):
+    return _generador().reporte_por_comando(texto, usar_ia=True)
+
+
+def _reporte_get_cacheado(tipo, filtros, metodo):
+    """GET de dashboards: mismo conjunto de filtros -> resultado desde la caché de reportes."""
+    clave = cache_reportes.huella_filtros(tipo, filtros, reporte="get")
+    return cache_reportes.resultado_cacheado(clave, lambda: getattr(_generador(), metodo)(filtros))
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -33,16 +52,16 @@ class ReporteVozView(View):
             usar_ia = data.get('usar_ia', True)
             
             if not comando:
-                return JsonResponse({
+                return JsonResponseRapida({
                     'success': False,
                     'error': 'El campo "comando" es requerido'
                 }, status=400)
             
             # Generar el reporte
-            generador = GeneradorReportes()
+            generador = _generador()
             resultado = generador.reporte_por_comando(comando, usar_ia=usar_ia)
             
-            return JsonResponse({
+            return JsonResponseRapida({
                 'success': True,
                 'comando_procesado': comando,
                 'reporte': resultado,
@@ -50,12 +69,12 @@ class ReporteVozView(View):
             })
             
         except json.JSONDecodeError:
-            return JsonResponse({
+            return JsonResponseRapida({
                 'success': False,
                 'error': 'Cuerpo de solicitud JSON inválido'
             }, status=400)
         except Exception as e:
-            return JsonResponse({
+            return JsonResponseRapida({
                 'success': False,
                 'error': f'Error al procesar el comando: {str(e)}'
             }, status=500)
@@ -85,17 +104,16 @@ class ReporteVentasView(View):
             # Limpiar filtros vacíos
             filtros = {k: v for k, v in filtros.items() if v is not None}
             
-            generador = GeneradorReportes()
-            resultado = generador.reporte_ventas_general(filtros)
+            resultado = _reporte_get_cacheado("ventas", filtros, "reporte_ventas_general")
             
-            return JsonResponse({
+            return JsonResponseRapida({
                 'success': True,
                 'filtros_aplicados': filtros,
                 'reporte': resultado
             })
             
         except Exception as e:
-            return JsonResponse({
+            return JsonResponseRapida({
                 'success': False,
                 'error': f'Error al generar reporte: {str(e)}'
             }, status=500)
@@ -107,16 +125,16 @@ class ReporteVentasView(View):
         try:
             data = json.loads(request.body)
             
-            generador = GeneradorReportes()
+            generador = _generador()
             resultado = generador.reporte_ventas_general(data)
             
-            return JsonResponse({
+            return JsonResponseRapida({
                 'success': True,
                 'reporte': resultado
             })
             
         except Exception as e:
-            return JsonResponse({
+            return JsonResponseRapida({
                 'success': False,
                 'error': f'Error al generar reporte: {str(e)}'
             }, status=500)
@@ -143,17 +161,16 @@ class ReporteProductosView(View):
             # Limpiar filtros vacíos
             filtros = {k: v for k, v in filtros.items() if v is not None}
             
-            generador = GeneradorReportes()
-            resultado = generador.reporte_productos_rendimiento(filtros)
+            resultado = _reporte_get_cacheado("productos", filtros, "reporte_productos_rendimiento")
             
-            return JsonResponse({
+            return JsonResponseRapida({
                 'success': True,
                 'filtros_aplicados': filtros,
                 'reporte': resultado
             })
             
         except Exception as e:
-            return JsonResponse({
+            return JsonResponseRapida({
                 'success': False,
                 'error': f'Error al generar reporte: {str(e)}'
             }, status=500)
@@ -165,16 +182,16 @@ class ReporteProductosView(View):
         try:
             data = json.loads(request.body)
             
-            generador = GeneradorReportes()
+            generador = _generador()
             resultado = generador.reporte_productos_rendimiento(data)
             
-            return JsonResponse({
+            return JsonResponseRapida({
                 'success': True,
                 'reporte': resultado
             })
             
         except Exception as e:
-            return JsonResponse({
+            return JsonResponseRapida({
                 'success': False,
                 'error': f'Error al generar reporte: {str(e)}'
             }, status=500)
@@ -201,17 +218,16 @@ class ReporteClientesView(View):
             # Limpiar filtros vacíos
             filtros = {k: v for k, v in filtros.items() if v is not None}
             
-            generador = GeneradorReportes()
-            resultado = generador.reporte_clientes_detallado(filtros)
+            resultado = _reporte_get_cacheado("clientes", filtros, "reporte_clientes_detallado")
             
-            return JsonResponse({
+            return JsonResponseRapida({
                 'success': True,
                 'filtros_aplicados': filtros,
                 'reporte': resultado
             })
             
         except Exception as e:
-            return JsonResponse({
+            return JsonResponseRapida({
                 'success': False,
                 'error': f'Error al generar reporte: {str(e)}'
             }, status=500)
@@ -223,16 +239,16 @@ class ReporteClientesView(View):
         try:
             data = json.loads(request.body)
             
-            generador = GeneradorReportes()
+            generador = _generador()
             resultado = generador.reporte_clientes_detallado(data)
             
-            return JsonResponse({
+            return JsonResponseRapida({
                 'success': True,
                 'reporte': resultado
             })
             
         except Exception as e:
-            return JsonResponse({
+            return JsonResponseRapida({
                 'success': False,
                 'error': f'Error al generar reporte: {str(e)}'
             }, status=500)
@@ -258,17 +274,16 @@ class ReporteInventarioView(View):
             # Limpiar filtros vacíos
             filtros = {k: v for k, v in filtros.items() if v is not None}
             
-            generador = GeneradorReportes()
-            resultado = generador.reporte_inventario_analitico(filtros)
+            resultado = _reporte_get_cacheado("inventario", filtros, "reporte_inventario_analitico")
             
-            return JsonResponse({
+            return JsonResponseRapida({
                 'success': True,
                 'filtros_aplicados': filtros,
                 'reporte': resultado
             })
             
         except Exception as e:
-            return JsonResponse({
+            return JsonResponseRapida({
                 'success': False,
                 'error': f'Error al generar reporte: {str(e)}'
             }, status=500)
@@ -280,16 +295,16 @@ class ReporteInventarioView(View):
         try:
             data = json.loads(request.body)
             
-            generador = GeneradorReportes()
+            generador = _generador()
             resultado = generador.reporte_inventario_analitico(data)
             
-            return JsonResponse({
+            return JsonResponseRapida({
                 'success': True,
                 'reporte': resultado
             })
             
         except Exception as e:
-            return JsonResponse({
+            return JsonResponseRapida({
                 'success': False,
                 'error': f'Error al generar reporte: {str(e)}'
             }, status=500)
@@ -300,13 +315,16 @@ class ReporteInventarioView(View):
 class ReporteVozAudioView(View):
     """
     Vista para procesar audio de voz y generar reportes.
+
+    Async (ver core/asincrono.py): la decodificación y el reconocimiento de voz
+    corren fuera del event loop, en un pool acotado (ver services/transcripcion.py).
     """
     
-    def post(self, request):
+    async def post(self, request):
         try:
             # Verificar si se envió un archivo de audio
             if 'audio' not in request.FILES:
-                return JsonResponse({
+                return JsonResponseRapida({
                     'success': False,
                     'error': 'No se envió archivo de audio'
                 }, status=400)
@@ -315,25 +333,37 @@ class ReporteVozAudioView(View):
             
             # Validar tipo de archivo
             if not audio_file.name.lower().endswith(('.wav', '.mp3', '.ogg', '.webm')):
-                return JsonResponse({
+                return JsonResponseRapida({
                     'success': False,
                     'error': 'Formato de audio no soportado. Use WAV, MP3, OGG o WEBM'
                 }, status=400)
             
-            # Convertir audio a texto (necesitas instalar speech_recognition)
-            texto_transcrito = self.convertir_audio_a_texto(audio_file)
-            
+            # Convertir audio a texto (tamaño, duración y concurrencia acotados)
+            try:
+                texto_transcrito = await transcripcion.transcribir(audio_file)
+            except transcripcion.AudioInvalido as e:
+                return JsonResponseRapida({
+                    'success': False,
+                    'error': str(e)
+                }, status=e.status)
+            except transcripcion.VozOcupada:
+                respuesta = JsonResponseRapida({
+                    'success': False,
+                    'error': 'Hay demasiados audios en proceso. Intente nuevamente en unos segundos.'
+                }, status=503)
+                respuesta['Retry-After'] = '5'
+                return respuesta
+
             if not texto_transcrito:
-                return JsonResponse({
+                return JsonResponseRapida({
                     'success': False,
                     'error': 'No se pudo transcribir el audio. Intente nuevamente.'
                 }, status=400)
             
             # Procesar el comando como el endpoint normal de voz
-            generador = GeneradorReportes()
-            resultado = generador.reporte_por_comando(texto_transcrito, usar_ia=True)
+            resultado = await sync_to_async(_reporte_por_comando)(texto_transcrito)
             
-            return JsonResponse({
+            return JsonResponseRapida({
                 'success': True,
                 'comando_detectado': texto_transcrito,
                 'reporte': resultado,
@@ -341,52 +371,11 @@ class ReporteVozAudioView(View):
             })
             
         except Exception as e:
-            return JsonResponse({
+            return JsonResponseRapida({
                 'success': False,
                 'error': f'Error al procesar audio: {str(e)}'
             }, status=500)
     
-    def convertir_audio_a_texto(self, audio_file):
-        """Convierte audio a texto usando speech_recognition y pydub."""
-        import speech_recognition as sr
-        import tempfile
-        import os
-        from pydub import AudioSegment
-
-        temp_input = None
-        temp_wav = None
-
-        try:
-            ext = os.path.splitext(audio_file.name)[1].lower() or ".webm"
-            with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp_in:
-                for chunk in audio_file.chunks():
-                    tmp_in.write(chunk)
-                temp_input = tmp_in.name
-
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_wav:
-                temp_wav = tmp_wav.name
-
-            audio_seg = AudioSegment.from_file(temp_input)
-            audio_seg.export(temp_wav, format="wav")
-
-            recognizer = sr.Recognizer()
-            with sr.AudioFile(temp_wav) as source:
-                audio_data = recognizer.record(source)
-                texto = recognizer.recognize_google(audio_data, language='es-ES')
-
-            return texto
-
-        except Exception as e:
-            print(f"Error en transcripción: {e}")
-            return None
-
-        finally:
-            if temp_input and os.path.exists(temp_input):
-                os.unlink(temp_input)
-            if temp_wav and os.path.exists(temp_wav):
-                os.unlink(temp_wav)
-
-
 # Vista de prueba para verificar que la app funciona
 @method_decorator(csrf_exempt, name='dispatch')
 class ReportesStatusView(View):
@@ -398,9 +387,9 @@ class ReportesStatusView(View):
         """
         Retorna el estado del sistema de reportes.
         """
-        generador = GeneradorReportes()
+        generador = _generador()
         
-        return JsonResponse({
+        return JsonResponseRapida({
             'success': True,
             'status': 'operacional',
             'ia_disponible': generador.procesador_ia.ia_disponible,
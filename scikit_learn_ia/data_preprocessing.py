@@ -9,6 +9,7 @@ from django.db.models import Sum, Count, Avg
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 django.setup()
 
+from core.routers import lecturas_en_replica
 from tienda.models import Venta, DetalleVenta, Productos, Usuario, Categoria, SubCategoria
 
 def cargar_datos_combinados(usar_reales=True, usar_sinteticos=True):
@@ -242,6 +243,7 @@ def normalizar_fechas(df):
     
     return df
 
+@lecturas_en_replica
 def cargar_datos_combinados(usar_reales=True, usar_sinteticos=True):
     """
     Carga datos combinados desde PostgreSQL (reales) y CSVs (sintéticos)
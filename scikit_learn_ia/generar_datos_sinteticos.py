@@ -11,6 +11,7 @@ warnings.filterwarnings('ignore')
 # 🛣️ Rutas unificadas (local / Railway) + banner de diagnóstico
 from scikit_learn_ia.paths import (
     DATA_DIR,  # .../scikit_learn_ia/datasets (o IA_DATA_DIR)
+    asegurar_directorios,
     print_paths_banner
 )
 
@@ -75,6 +76,7 @@ def add_periodo_fields(df: pd.DataFrame) -> pd.DataFrame:
 # CONFIGURACIÓN (SIN CAMBIOS DE LÓGICA)
 # ================================
 print_paths_banner("🔍 Ejecutando generar_datos_sinteticos.py")
+asegurar_directorios()
 
 fake = Faker('es_ES')
 np.random.seed(42)
@@ -82,9 +84,10 @@ random.seed(42)
 
 FECHA_INICIO_HISTORIA = datetime(2019, 1, 1)
 FECHA_FIN_HISTORIA   = datetime(2024, 12, 31)
-NUM_USUARIOS   = 500
-NUM_PRODUCTOS  = 150
-NUM_VENTAS     = 50000  # Aprox 2 ítems/venta → ~100k ítems
+# Tamaño configurable por entorno (p. ej. datasets chicos para el benchmark_rutas_criticas)
+NUM_USUARIOS   = int(os.getenv("IA_SINTETICOS_USUARIOS", 500))
+NUM_PRODUCTOS  = int(os.getenv("IA_SINTETICOS_PRODUCTOS", 150))
+NUM_VENTAS     = int(os.getenv("IA_SINTETICOS_VENTAS", 50000))  # Aprox 2 ítems/venta → ~100k ítems
 
 print("🎯 GENERANDO DATOS COMPLETOS (72 MESES) CON PATRONES FUERTES")
 
@@ -295,7 +298,6 @@ print("✅ Series temporales generadas correctamente (producto, categoría y cli
 # GUARDAR ARCHIVOS BASE
 # ================================
 print("💾 Guardando archivos base...")
-DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 (df_usuarios).to_csv( DATA_DIR / "usuarios.csv",        index=False)
 (df_productos).to_csv(DATA_DIR / "productos.csv",       index=False)
@@ -26,9 +26,11 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR  = Path(os.getenv("IA_DATA_DIR", BASE_DIR / "scikit_learn_ia" / "datasets"))
 MODEL_DIR = Path(os.getenv("IA_MODEL_DIR", BASE_DIR / "scikit_learn_ia" / "model"))
 
-# Crear carpetas si no existen
-DATA_DIR.mkdir(parents=True, exist_ok=True)
-MODEL_DIR.mkdir(parents=True, exist_ok=True)
+def asegurar_directorios() -> None:
+    """Crea DATA_DIR y MODEL_DIR si no existen. Lo llaman los scripts que escriben,
+    no el import: los workers web sólo leen y pueden correr con el disco en solo lectura."""
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    MODEL_DIR.mkdir(parents=True, exist_ok=True)
 
 # ================================
 # 🧩 RUTAS GLOBALES DE ARCHIVOS
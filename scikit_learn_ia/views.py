@@ -1,10 +1,14 @@
 # scikit_learn_ia/views.py
+# pandas se importa dentro de cada vista/helper que lo usa: cargar las URLs (y los
+# workers que sólo sirven CRUD) no paga su import ni su memoria.
+from __future__ import annotations
+
 import os
 import json
 import subprocess, sys
 from datetime import datetime
+from typing import TYPE_CHECKING
 
-import pandas as pd
 from django.utils.http import http_date
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -12,6 +16,13 @@ from rest_framework.permissions import AllowAny
 from rest_framework import status
 from django.http import FileResponse, HttpResponseNotFound
 
+from core.cache import cache_vista, invalidar_tags
+from core.condicional import condicional_archivos
+from core.metricas import medir
+
+if TYPE_CHECKING:
+    import pandas as pd
+
 # 🔗 RUTAS UNIFICADAS (local / Railway)
 from scikit_learn_ia.paths import (
     BASE_DIR, DATA_DIR, MODEL_DIR,
@@ -22,11 +33,18 @@ from scikit_learn_ia.paths import (
 
 VALID_SCOPES = {"categoria", "producto", "cliente"}
 
+# Health y series dependen de los archivos generados: se invalidan al entrenar/predecir
+# desde la API; el TTL corto cubre los scripts lanzados por fuera.
+TAGS_IA = ("ia",)
+IA_CACHE_TTL = 60
+
 # ---------- Helpers de tiempo ----------
 def _build_fecha_canonica(anio: int, mes: int):
+    import pandas as pd
     return pd.to_datetime(f"{int(anio)}-{int(mes):02d}-01", utc=True)
 
 def add_periodo_fields(df: pd.DataFrame) -> pd.DataFrame:
+    import pandas as pd
     df = df.copy()
     if "fecha" in df.columns:
         df["fecha"] = pd.to_datetime(df["fecha"], errors="coerce", utc=True)
@@ -60,6 +78,7 @@ def add_periodo_fields(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 # ---------- Helper ejecución de scripts ----------
+@medir("subprocess")
 def _run_script(rel_path: str) -> tuple[bool, str]:
     """
     Ejecuta un script Python como MÓDULO (python -m paquete.modulo) para que funcionen los imports.
@@ -95,6 +114,7 @@ def _run_script(rel_path: str) -> tuple[bool, str]:
     except Exception as e:
         return False, f"[EXCEPTION] {e}"
 
+@medir("subprocess")
 def _run_script_args(rel_path: str, args: list[str]) -> tuple[bool, str]:
     script_path = BASE_DIR / rel_path
     if not script_path.exists():
@@ -124,6 +144,7 @@ def _run_script_args(rel_path: str, args: list[str]) -> tuple[bool, str]:
     except Exception as e:
         return False, f"[EXCEPTION] {e}"
 
+@medir("subprocess")
 def _run_module(modname: str, *args: str) -> tuple[bool, str]:
     """Ejecuta un módulo con -m usando el mismo venv, UTF-8 y PYTHONPATH correcto."""
     try:
@@ -160,6 +181,7 @@ def _slug(value) -> str:
 # ---------- Views ----------
 class IAHealthView(APIView):
     permission_classes = [AllowAny]
+    @cache_vista(tags=TAGS_IA, timeout=IA_CACHE_TTL)
     def get(self, request):
         return Response({
             "ok": True,
@@ -179,6 +201,7 @@ class GenerarDatosSinteticosView(APIView):
     permission_classes = [AllowAny]
     def post(self, request):
         ok, out = _run_script("scikit_learn_ia/generar_datos_sinteticos.py")
+        invalidar_tags(*TAGS_IA)
         status_code = status.HTTP_200_OK if ok else status.HTTP_500_INTERNAL_SERVER_ERROR
         return Response({"ok": ok, "log": out[-8000:]}, status=status_code)
 
@@ -186,6 +209,7 @@ class EntrenarModeloCantidadesView(APIView):
     permission_classes = [AllowAny]
     def post(self, request):
         ok, out = _run_script("scikit_learn_ia/train_model_cantidades.py")
+        invalidar_tags(*TAGS_IA)
         payload = {"ok": ok, "log": out[-8000:]}
         if METADATA_CANT.exists():
             try:
@@ -198,7 +222,9 @@ class EntrenarModeloCantidadesView(APIView):
 class PredecirCantidadesView(APIView):
     permission_classes = [AllowAny]
     def post(self, request):
+        import pandas as pd
         ok, out = _run_script("scikit_learn_ia/predict_sales_cantidades.py")
+        invalidar_tags(*TAGS_IA)
         payload = {"ok": ok, "log": out[-8000:]}
         if PRED_TOTALES_CSV.exists():
             try:
@@ -216,7 +242,10 @@ class PrediccionesListView(APIView):
     GET /ia/predicciones?anio=2025&mes=11
     """
     permission_classes = [AllowAny]
+    @condicional_archivos(lambda request: [PRED_TOTALES_CSV])
+    @medir("pandas")
     def get(self, request):
+        import pandas as pd
         if not PRED_TOTALES_CSV.exists():
             return Response({"ok": False, "error": "No existe el CSV de predicciones."},
                             status=status.HTTP_404_NOT_FOUND)
@@ -245,7 +274,9 @@ class ReporteVentasMensualView(APIView):
     GET /ia/reporte-ventas?anio=2022&mes=1
     """
     permission_classes = [AllowAny]
+    @medir("pandas")
     def get(self, request):
+        import pandas as pd
         anio = int(request.query_params.get("anio", 0))
         mes = int(request.query_params.get("mes", 0))
         if anio == 0 or mes == 0:
@@ -367,12 +398,21 @@ class ReporteExcelView(APIView):
         return resp
 
 # ---------- Panel: listar series ----------
+def _archivos_series(request):
+    scope = str(request.query_params.get("scope", "")).lower().strip()
+    return [panel_series_summary(scope)] if scope in VALID_SCOPES else []
+
+
 class PanelSeriesListView(APIView):
     """
     GET /api/ia/panel/series/?scope=categoria|producto|cliente
     """
     permission_classes = [AllowAny]
+    @condicional_archivos(_archivos_series)
+    @cache_vista(tags=TAGS_IA, timeout=IA_CACHE_TTL)
+    @medir("pandas")
     def get(self, request):
+        import pandas as pd
         scope = str(request.query_params.get("scope", "")).lower().strip()
         if scope not in VALID_SCOPES:
             return Response({"ok": False, "error": f"scope inválido. Usa {sorted(VALID_SCOPES)}"},
@@ -433,7 +473,9 @@ class PanelPrediccionesView(APIView):
         except Exception as e:
             return False, f"Error ejecutando predict: {e}"
 
+    @medir("pandas")
     def get(self, request):
+        import pandas as pd
         scope = str(request.query_params.get("scope", "")).lower().strip()
         serie = request.query_params.get("serie", None)
         # force se mantiene por compatibilidad, pero ya no es requerido
@@ -502,11 +544,13 @@ class EntrenarPanelView(APIView):
                             status=status.HTTP_400_BAD_REQUEST)
         args = [scope] if scope else []
         ok, out = _run_module("scikit_learn_ia.train_model_panel", *args)
+        invalidar_tags(*TAGS_IA)
         status_code = status.HTTP_200_OK if ok else status.HTTP_500_INTERNAL_SERVER_ERROR
         return Response({"ok": ok, "log": out[-8000:]}, status=status_code)
 
 class PanelHealthView(APIView):
     permission_classes = [AllowAny]
+    @cache_vista(tags=TAGS_IA, timeout=IA_CACHE_TTL)
     def get(self, request):
         scopes = sorted(list(VALID_SCOPES))
         res = {}
@@ -555,7 +599,9 @@ class PanelDescargarReporteView(APIView):
         except Exception as e:
             return False, str(e)
 
+    @medir("pandas")
     def get(self, request):
+        import pandas as pd
         scope = str(request.query_params.get("scope", "")).lower().strip()
         serie = request.query_params.get("serie", None)
         formato = str(request.query_params.get("formato", "csv")).lower().strip()
@@ -658,7 +704,9 @@ class VentasHistoricasView(APIView):
     """
     permission_classes = [AllowAny]
 
+    @medir("pandas")
     def get(self, request):
+        import pandas as pd
         scope = str(request.query_params.get("scope", "total")).lower().strip()
         anio = request.query_params.get("anio")
         mes = request.query_params.get("mes")
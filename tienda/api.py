@@ -33,6 +33,15 @@ from tienda.models import (
     FCMDevice,
 )
 from django_filters.rest_framework import DjangoFilterBackend
+from core.cache import cache_vista
+from core.condicional import condicional_tablas
+from core.routers import lecturas_en_replica
+
+# Tags de caché del catálogo (y tablas de sus marcas de cambio para el ETag):
+# los invalida tienda.signals al escribir cada modelo
+TAGS_CATEGORIAS = ("categorias",)
+TAGS_SUBCATEGORIAS = ("categorias", "subcategorias")
+TAGS_PRODUCTOS = ("categorias", "subcategorias", "productos")
 
 
 class CategoriaViewSet(viewsets.ModelViewSet):
@@ -40,21 +49,44 @@ class CategoriaViewSet(viewsets.ModelViewSet):
     serializer_class = CategoriaSerializer
     permission_classes = [permissions.AllowAny]
 
+    @condicional_tablas(*TAGS_CATEGORIAS)
+    @cache_vista(tags=TAGS_CATEGORIAS)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_vista(tags=TAGS_CATEGORIAS)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
 class SubCategoriaViewSet(viewsets.ModelViewSet):
-    queryset = SubCategoria.objects.all()
+    queryset = SubCategoria.objects.select_related('categoria')
     serializer_class = SubCategoriaSerializer
     permission_classes = [permissions.AllowAny]
 
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['categoria']
 
+    @condicional_tablas(*TAGS_SUBCATEGORIAS)
+    @cache_vista(tags=TAGS_SUBCATEGORIAS)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_vista(tags=TAGS_SUBCATEGORIAS)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
 class ProductoViewSet(viewsets.ModelViewSet):
-    queryset = Productos.objects.all()
+    queryset = Productos.objects.select_related('subcategoria__categoria')
     serializer_class = ProductoSerializer
     permission_classes = [permissions.AllowAny]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['subcategoria', 'estado']
 
+    @condicional_tablas(*TAGS_PRODUCTOS)
+    @cache_vista(tags=TAGS_PRODUCTOS)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 class VentaViewSet(viewsets.ModelViewSet):
     queryset = Venta.objects.all()
     serializer_class = VentaSerializer
@@ -62,6 +94,11 @@ class VentaViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['usuario']
 
+    def list(self, request, *args, **kwargs):
+        # Listado de solo lectura y sin límite de tamaño: a la réplica (ver core/routers.py)
+        with lecturas_en_replica():
+            return super().list(request, *args, **kwargs)
+
 class DetalleVentaViewSet(viewsets.ModelViewSet):
     queryset = DetalleVenta.objects.all()
     serializer_class = DetalleVentaSerializer
@@ -112,9 +149,16 @@ class MantenimientoViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.AllowAny]
 
 
+from asgiref.sync import sync_to_async
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
 from tienda.serializer import FCMDeviceSerializer
-from authz.models import Usuario as UsuarioModel
+from authz.autenticacion import perfil_de
+from core.asincrono import request_drf
 from core.notifications import enviar_tokens_push
+from core.renderers import JsonResponseRapida
 
 
 class FCMDeviceRegisterView(APIView):
@@ -130,11 +174,7 @@ class FCMDeviceRegisterView(APIView):
         if not reg:
             return Response({'detail': 'registration_id requerido'}, status=status.HTTP_400_BAD_REQUEST)
 
-        usuario = None
-        try:
-            usuario = UsuarioModel.objects.get(user=request.user)
-        except Exception:
-            usuario = None
+        usuario = perfil_de(request)
 
         obj, created = FCMDevice.objects.update_or_create(
             registration_id=reg,
@@ -168,12 +208,8 @@ class FCMDeviceUnregisterView(APIView):
         if not reg:
             return Response({'detail': 'registration_id requerido'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Intentar obtener perfil Usuario
-        usuario = None
-        try:
-            usuario = UsuarioModel.objects.get(user=request.user)
-        except Exception:
-            usuario = None
+        # Perfil Usuario (ya cargado por la autenticación)
+        usuario = perfil_de(request)
 
         qs = FCMDevice.objects.filter(registration_id=reg)
         if usuario:
@@ -190,38 +226,50 @@ class FCMDeviceUnregisterView(APIView):
         return Response({'detail': f'{updated} dispositivo(s) desactivado(s)'} , status=status.HTTP_200_OK)
 
 
-class SendNotificationView(APIView):
+def _tokens_destino(broadcast, user_ids, device_ids):
+    if broadcast:
+        return list(FCMDevice.objects.filter(activo=True, tipo_dispositivo='android').values_list('registration_id', flat=True))
+    tokens = []
+    if user_ids:
+        tokens += list(FCMDevice.objects.filter(usuario_id__in=user_ids, activo=True, tipo_dispositivo='android').values_list('registration_id', flat=True))
+    if device_ids:
+        tokens += list(FCMDevice.objects.filter(id__in=device_ids, activo=True, tipo_dispositivo='android').values_list('registration_id', flat=True))
+    return tokens
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class SendNotificationView(View):
+    """Vista async (ver core/asincrono.py): mientras FCM responde, el worker atiende otros requests."""
     # permission_classes = [IsAdminUser]
 
-    def post(self, request):
+    async def post(self, request):
         """Enviar notificación a usuarios o dispositivos.
 
         Payload: { title, body, user_ids: [1,2], device_ids: [1,2], broadcast: bool }
         """
-        title = request.data.get('title') or request.data.get('titulo')
-        body = request.data.get('body') or request.data.get('cuerpo')
+        drf_request, error = await request_drf(request, autenticar=False)
+        if error:
+            return error
+        data = drf_request.data
+
+        title = data.get('title') or data.get('titulo')
+        body = data.get('body') or data.get('cuerpo')
         if not title or not body:
-            return Response({'detail': 'title y body son requeridos'}, status=status.HTTP_400_BAD_REQUEST)
+            return JsonResponseRapida({'detail': 'title y body son requeridos'}, status=status.HTTP_400_BAD_REQUEST)
 
-        user_ids = request.data.get('user_ids') or request.data.get('usuario_ids') or []
-        device_ids = request.data.get('device_ids') or request.data.get('device_ids') or []
-        broadcast = bool(request.data.get('broadcast'))
+        user_ids = data.get('user_ids') or data.get('usuario_ids') or []
+        device_ids = data.get('device_ids') or data.get('device_ids') or []
+        broadcast = bool(data.get('broadcast'))
 
-        tokens = []
-        if broadcast:
-            tokens = list(FCMDevice.objects.filter(activo=True, tipo_dispositivo='android').values_list('registration_id', flat=True))
-        else:
-            if user_ids:
-                tokens += list(FCMDevice.objects.filter(usuario_id__in=user_ids, activo=True, tipo_dispositivo='android').values_list('registration_id', flat=True))
-            if device_ids:
-                tokens += list(FCMDevice.objects.filter(id__in=device_ids, activo=True, tipo_dispositivo='android').values_list('registration_id', flat=True))
+        tokens = await sync_to_async(_tokens_destino)(broadcast, user_ids, device_ids)
 
         # eliminar duplicados
         tokens = list(dict.fromkeys(tokens))
 
         if not tokens:
-            return Response({'detail': 'No se encontraron tokens destinatarios'}, status=status.HTTP_400_BAD_REQUEST)
+            return JsonResponseRapida({'detail': 'No se encontraron tokens destinatarios'}, status=status.HTTP_400_BAD_REQUEST)
 
-        result = enviar_tokens_push(tokens, title, body)
-        return Response(result)
+        # sync_to_async y no `externo`: al terminar desactiva en la BD los tokens rechazados
+        result = await sync_to_async(enviar_tokens_push)(tokens, title, body)
+        return JsonResponseRapida(result)
 
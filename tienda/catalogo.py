@@ -0,0 +1,87 @@
+# tienda/catalogo.py
+"""Snapshot cacheado del catálogo para resolver precios en el servidor.
+
+`resolver_productos(ids)` devuelve, para cada producto, su descripción, precio,
+estado, stock y el descuento de la mejor promoción vigente. Los aciertos salen
+de la caché; los faltantes se resuelven con dos consultas para todo el carrito
+(productos + promociones), nunca una por ítem.
+
+Las entradas se invalidan desde `tienda.signals` al guardar/eliminar Productos,
+Promocion o ProductoPromocion, y desde el descuento de stock del checkout.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import ProductoPromocion, Productos
+
+# El TTL acota cuánto tarda en reflejarse una promoción que empieza o termina por fecha
+CATALOGO_TTL = 300
+_PREFIJO = "catalogo:producto:"
+_CENTAVO = Decimal("0.01")
+
+
+def _clave(producto_id) -> str:
+    return f"{_PREFIJO}{int(producto_id)}"
+
+
+def _precio_final(precio: Decimal, descuento: Decimal) -> Decimal:
+    if not descuento:
+        return precio
+    return (precio * (Decimal(100) - descuento) / Decimal(100)).quantize(_CENTAVO, rounding=ROUND_HALF_UP)
+
+
+def _cargar_snapshots(ids) -> dict:
+    """Consulta la BD para los ids dados: una consulta de productos y una de promociones."""
+    hoy = timezone.localdate()
+    descuentos = dict(
+        ProductoPromocion.objects.filter(
+            producto_id__in=ids,
+            promocion__estado=True,
+            promocion__fecha_inicio__lte=hoy,
+            promocion__fecha_fin__gte=hoy,
+        )
+        .values("producto_id")
+        .annotate(descuento=Max("promocion__monto"))
+        .values_list("producto_id", "descuento")
+    )
+
+    snapshots = {}
+    for p in Productos.objects.filter(id__in=ids).values("id", "descripcion", "precio", "estado", "stock"):
+        descuento = min(descuentos.get(p["id"]) or Decimal(0), Decimal(100))
+        snapshots[p["id"]] = {
+            "id": p["id"],
+            "descripcion": p["descripcion"],
+            "precio": p["precio"],
+            "estado": p["estado"],
+            "stock": p["stock"],
+            "descuento": descuento,
+            "precio_final": _precio_final(p["precio"], descuento),
+        }
+    return snapshots
+
+
+def resolver_productos(ids) -> dict:
+    """Devuelve {producto_id: snapshot} para los ids existentes (los inexistentes se omiten)."""
+    ids = {int(i) for i in ids}
+    if not ids:
+        return {}
+
+    en_cache = cache.get_many([_clave(i) for i in ids])
+    resultado = {snap["id"]: snap for snap in en_cache.values()}
+
+    faltantes = ids - resultado.keys()
+    if faltantes:
+        cargados = _cargar_snapshots(faltantes)
+        cache.set_many({_clave(pid): snap for pid, snap in cargados.items()}, timeout=CATALOGO_TTL)
+        resultado.update(cargados)
+    return resultado
+
+
+def invalidar_productos(ids) -> None:
+    """Elimina de la caché los snapshots de los productos indicados."""
+    claves = [_clave(i) for i in ids if i is not None]
+    if claves:
+        cache.delete_many(claves)
@@ -1,16 +1,68 @@
-from datetime import datetime, timedelta
+import csv
+import io
 import random
-from django.core.management.base import BaseCommand
-from django.db import transaction
-from tienda.models import Venta, Usuario
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, IntegerField, Max, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from core.cache import invalidar_tags
+from core.condicional import registrar_cambio
+from core.semillas import insertar_raw
+from reportes.services.cache_reportes import invalidar_resultados
+from tienda.catalogo import invalidar_productos
+from tienda.models import DetalleVenta, Pago, Productos, Usuario, Venta
+
+# ==========================================================
+# PATRONES DE DEMANDA
+# ==========================================================
+# Picos de fin de año y bajón de enero-febrero
+ESTACIONALIDAD_MES = {1: 0.75, 2: 0.8, 3: 0.9, 4: 0.9, 5: 1.0, 6: 0.95,
+                      7: 1.0, 8: 1.05, 9: 0.95, 10: 1.0, 11: 1.35, 12: 1.6}
+# Lunes .. domingo
+FACTOR_DIA_SEMANA = (0.9, 0.9, 0.95, 1.0, 1.15, 1.3, 1.1)
+# Horario comercial con picos al mediodía y en la noche
+PESO_HORA = {8: 2, 9: 4, 10: 6, 11: 8, 12: 9, 13: 8, 14: 6, 15: 5, 16: 5, 17: 6, 18: 8, 19: 9, 20: 8, 21: 5}
+ESTADOS = ("Pagado", "Pendiente", "Cancelado")
+PESO_ESTADO = (80, 15, 5)
+PESO_ITEMS = (50, 25, 13, 7, 5)  # 1..5 productos distintos por venta
+PESO_CANTIDAD = (70, 20, 7, 3)  # 1..4 unidades por producto
+
+# Columnas (attname) en el orden en que se generan las filas
+CAMPOS_VENTA = ("id", "fecha", "total", "estado", "usuario_id")
+CAMPOS_DETALLE = ("id", "venta_id", "producto_id", "cantidad", "subtotal")
+CAMPOS_PAGO = ("id", "monto", "fecha", "stripe_key", "venta_id")
+MODELOS = (Venta, DetalleVenta, Pago)
+
 
 class Command(BaseCommand):
-    help = "Generar datos sintéticos de ventas distribuidos en el tiempo"
+    help = (
+        "Generar datos sintéticos de ventas distribuidos en el tiempo, con detalles, pagos y "
+        "descuento de stock, en lotes (COPY en PostgreSQL)"
+    )
 
     def add_arguments(self, parser):
         parser.add_argument('--cantidad', type=int, default=8000)
         parser.add_argument('--inicio', type=str, default='2020-01-01')
         parser.add_argument('--fin', type=str, default='2025-12-31')
+        parser.add_argument('--lote', type=int, default=5000, help='Ventas por lote (una transacción por lote)')
+        parser.add_argument('--max-items', type=int, default=4, choices=range(1, len(PESO_ITEMS) + 1),
+                            help='Máximo de productos distintos por venta')
+        parser.add_argument('--crecimiento', type=float, default=0.12, help='Crecimiento anual de la demanda')
+        parser.add_argument('--semilla', type=int, help='Semilla aleatoria (resultados reproducibles)')
+        parser.add_argument('--metodo', choices=('auto', 'copy', 'bulk'), default='auto',
+                            help='copy: COPY FROM STDIN (sólo PostgreSQL); bulk: INSERT por lotes; auto: copy si se puede')
+        parser.add_argument('--sin-stock', action='store_true', help='No descontar del stock lo vendido')
+        parser.add_argument('--permitir-bd-remota', action='store_true',
+                            help='Permitir escribir en una BD que no es SQLite ni localhost')
 
     def handle(self, *args, **kwargs):
         cantidad = kwargs['cantidad']
@@ -28,77 +80,200 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR("Error: fecha_inicio > fecha_fin"))
             return
 
-        usuarios = list(Usuario.objects.all())
-        if not usuarios:
+        self._verificar_bd_local(kwargs['permitir_bd_remota'])
+        metodo = kwargs['metodo']
+        if metodo == 'auto':
+            metodo = 'copy' if connection.vendor == 'postgresql' else 'bulk'
+        elif metodo == 'copy' and connection.vendor != 'postgresql':
+            raise CommandError("--metodo copy requiere PostgreSQL")
+
+        # Sólo ids y precios: no se materializan los objetos
+        usuario_ids = list(Usuario.objects.values_list('id', flat=True))
+        if not usuario_ids:
             self.stdout.write(self.style.ERROR("❌ No hay usuarios en la base de datos"))
             return
+        productos = list(Productos.objects.filter(estado='Activo').values_list('id', 'precio'))
+        if not productos:
+            self.stdout.write(self.style.ERROR("❌ No hay productos activos en la base de datos"))
+            return
+
+        self.rng = random.Random(kwargs['semilla'])
+        self.generar_ventas(
+            cantidad, fecha_inicio, fecha_fin, usuario_ids, productos,
+            lote=max(1, kwargs['lote']), max_items=kwargs['max_items'], crecimiento=kwargs['crecimiento'],
+            metodo=metodo, descontar_stock=not kwargs['sin_stock'],
+        )
+
+    def _verificar_bd_local(self, permitir_remota):
+        if permitir_remota or connection.vendor == 'sqlite':
+            return
+        host = connection.settings_dict.get('HOST') or 'localhost'
+        if host not in ('localhost', '127.0.0.1', '::1'):
+            raise CommandError(f"La BD apunta a {host}: usa una BD local o --permitir-bd-remota.")
+
+    # ------------------------------------------------------------------
+    # Distribuciones
+    # ------------------------------------------------------------------
+    def _pesos_dias(self, fecha_inicio, fecha_fin, crecimiento):
+        """Días del rango (inicio del día, con zona horaria) y sus pesos acumulados."""
+        dias, pesos = [], []
+        for n in range((fecha_fin - fecha_inicio).days + 1):
+            dia = fecha_inicio + timedelta(days=n)
+            dias.append(timezone.make_aware(dia))
+            pesos.append(
+                ESTACIONALIDAD_MES[dia.month] * FACTOR_DIA_SEMANA[dia.weekday()] * (1 + crecimiento) ** (n / 365)
+            )
+        return dias, list(accumulate(pesos))
 
-        self.generar_ventas_simple(cantidad, fecha_inicio, fecha_fin, usuarios)
+    def _pesos_populares(self, cantidad, exponente):
+        """Pesos acumulados tipo Zipf sobre un orden aleatorio: pocos concentran la mayoría."""
+        rangos = list(range(1, cantidad + 1))
+        self.rng.shuffle(rangos)
+        return list(accumulate(1 / r ** exponente for r in rangos))
 
-    @transaction.atomic
-    def generar_ventas_simple(self, cantidad, fecha_inicio, fecha_fin, usuarios):
-        """Versión simplificada y robusta"""
-        
+    # ------------------------------------------------------------------
+    # Generación por lotes
+    # ------------------------------------------------------------------
+    def _lote(self, n, ids, productos, max_items):
+        """Filas de ventas, detalles y pagos coherentes: total = suma de subtotales, pago = total."""
+        rng = self.rng
+        venta_id, detalle_id, pago_id = ids
+        ventas, detalles, pagos = [], [], []
+        vendidos = Counter()
+
+        fechas = rng.choices(self.dias, cum_weights=self.pesos_dias, k=n)
+        horas = rng.choices(list(PESO_HORA), weights=list(PESO_HORA.values()), k=n)
+        usuarios = rng.choices(self.usuario_ids, cum_weights=self.pesos_usuarios, k=n)
+        estados = rng.choices(ESTADOS, weights=PESO_ESTADO, k=n)
+        items = rng.choices(range(1, max_items + 1), weights=PESO_ITEMS[:max_items], k=n)
+        elegidos = iter(rng.choices(productos, cum_weights=self.pesos_productos, k=sum(items)))
+        cantidades = iter(rng.choices((1, 2, 3, 4), weights=PESO_CANTIDAD, k=sum(items)))
+
+        for i in range(n):
+            venta_id += 1
+            fecha = fechas[i] + timedelta(hours=horas[i], seconds=rng.randrange(3600))
+            total = Decimal("0.00")
+            lineas = Counter()
+            for _ in range(items[i]):
+                lineas[next(elegidos)] += next(cantidades)
+            for (producto_id, precio), unidades in lineas.items():
+                detalle_id += 1
+                subtotal = precio * unidades
+                total += subtotal
+                detalles.append((detalle_id, venta_id, producto_id, unidades, subtotal))
+                if estados[i] == "Pagado":
+                    vendidos[producto_id] += unidades
+            ventas.append((venta_id, fecha, total, estados[i], usuarios[i]))
+            if estados[i] == "Pagado":
+                pago_id += 1
+                pagado = fecha + timedelta(minutes=rng.randint(1, 30))
+                pagos.append((pago_id, total, pagado, f"sint_{venta_id}", venta_id))
+
+        return (ventas, detalles, pagos), vendidos, (venta_id, detalle_id, pago_id)
+
+    def _guardar_bulk(self, modelo, campos, filas):
+        insertar_raw(modelo, [modelo(**dict(zip(campos, fila))) for fila in filas])
+
+    def _guardar_copy(self, modelo, campos, filas):
+        opts = modelo._meta
+        columnas = ", ".join(connection.ops.quote_name(opts.get_field(c).column) for c in campos)
+        tabla = connection.ops.quote_name(opts.db_table)
+        with connection.cursor() as cursor:
+            crudo = cursor.cursor  # cursor del driver, debajo del wrapper de Django
+            if hasattr(crudo, "copy_expert"):  # psycopg2
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(filas)
+                buffer.seek(0)
+                crudo.copy_expert(f"COPY {tabla} ({columnas}) FROM STDIN WITH (FORMAT csv)", buffer)
+            else:  # psycopg 3
+                with crudo.copy(f"COPY {tabla} ({columnas}) FROM STDIN") as copia:
+                    for fila in filas:
+                        copia.write_row(fila)
+
+    def generar_ventas(self, cantidad, fecha_inicio, fecha_fin, usuario_ids, productos, *,
+                       lote, max_items, crecimiento, metodo, descontar_stock):
         delta_days = (fecha_fin - fecha_inicio).days
-        self.stdout.write(f"📅 Generando {cantidad} ventas entre {fecha_inicio.date()} y {fecha_fin.date()} ({delta_days} días)")
-
-        ventas = []
-        for i in range(cantidad):
-            # Fecha aleatoria en el rango
-            dias_aleatorios = random.randint(0, delta_days)
-            fecha_venta = fecha_inicio + timedelta(days=dias_aleatorios)
-            
-            # Hora aleatoria del día
-            hora = random.randint(8, 20)
-            minuto = random.randint(0, 59)
-            segundo = random.randint(0, 59)
-            fecha_venta = fecha_venta.replace(hour=hora, minute=minuto, second=segundo)
-            
-            usuario = random.choice(usuarios)
-            
-            # Monto aleatorio entre 50 y 5000
-            total = round(random.uniform(50, 5000), 2)
-            
-            # Estado con probabilidades realistas
-            estado = random.choices(
-                ['Pagado', 'Pendiente', 'Cancelado'],
-                weights=[80, 15, 5]  # 80% Pagado, 15% Pendiente, 5% Cancelado
-            )[0]
-            
-            venta = Venta(
-                usuario=usuario,
-                fecha=fecha_venta,
-                total=total,
-                estado=estado
+        self.stdout.write(
+            f"📅 Generando {cantidad} ventas entre {fecha_inicio.date()} y {fecha_fin.date()} ({delta_days} días) "
+            f"| método {metodo} | lotes de {lote}"
+        )
+
+        self.dias, self.pesos_dias = self._pesos_dias(fecha_inicio, fecha_fin, crecimiento)
+        self.usuario_ids = usuario_ids
+        self.pesos_usuarios = self._pesos_populares(len(usuario_ids), 0.6)
+        self.pesos_productos = self._pesos_populares(len(productos), 0.8)
+        guardar = self._guardar_copy if metodo == 'copy' else self._guardar_bulk
+
+        # IDs asignados aquí (sin RETURNING ni consultas por lote); las secuencias se
+        # reajustan al final. Por eso no debe haber otras escrituras en estas tablas.
+        ids = tuple(modelo.objects.aggregate(maximo=Max('id'))['maximo'] or 0 for modelo in MODELOS)
+        filas = Counter()
+        vendidos = Counter()
+        inicio = time.perf_counter()
+        for hecho in range(0, cantidad, lote):
+            n = min(lote, cantidad - hecho)
+            tablas, vendidos_lote, ids = self._lote(n, ids, productos, max_items)
+            with transaction.atomic():
+                for modelo, campos, datos in zip(MODELOS, (CAMPOS_VENTA, CAMPOS_DETALLE, CAMPOS_PAGO), tablas):
+                    guardar(modelo, campos, datos)
+                    filas[modelo.__name__] += len(datos)
+            vendidos.update(vendidos_lote)
+            duracion = time.perf_counter() - inicio
+            self.stdout.write(
+                f"🔄 {hecho + n}/{cantidad} ventas | {sum(filas.values())} filas | "
+                f"{sum(filas.values()) / duracion:,.0f} filas/s"
             )
-            ventas.append(venta)
 
-            # Mostrar progreso
-            if (i + 1) % 1000 == 0:
-                self.stdout.write(f"🔄 {i + 1}/{cantidad} ventas generadas...")
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), list(MODELOS)):
+                cursor.execute(sql)
 
-        # Crear todas las ventas de una vez
-        self.stdout.write("💾 Guardando ventas en la base de datos...")
-        Venta.objects.bulk_create(ventas, batch_size=1000)
+        if descontar_stock and vendidos:
+            self._descontar_stock(vendidos)
+        # Inserciones masivas sin post_save: invalidar lo que las señales invalidarían
+        invalidar_resultados()
 
+        duracion = time.perf_counter() - inicio
+        total_filas = sum(filas.values())
         self.stdout.write(
             self.style.SUCCESS(
                 f"✅ ¡Éxito! Generadas {cantidad} ventas desde {fecha_inicio.date()} hasta {fecha_fin.date()}"
             )
         )
+        self.stdout.write(
+            f"⚡ {total_filas} filas en {duracion:.1f} s ({total_filas / duracion:,.0f} filas/s): "
+            + ", ".join(f"{nombre} {n}" for nombre, n in filas.items())
+        )
 
         # Mostrar resumen
         self.mostrar_resumen()
 
+    def _descontar_stock(self, vendidos):
+        """Un UPDATE con CASE por bloque de productos; el stock no baja de 0."""
+        ids = list(vendidos)
+        with transaction.atomic():
+            for i in range(0, len(ids), 500):
+                bloque = ids[i:i + 500]
+                Productos.objects.filter(id__in=bloque).update(
+                    stock=Case(
+                        *[When(id=pid, then=Greatest(F("stock") - vendidos[pid], 0)) for pid in bloque],
+                        default=F("stock"),
+                        output_field=IntegerField(),
+                    )
+                )
+            registrar_cambio("productos")
+        invalidar_productos(ids)
+        invalidar_tags("productos")
+        self.stdout.write(f"📦 Stock descontado en {len(ids)} productos ({sum(vendidos.values())} unidades pagadas)")
+
     def mostrar_resumen(self):
         """Mostrar resumen básico"""
-        from django.db.models import Count
-        
         total = Venta.objects.count()
         por_estado = Venta.objects.values('estado').annotate(total=Count('id'))
-        
+
         self.stdout.write("\n📊 RESUMEN:")
         self.stdout.write(f"Total de ventas en sistema: {total}")
+        self.stdout.write(f"Detalles: {DetalleVenta.objects.count()} | Pagos: {Pago.objects.count()}")
         self.stdout.write("Distribución por estado:")
         for item in por_estado:
-            self.stdout.write(f"  {item['estado']}: {item['total']}")
\ No newline at end of file
+            self.stdout.write(f"  {item['estado']}: {item['total']}")
@@ -1,9 +1,13 @@
+from pathlib import Path
+
 from django.db import migrations
-from django.core.management import call_command
+
+from core.semillas import cargar_fixtures
 
 
 def load_categorias(apps, schema_editor):
-    call_command('loaddata', 'tienda/fixtures/categorias.json')
+    fixture = Path(__file__).resolve().parents[1] / 'fixtures' / 'categorias.json'
+    cargar_fixtures([fixture], using=schema_editor.connection.alias, apps=apps, registrar=False)
 
 
 class Migration(migrations.Migration):
@@ -1,27 +1,32 @@
 # tienda/migrations/0004_load_all_initial_data.py
+from pathlib import Path
+
 from django.db import migrations
-from django.core.management import call_command
+
+from core.semillas import cargar_fixtures
 
 
 def load_all_initial_data(apps, schema_editor):
     # Cargar en orden correcto (por dependencias)
     fixtures = [
-        'tienda/fixtures/categorias.json',      
-        'tienda/fixtures/subcategorias.json',   
-        'tienda/fixtures/productos.json',       
-        'tienda/fixtures/ingresos.json',         
-        'tienda/fixtures/prediccion.json',
-        'tienda/fixtures/promociones.json',
-        'tienda/fixtures/venta.json',
-        'tienda/fixtures/detalle_ingreso.json',
-        'tienda/fixtures/detalle_venta.json',
-        'tienda/fixtures/promociones_productos.json',  
-        'tienda/fixtures/mantenimiento.json',    
-        'tienda/fixtures/pagos.json',    
+        'categorias.json',      
+        'subcategorias.json',   
+        'productos.json',       
+        'ingresos.json',         
+        'prediccion.json',
+        'promociones.json',
+        'venta.json',
+        'detalle_ingreso.json',
+        'detalle_venta.json',
+        'promociones_productos.json',  
+        'mantenimiento.json',    
+        'pagos.json',    
     ]
     
-    for fixture in fixtures:
-        call_command('loaddata', fixture)
+    # Carga masiva con los modelos históricos de este punto (no los actuales);
+    # los checksums se registran en el post_migrate de tienda
+    fixture_dir = Path(__file__).resolve().parents[1] / 'fixtures'
+    cargar_fixtures([fixture_dir / f for f in fixtures], using=schema_editor.connection.alias, apps=apps, registrar=False)
 
 
 class Migration(migrations.Migration):
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 10:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authz', '0003_load_initial_fixture'),
+        ('tienda', '0006_alter_venta_fecha'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fcmdevice',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['usuario'], name='fcmdevice_activos_idx'),
+        ),
+    ]
@@ -19,6 +19,10 @@ class FCMDevice(models.Model):
     class Meta:
         verbose_name = 'FCM Device'
         verbose_name_plural = 'FCM Devices'
+        indexes = [
+            # Índice parcial: sólo los dispositivos activos, que son los que se recorren al enviar
+            models.Index(fields=['usuario'], condition=models.Q(activo=True), name='fcmdevice_activos_idx'),
+        ]
 
     def __str__(self):
         usuario_str = self.usuario.user.username if self.usuario and hasattr(self.usuario, 'user') else 'anon'
@@ -1,34 +1,118 @@
 # tienda/signals.py
-from django.db.models.signals import post_migrate
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
 from django.dispatch import receiver
-from django.core.management import call_command
-import os
+
+from core.cache import invalidar_tags
+from core.condicional import registrar_cambio
+from core.semillas import cargar_fixtures
+from .catalogo import invalidar_productos
+from .models import Categoria, ProductoPromocion, Productos, Promocion, SubCategoria
+
+
+# Orden indistinto: core.semillas inserta cada modelo después de los que referencia
+FIXTURES = [
+    "categorias.json",
+    "subcategorias.json",
+    "productos.json",
+    "ingresos.json",
+    "detalle_ingreso.json",
+    "venta.json",
+    "detalle_venta.json",
+    "pagos.json",
+    "mantenimiento.json",
+    "prediccion.json",
+    "promociones.json",
+    "promociones_productos.json",
+]
 
 
 @receiver(post_migrate)
 def load_fixtures(sender, **kwargs):
-    if sender.name == "tienda":
-        fixture_dir = "fixtures"
-        if os.path.exists(fixture_dir):
-            fixtures = [
-                "categorias.json",
-                "productos.json",
-                "ingresos.json",
-                "mantenimientos.json",
-                "pagos.json",
-                "prediccion.json",
-                "promociones.json",
-                "venta" "subcategorias.json",
-                "detalle_ingreso.json",
-                "detalle_venta.json",
-                "promociones_productos.json",
-            ]
-
-            for fixture in fixtures:
-                fixture_path = os.path.join(fixture_dir, fixture)
-                if os.path.exists(fixture_path):
-                    try:
-                        call_command("loaddata", fixture_path)
-                        print(f"✓ Fixture cargado: {fixture}")
-                    except Exception as e:
-                        print(f"✗ Error cargando {fixture}: {e}")
+    """Carga masiva de los fixtures semilla; se salta si ninguno cambió desde la última carga."""
+    if sender.name != "tienda":
+        return
+    using = kwargs.get("using", DEFAULT_DB_ALIAS)
+    fixture_dir = Path(__file__).resolve().parent / "fixtures"
+    rutas = [fixture_dir / f for f in FIXTURES]
+    # Ventas, ingresos y mantenimientos apuntan a los usuarios del fixture de authz,
+    # que carga la migración authz 0003. Sólo se carga aquí si la base quedó sin
+    # usuarios (flush, TransactionTestCase): con usuarios no se toca, para no
+    # revivir los usuarios semilla que se hayan borrado.
+    if not User.objects.using(using).exists():
+        rutas.insert(0, settings.BASE_DIR / "authz" / "fixtures" / "initial_authz.json")
+    try:
+        nuevas = cargar_fixtures(rutas, using=using)
+    except Exception as e:
+        print(f"✗ Error cargando fixtures: {e}")
+        return
+    filas = sum(nuevas.values())
+    if filas:
+        print(f"✓ Fixtures cargados: {filas} filas nuevas")
+        # La carga masiva no envía post_save: invalidar aquí las vistas cacheadas del
+        # catálogo y avanzar sus marcas de cambio (ETag / Last-Modified)
+        _invalidar_al_confirmar(tags=("categorias", "subcategorias", "productos"))
+        registrar_cambio("categorias", "subcategorias", "productos")
+
+
+def _invalidar_al_confirmar(tags=(), productos=()):
+    """
+    Invalida tags y snapshot al confirmar la transacción que escribe (como
+    core/pagos.py): si se invalidara antes, un GET concurrente volvería a cachear
+    los datos previos al commit durante todo el TTL.
+    """
+    tags, productos = tuple(tags), list(productos)
+
+    def invalidar():
+        if productos:
+            invalidar_productos(productos)
+        if tags:
+            invalidar_tags(*tags)
+
+    transaction.on_commit(invalidar)
+
+
+# =======================================
+# INVALIDACIÓN DEL SNAPSHOT DE CATÁLOGO
+# =======================================
+@receiver([post_save, post_delete], sender=Productos)
+def invalidar_catalogo_producto(sender, instance, **kwargs):
+    _invalidar_al_confirmar(tags=("productos",), productos=[instance.pk])
+    if not kwargs.get("raw"):
+        registrar_cambio("productos")
+
+
+@receiver([post_save, post_delete], sender=ProductoPromocion)
+def invalidar_catalogo_producto_promocion(sender, instance, **kwargs):
+    _invalidar_al_confirmar(productos=[instance.producto_id])
+
+
+@receiver([post_save, post_delete], sender=Promocion)
+def invalidar_catalogo_promocion(sender, instance, **kwargs):
+    # Los ids se leen ahora, dentro de la transacción; la invalidación, al confirmar
+    ids = ProductoPromocion.objects.filter(promocion_id=instance.pk).values_list("producto_id", flat=True)
+    _invalidar_al_confirmar(productos=ids)
+
+
+# =======================================
+# INVALIDACIÓN DE LAS VISTAS CACHEADAS DEL CATÁLOGO
+# =======================================
+# Los serializers anidan categoría -> subcategoría -> producto, por eso las
+# entradas de subcategorías y productos también llevan los tags de sus padres.
+# Las cargas de fixtures (raw) no marcan cambios: corren durante las migraciones.
+@receiver([post_save, post_delete], sender=Categoria)
+def invalidar_cache_categorias(sender, **kwargs):
+    _invalidar_al_confirmar(tags=("categorias",))
+    if not kwargs.get("raw"):
+        registrar_cambio("categorias")
+
+
+@receiver([post_save, post_delete], sender=SubCategoria)
+def invalidar_cache_subcategorias(sender, **kwargs):
+    _invalidar_al_confirmar(tags=("subcategorias",))
+    if not kwargs.get("raw"):
+        registrar_cambio("subcategorias")
@@ -1,3 +1,41 @@
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from core.cache import versiones_tags
+from core.condicional import _incrementar
+from .models import Categoria
+
+
+# ==========================================================
+# GET CONDICIONAL + CACHÉ DE VISTAS DEL CATÁLOGO (tienda/api.py)
+# ==========================================================
+class CatalogoCondicionalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_escritura_de_otro_proceso_no_sirve_el_cuerpo_viejo(self):
+        primera = self.client.get("/api/categorias/")
+        self.assertEqual(primera.status_code, 200)
+
+        # Como el worker de Stripe u otro worker de gunicorn: escribe y avanza la
+        # marca de cambio en la BD, pero no invalida la caché de este proceso
+        Categoria.objects.bulk_create([Categoria(descripcion="Categoría de otro proceso")])
+        _incrementar(("categorias",))
+
+        segunda = self.client.get("/api/categorias/", HTTP_IF_NONE_MATCH=primera["ETag"])
+        self.assertEqual(segunda.status_code, 200)
+        self.assertNotEqual(segunda["ETag"], primera["ETag"])
+        self.assertEqual(segunda.json()["count"], primera.json()["count"] + 1)
+
+        # Con el ETag nuevo: 304
+        tercera = self.client.get("/api/categorias/", HTTP_IF_NONE_MATCH=segunda["ETag"])
+        self.assertEqual(tercera.status_code, 304)
+
+    def test_invalidacion_al_confirmar_la_escritura(self):
+        antes = versiones_tags(("categorias",))
+        with self.captureOnCommitCallbacks(execute=True):
+            Categoria.objects.create(descripcion="Nueva")
+            # Antes del commit un GET concurrente sólo cachearía bajo la versión vieja
+            self.assertEqual(versiones_tags(("categorias",)), antes)
+        self.assertNotEqual(versiones_tags(("categorias",)), antes)
@@ -1,4 +1,6 @@
 from rest_framework import generics, permissions
+
+from authz.autenticacion import perfil_de
 from .models import Venta
 from .serializer import VentaSerializer
 
@@ -7,9 +9,7 @@ class MisVentasList(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        from authz.models import Usuario
-        try:
-            perfil = Usuario.objects.get(user=self.request.user)
-            return Venta.objects.filter(usuario=perfil)
-        except Usuario.DoesNotExist:
-            return Venta.objects.none()
\ No newline at end of file
+        perfil = perfil_de(self.request)
+        if perfil is None:
+            return Venta.objects.none()
+        return Venta.objects.filter(usuario=perfil)